@@ -0,0 +1,218 @@
+import argparse
+import os
+import time
+from contextlib import contextmanager
+
+from app.config import settings
+from app import enums, shards
+from app.database import FOTO_FILE_EXPR
+
+# Hot/cold archival: laporan yang sudah ditutup (selesai/ditolak) dan lebih tua dari
+# settings.ARCHIVE_AFTER_DAYS dipindahkan beserta status_history-nya ke file database arsip.
+# Query list/statistik hanya menyentuh tabel aktif; detail dan history membaca arsip jika
+# laporan tidak ditemukan di tabel aktif.
+
+CLOSED_STATUSES = ("selesai", "ditolak")
+ARCHIVE_TABLES = ("laporan", "status_history")
+
+_schema_ready = False
+
+def archive_exists() -> bool:
+    return os.path.exists(settings.ARCHIVE_DATABASE_PATH)
+
+def main_columns(conn, table: str):
+    return [row[1] for row in conn.execute(f"PRAGMA main.table_info({table})")]
+
+def ensure_schema(conn):
+    """
+    Buat/selaraskan tabel arsip dengan kolom tabel aktif (kolom baru di tabel aktif
+    otomatis ditambahkan ke arsip). Koneksi harus sudah ATTACH arsip sebagai `archive`.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+
+    for table in ARCHIVE_TABLES:
+        columns = main_columns(conn, table)
+        existing = [row[1] for row in conn.execute(f"PRAGMA archive.table_info({table})")]
+        if not existing:
+            others = ", ".join(c for c in columns if c != "id")
+            conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS archive.{table} (
+                        id INTEGER PRIMARY KEY, {others},
+                        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )"""
+            )
+        else:
+            for column in columns:
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE archive.{table} ADD COLUMN {column}")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_archive_laporan_user ON laporan (user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_archive_history_laporan ON status_history (laporan_id)")
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS archive.idx_archive_laporan_foto_file ON laporan ({FOTO_FILE_EXPR}) "
+        "WHERE foto_url IS NOT NULL"
+    )
+    # Arsip dari sebelum kode enum: nilai TEXT diubah ke kode (sekali, ditandai tabel lookup arsip)
+    enums.migrate_archive(conn)
+    conn.commit()
+    _schema_ready = True
+
+@contextmanager
+def attach(conn):
+    """ATTACH database arsip sebagai schema `archive` selama blok with"""
+    conn.execute("ATTACH DATABASE ? AS archive", (settings.ARCHIVE_DATABASE_PATH,))
+    try:
+        ensure_schema(conn)
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute("DETACH DATABASE archive")
+
+# ==================== BACA ARSIP ====================
+
+def _rows_to_dicts(cursor):
+    return enums.to_dicts([desc[0] for desc in cursor.description], cursor.fetchall())
+
+def find_laporan(conn, laporan_id: int):
+    """Laporan dari arsip (dict tanpa archived_at) atau None"""
+    if not archive_exists():
+        return None
+    columns = ", ".join(main_columns(conn, "laporan"))
+    with attach(conn):
+        rows = _rows_to_dicts(conn.execute(
+            f"SELECT {columns} FROM archive.laporan WHERE id = ?", (laporan_id,)
+        ))
+    return rows[0] if rows else None
+
+def get_history(conn, laporan_id: int):
+    """History laporan yang sudah diarsipkan (format sama dengan GET /laporan/{id}/history)"""
+    return get_histories(conn, [laporan_id]).get(laporan_id, [])
+
+def get_histories(conn, laporan_ids):
+    """History arsip untuk banyak laporan sekaligus: {laporan_id: [history...]}"""
+    grouped = {}
+    if not laporan_ids or not archive_exists():
+        return grouped
+    placeholders = ",".join("?" * len(laporan_ids))
+    with attach(conn):
+        rows = _rows_to_dicts(conn.execute(
+            f"""SELECT sh.id, sh.laporan_id, sh.status, sh.catatan, sh.created_at, sh.user_id, u.nama_lengkap
+                FROM archive.status_history sh
+                JOIN users u ON sh.user_id = u.id
+                WHERE sh.laporan_id IN ({placeholders})
+                ORDER BY sh.laporan_id, sh.created_at DESC""",
+            list(laporan_ids)
+        ))
+    for row in rows:
+        grouped.setdefault(row["laporan_id"], []).append(row)
+    return grouped
+
+def list_archived(conn, user_id: int = None):
+    """Laporan di arsip saja (untuk ?include_archived=true), urut created_at DESC"""
+    if not archive_exists():
+        return []
+    where = "WHERE user_id = ?" if user_id is not None else ""
+    params = (user_id,) if user_id is not None else ()
+    columns = ", ".join(main_columns(conn, "laporan"))
+    with attach(conn):
+        return _rows_to_dicts(conn.execute(
+            f"SELECT {columns} FROM archive.laporan {where} ORDER BY created_at DESC", params
+        ))
+
+# ==================== JOB ARSIP ====================
+
+def _archive_connection(conn, older_than_days, batch_size, max_batches, pause_seconds, verbose, stats):
+    """Pindahkan batch laporan tertutup dari tabel laporan koneksi ini (satu shard) ke arsip"""
+    with attach(conn):
+        laporan_columns = ", ".join(main_columns(conn, "laporan"))
+        history_columns = ", ".join(main_columns(conn, "status_history"))
+        placeholders_status = ",".join("?" * len(CLOSED_STATUSES))
+
+        while max_batches is None or stats["batches"] < max_batches:
+            ids = [row[0] for row in conn.execute(
+                f"""SELECT id FROM main.laporan
+                    WHERE status IN ({placeholders_status})
+                      AND updated_at < datetime('now', ?)
+                    ORDER BY id
+                    LIMIT ?""",
+                enums.codes("status", CLOSED_STATUSES) + (f"{-older_than_days} days", batch_size)
+            )]
+            if not ids:
+                break
+
+            placeholders = ",".join("?" * len(ids))
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    f"""INSERT INTO archive.laporan ({laporan_columns})
+                        SELECT {laporan_columns} FROM main.laporan WHERE id IN ({placeholders})""",
+                    ids
+                )
+                history_moved = conn.execute(
+                    f"""INSERT INTO archive.status_history ({history_columns})
+                        SELECT {history_columns} FROM main.status_history WHERE laporan_id IN ({placeholders})""",
+                    ids
+                ).rowcount
+                conn.execute(f"DELETE FROM main.status_history WHERE laporan_id IN ({placeholders})", ids)
+                conn.execute(f"DELETE FROM main.laporan WHERE id IN ({placeholders})", ids)
+                # Trigger delete mencatat deleted = 1; laporan ini tidak hilang, hanya pindah ke arsip,
+                # jadi delta sync melaporkannya sebagai 'archived' (seq baru dari trigger tetap dipakai)
+                conn.execute(
+                    f"""UPDATE main.change_log SET deleted = 2
+                        WHERE entity = 'laporan' AND entity_id IN ({placeholders})""",
+                    ids
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            stats["batches"] += 1
+            stats["laporan"] += len(ids)
+            stats["status_history"] += history_moved
+            if verbose:
+                print(f"  batch {stats['batches']}: {len(ids)} laporan, {history_moved} history diarsipkan")
+            if pause_seconds:
+                time.sleep(pause_seconds)
+
+def archive_closed_laporan(older_than_days: int = None, batch_size: int = None,
+                           max_batches: int = None, pause_seconds: float = 0.05, verbose: bool = True):
+    """
+    Pindahkan laporan selesai/ditolak yang updated_at-nya lebih tua dari `older_than_days`
+    ke database arsip, per batch dalam satu transaksi (copy + delete atomik).
+    Jeda antar batch memberi kesempatan request lain mendapat write lock.
+    """
+    older_than_days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+
+    stats = {"batches": 0, "laporan": 0, "status_history": 0, "seconds": 0.0}
+    started = time.perf_counter()
+
+    # Setiap shard laporan diarsipkan ke database arsip yang sama (id laporan unik global)
+    for shard in shards.SHARDS:
+        conn = shards.connect(shard)
+        try:
+            _archive_connection(conn, older_than_days, batch_size, max_batches, pause_seconds, verbose, stats)
+        finally:
+            conn.close()
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    if verbose:
+        print(f"✅ Arsip selesai: {stats}")
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arsipkan laporan selesai/ditolak yang sudah lama")
+    parser.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=None)
+    parser.add_argument("--pause", type=float, default=0.05, help="Jeda antar batch (detik)")
+    args = parser.parse_args(argv)
+
+    archive_closed_laporan(args.older_than_days, args.batch_size, args.max_batches, args.pause)
+
+if __name__ == "__main__":
+    main()
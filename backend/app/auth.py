@@ -1,19 +1,27 @@
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from app.config import settings
 
-# ✅ PASTIKAN: Gunakan PBKDF2 SHA256 - TIDAK ADA BATASAN 72 BYTES
-pwd_context = CryptContext(
-    schemes=["pbkdf2_sha256"],
-    pbkdf2_sha256__default_rounds=30000
-)
+# passlib di-import saat pertama kali dipakai supaya startup worker tetap cepat
+_pwd_context = None
+
+def get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+
+        # ✅ PASTIKAN: Gunakan PBKDF2 SHA256 - TIDAK ADA BATASAN 72 BYTES
+        _pwd_context = CryptContext(
+            schemes=["pbkdf2_sha256"],
+            pbkdf2_sha256__default_rounds=30000
+        )
+    return _pwd_context
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
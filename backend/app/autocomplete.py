@@ -0,0 +1,184 @@
+import argparse
+import asyncio
+import threading
+import time
+
+from app import metrics, shards
+
+# Autocomplete lokasi / jenis_fasilitas dari prefix trie di memori (per worker), supaya
+# mahasiswa memilih ejaan yang sudah ada ("Gedung B Lantai 2" bukan "gd b lt.2") dan
+# pencocokan prioritas + pengelompokan /statistik tidak pecah karena variasi ejaan.
+# - build(): satu query GROUP BY per shard (UNION ALL kedua kolom), dipanggil saat startup
+# - add(): update inkremental dari buat_laporan setelah insert berhasil
+# - suggest(): jalan menyusuri prefix lalu baca daftar top-K yang sudah tersimpan di node,
+#   tanpa query SQLite dan tanpa menelusuri subtree
+# Laporan yang dibuat worker lain baru terlihat setelah rebuild periodik
+# (AUTOCOMPLETE_REFRESH_MINUTES).
+
+FIELDS = ("lokasi", "jenis_fasilitas")
+TOP_K = 10
+# Prefix lebih panjang dari ini tidak diindeks (batas memori untuk teks yang sangat panjang)
+MAX_PREFIX_LENGTH = 64
+
+autocomplete_values = metrics.registry.register(metrics.Gauge(
+    "civitasfix_autocomplete_values", "Nilai unik di index autocomplete", ("field",)
+))
+
+def normalize(value: str) -> str:
+    """Ejaan tampilan: spasi dirapikan ("Gedung  B " -> "Gedung B")"""
+    return " ".join((value or "").split())
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children = {}
+        # ((count, key), ...) urut count turun; diganti utuh (tuple) supaya pembaca tanpa lock aman
+        self.top = ()
+
+class PrefixIndex:
+    """Trie case-insensitive; tiap node menyimpan TOP_K nilai terbanyak di bawahnya"""
+
+    def __init__(self):
+        self.root = _Node()
+        self.counts = {}
+        # key -> {ejaan: count}; yang ditampilkan adalah ejaan terbanyak
+        self.spellings = {}
+        self.display = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, values):
+        """Index dari (nilai, count): nilai diproses urut count turun, jadi top node cukup di-append"""
+        index = cls()
+        for value, count in values:
+            index._count(normalize(value), count)
+        for key, total in sorted(index.counts.items(), key=lambda item: (-item[1], item[0])):
+            entry = (total, key)
+            for node in index._path(key):
+                if len(node.top) < TOP_K:
+                    node.top += (entry,)
+        return index
+
+    def _count(self, spelling: str, count: int) -> int:
+        if not spelling:
+            return 0
+        key = spelling.lower()
+        spellings = self.spellings.setdefault(key, {})
+        spellings[spelling] = spellings.get(spelling, 0) + count
+        if spellings[spelling] >= spellings.get(self.display.get(key), 0):
+            self.display[key] = spelling
+        total = self.counts[key] = self.counts.get(key, 0) + count
+        return total
+
+    def _path(self, key: str):
+        node = self.root
+        yield node
+        for char in key[:MAX_PREFIX_LENGTH]:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _Node()
+            node = child
+            yield node
+
+    def add(self, value: str, count: int = 1):
+        """Tambah satu kemunculan nilai (laporan baru); top-K di sepanjang prefix diperbarui"""
+        with self._lock:
+            spelling = normalize(value)
+            total = self._count(spelling, count)
+            if not total:
+                return
+            key = spelling.lower()
+            entry = (total, key)
+            for node in self._path(key):
+                top = node.top
+                if len(top) >= TOP_K and top[-1][0] > total and all(k != key for _, k in top):
+                    continue
+                entries = [item for item in top if item[1] != key]
+                entries.append(entry)
+                entries.sort(key=lambda item: (-item[0], item[1]))
+                node.top = tuple(entries[:TOP_K])
+
+    def suggest(self, prefix: str, limit: int = TOP_K):
+        """[{value, count}] untuk nilai yang diawali `prefix` (case-insensitive), terbanyak dulu"""
+        node = self.root
+        key = normalize(prefix).lower()
+        if key and prefix[-1].isspace():
+            # "gedung b " = batas kata, jangan cocokkan "gedung bc"
+            key += " "
+        for char in key[:MAX_PREFIX_LENGTH]:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        top = node.top
+        if len(key) > MAX_PREFIX_LENGTH:
+            top = [item for item in top if item[1].startswith(key)]
+        return [{"value": self.display[k], "count": count} for count, k in top[:limit]]
+
+    def __len__(self):
+        return len(self.counts)
+
+_indexes = {field: PrefixIndex() for field in FIELDS}
+
+def load(conn) -> dict:
+    """{field: [(nilai, count)]} dari semua shard, satu query GROUP BY per shard"""
+    def query(shard_conn):
+        return shard_conn.execute(
+            """SELECT 'lokasi', lokasi, COUNT(*) FROM laporan GROUP BY lokasi
+               UNION ALL
+               SELECT 'jenis_fasilitas', jenis_fasilitas, COUNT(*) FROM laporan GROUP BY jenis_fasilitas"""
+        ).fetchall()
+
+    values = {field: [] for field in FIELDS}
+    for rows in shards.fan_out(query, conn):
+        for field, value, count in rows:
+            values[field].append((value, count))
+    return values
+
+def build(conn=None, verbose: bool = False) -> dict:
+    """Bangun ulang index semua field lalu ganti index aktif sekaligus"""
+    global _indexes
+    started = time.perf_counter()
+    values = load(conn)
+    _indexes = {field: PrefixIndex.build(values[field]) for field in FIELDS}
+    for field, index in _indexes.items():
+        autocomplete_values.set(len(index), (field,))
+    stats = {field: len(index) for field, index in _indexes.items()}
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    if verbose:
+        print(f"🔤 Index autocomplete dibangun: {stats}")
+    return stats
+
+def add(field: str, value: str):
+    _indexes[field].add(value)
+
+def suggest(field: str, prefix: str, limit: int = TOP_K):
+    return _indexes[field].suggest(prefix, limit)
+
+async def run_periodically(interval_minutes: float):
+    """Task background (dijalankan dari startup_event): rebuild supaya laporan dari worker lain ikut"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval_minutes * 60)
+        try:
+            await loop.run_in_executor(None, build)
+        except Exception as e:
+            print(f"Autocomplete rebuild error: {e}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Autocomplete lokasi / jenis_fasilitas dari prefix trie")
+    parser.add_argument("field", choices=FIELDS)
+    parser.add_argument("prefix", nargs="?", default="")
+    parser.add_argument("--limit", type=int, default=TOP_K)
+    args = parser.parse_args(argv)
+
+    build(verbose=True)
+    started = time.perf_counter()
+    suggestions = suggest(args.field, args.prefix, args.limit)
+    elapsed = (time.perf_counter() - started) * 1e6
+    for item in suggestions:
+        print(f"  {item['count']:6d}  {item['value']}")
+    print(f"({len(suggestions)} saran dalam {elapsed:.0f} µs)")
+
+if __name__ == "__main__":
+    main()
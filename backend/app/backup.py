@@ -0,0 +1,419 @@
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+import zlib
+from datetime import datetime
+
+from app import locks, metrics, shards
+from app.config import settings
+from app.upload_gc import UPLOAD_DIR
+
+# Backup online tanpa menghentikan aplikasi. Setiap snapshot = satu direktori di BACKUP_DIR:
+# - <nama>.db.gz  : database utama, shard dan arsip, disalin dengan SQLite online backup API
+#                   per BACKUP_PAGES_PER_STEP halaman dengan jeda BACKUP_STEP_PAUSE_MS di antara
+#                   step (lock baca hanya dipegang selama satu step, tulis aplikasi tetap jalan),
+#                   lalu dicek PRAGMA integrity_check sebelum dikompres
+# - uploads/      : salinan uploads/ secara incremental; file yang tidak berubah sejak snapshot
+#                   sebelumnya di-hardlink (tanpa copy ulang, tanpa tambahan disk)
+# - manifest.json : daftar file + sha256, ditulis terakhir (snapshot tanpa manifest = gagal/belum selesai)
+# Snapshot antar database tidak atomik satu sama lain (masing-masing konsisten per file).
+# Restore dijalankan saat aplikasi berhenti: python -m app.backup restore <id>
+
+MANIFEST = "manifest.json"
+LOCK_FILE = ".backup.lock"
+# Lock dianggap ditinggal (proses mati) setelah sekian detik
+LOCK_STALE_SECONDS = 6 * 3600
+# Tulis dari koneksi lain membuat backup bertahap mulai ulang dari awal; tiap restart ukuran
+# step dinaikkan 4x, setelah MAX_RESTARTS sisa database disalin dalam satu step
+MAX_RESTARTS = 3
+
+backup_duration = metrics.registry.register(metrics.Histogram(
+    "civitasfix_backup_duration_seconds", "Durasi membuat satu snapshot backup",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800)
+))
+backup_last_success = metrics.registry.register(metrics.Gauge(
+    "civitasfix_backup_last_success_timestamp", "Waktu (unix) snapshot backup terakhir yang berhasil"
+))
+backup_failures_total = metrics.registry.register(metrics.Counter(
+    "civitasfix_backup_failures_total", "Snapshot backup yang gagal"
+))
+
+def databases():
+    """(nama, path) database yang dibackup: utama, shard, arsip"""
+    result = [("main" if shard.index == 0 else f"shard-{shard.name}", shard.path) for shard in shards.SHARDS]
+    if os.path.exists(settings.ARCHIVE_DATABASE_PATH):
+        result.append(("archive", settings.ARCHIVE_DATABASE_PATH))
+    return result
+
+def snapshot_ids(directory: str = None):
+    """Id snapshot lengkap (punya manifest), terlama dulu"""
+    directory = directory or settings.BACKUP_DIR
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name for name in os.listdir(directory)
+        if os.path.isfile(os.path.join(directory, name, MANIFEST))
+    )
+
+def load_manifest(snapshot_id: str, directory: str = None) -> dict:
+    with open(os.path.join(directory or settings.BACKUP_DIR, snapshot_id, MANIFEST)) as f:
+        return json.load(f)
+
+# ==================== DATABASE ====================
+
+class _Restarted(Exception):
+    pass
+
+def backup_database(source_path: str, target_path: str, pages: int = None, pause_seconds: float = None) -> dict:
+    """Salin database yang sedang dipakai ke target_path per `pages` halaman"""
+    pages = pages or settings.BACKUP_PAGES_PER_STEP
+    pause_seconds = settings.BACKUP_STEP_PAUSE_MS / 1000 if pause_seconds is None else pause_seconds
+    stats = {"steps": 0, "restarts": 0, "pages": 0}
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal last_remaining
+        stats["steps"] += 1
+        stats["pages"] = total
+        # Halaman sisa bertambah = sumber ditulis koneksi lain dan backup mulai ulang dari awal
+        if last_remaining is not None and remaining > last_remaining:
+            raise _Restarted
+        last_remaining = remaining
+        if remaining and pause_seconds:
+            time.sleep(pause_seconds)
+
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        while True:
+            last_remaining = None
+            try:
+                # Restart terakhir: satu step (lock baca dipegang sampai salinan selesai)
+                source.backup(target, pages=pages if stats["restarts"] < MAX_RESTARTS else -1, progress=progress)
+                break
+            except _Restarted:
+                stats["restarts"] += 1
+                pages *= 4
+        result = target.execute("PRAGMA integrity_check").fetchone()[0]
+        if result != "ok":
+            raise RuntimeError(f"integrity_check backup {source_path}: {result}")
+    finally:
+        target.close()
+        source.close()
+    return stats
+
+def _compress(path: str, target_path: str) -> str:
+    """gzip file lalu hapus aslinya; return sha256 isi sebelum kompresi"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as src, gzip.open(target_path, "wb", compresslevel=6) as dst:
+        for chunk in iter(lambda: src.read(1024 * 1024), b""):
+            digest.update(chunk)
+            dst.write(chunk)
+    os.remove(path)
+    return digest.hexdigest()
+
+def _decompress(path: str, target_path: str) -> str:
+    digest = hashlib.sha256()
+    with gzip.open(path, "rb") as src, open(target_path, "wb") as dst:
+        for chunk in iter(lambda: src.read(1024 * 1024), b""):
+            digest.update(chunk)
+            dst.write(chunk)
+    return digest.hexdigest()
+
+# ==================== UPLOADS ====================
+
+def sync_uploads(source_dir: str, target_dir: str, previous_dir: str = None) -> dict:
+    """
+    Salin file uploads ke target_dir; file dengan ukuran + mtime sama seperti di snapshot
+    sebelumnya di-hardlink dari sana (fallback copy jika filesystem tidak mendukung).
+    """
+    stats = {"files": 0, "copied": 0, "linked": 0, "bytes_copied": 0}
+    os.makedirs(target_dir, exist_ok=True)
+    if not os.path.isdir(source_dir):
+        return stats
+    with os.scandir(source_dir) as entries:
+        for entry in entries:
+            try:
+                if not entry.is_file(follow_symlinks=False) or entry.name.startswith("."):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                # Dihapus GC upload di tengah sync
+                continue
+            target = os.path.join(target_dir, entry.name)
+            stats["files"] += 1
+            if previous_dir:
+                previous = os.path.join(previous_dir, entry.name)
+                try:
+                    old = os.stat(previous)
+                    if old.st_size == stat.st_size and int(old.st_mtime) == int(stat.st_mtime):
+                        os.link(previous, target)
+                        stats["linked"] += 1
+                        continue
+                except OSError:
+                    pass
+            try:
+                shutil.copy2(entry.path, target)
+            except FileNotFoundError:
+                stats["files"] -= 1
+                continue
+            stats["copied"] += 1
+            stats["bytes_copied"] += stat.st_size
+    return stats
+
+# ==================== SNAPSHOT ====================
+
+def _acquire_lock(directory: str) -> bool:
+    """Satu proses backup dalam satu waktu (antar worker/cron), lewat file lock O_EXCL"""
+    return locks.acquire(os.path.join(directory, LOCK_FILE), LOCK_STALE_SECONDS)
+
+def _release_lock(directory: str):
+    locks.release(os.path.join(directory, LOCK_FILE))
+
+def _new_snapshot_dir(directory: str):
+    """
+    Buat direktori snapshot baru (exist_ok=False) dan return (id, path). Id = YYYYMMDD-HHMMSS,
+    ditambah -NN jika detik yang sama sudah dipakai; tetap urut secara leksikografis dan 8 karakter
+    pertama tetap tanggal (dipakai select_keep). Direktori yang sudah ada tidak pernah disentuh.
+    """
+    base = datetime.now().strftime("%Y%m%d-%H%M%S")
+    for n in range(100):
+        snapshot_id = base if n == 0 else f"{base}-{n:02d}"
+        path = os.path.join(directory, snapshot_id)
+        try:
+            os.makedirs(path)
+            return snapshot_id, path
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"Terlalu banyak snapshot dalam detik {base}")
+
+def create_snapshot(directory: str = None, upload_dir: str = UPLOAD_DIR, verbose: bool = True):
+    """Buat satu snapshot lengkap; return manifest, atau None jika backup lain sedang berjalan"""
+    directory = directory or settings.BACKUP_DIR
+    os.makedirs(directory, exist_ok=True)
+    if not _acquire_lock(directory):
+        if verbose:
+            print("⏭️  Backup lain sedang berjalan, dilewati")
+        return None
+
+    started = time.perf_counter()
+    try:
+        snapshot_id, path = _new_snapshot_dir(directory)
+    except Exception:
+        _release_lock(directory)
+        raise
+    try:
+        previous = [snapshot for snapshot in snapshot_ids(directory) if snapshot != snapshot_id]
+        manifest = {"id": snapshot_id, "created_at": datetime.now().isoformat(), "databases": {}}
+
+        for name, source_path in databases():
+            raw_path = os.path.join(path, f"{name}.db")
+            stats = backup_database(source_path, raw_path)
+            size = os.path.getsize(raw_path)
+            sha256 = _compress(raw_path, raw_path + ".gz")
+            manifest["databases"][name] = {
+                "file": f"{name}.db.gz",
+                "source": source_path,
+                "size": size,
+                "compressed_size": os.path.getsize(raw_path + ".gz"),
+                "sha256": sha256,
+                **stats,
+            }
+            if verbose:
+                print(f"  {name}: {size / 1024 / 1024:.1f} MB -> "
+                      f"{manifest['databases'][name]['compressed_size'] / 1024 / 1024:.1f} MB "
+                      f"({stats['steps']} step, {stats['restarts']} restart)")
+
+        previous_uploads = os.path.join(directory, previous[-1], "uploads") if previous else None
+        manifest["uploads"] = sync_uploads(upload_dir, os.path.join(path, "uploads"), previous_uploads)
+        manifest["seconds"] = round(time.perf_counter() - started, 3)
+
+        # Manifest ditulis terakhir: snapshot dianggap lengkap hanya jika manifest ada
+        with open(os.path.join(path, MANIFEST + ".tmp"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(os.path.join(path, MANIFEST + ".tmp"), os.path.join(path, MANIFEST))
+    except Exception:
+        backup_failures_total.inc()
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    finally:
+        _release_lock(directory)
+
+    backup_duration.observe(time.perf_counter() - started)
+    backup_last_success.set(time.time())
+    if verbose:
+        uploads = manifest["uploads"]
+        print(f"💾 Snapshot {snapshot_id} selesai dalam {manifest['seconds']} s "
+              f"(uploads: {uploads['copied']} disalin, {uploads['linked']} tidak berubah)")
+    prune(directory, verbose=verbose)
+    return manifest
+
+def verify_snapshot(snapshot_id: str, directory: str = None) -> dict:
+    """Dekompres setiap database ke file sementara, cek sha256 + integrity_check; return {nama: 'ok'|error}"""
+    directory = directory or settings.BACKUP_DIR
+    manifest = load_manifest(snapshot_id, directory)
+    path = os.path.join(directory, snapshot_id)
+    results = {}
+    for name, info in manifest["databases"].items():
+        temp_path = os.path.join(path, f".verify-{name}.db")
+        try:
+            results[name] = _check_database(os.path.join(path, info["file"]), temp_path, info["sha256"])
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    uploads = os.path.join(path, "uploads")
+    files = len(os.listdir(uploads)) if os.path.isdir(uploads) else 0
+    expected = manifest["uploads"]["files"]
+    results["uploads"] = "ok" if files == expected else f"{files} file, manifest {expected}"
+    return results
+
+def _check_database(gz_path: str, temp_path: str, sha256: str) -> str:
+    try:
+        if _decompress(gz_path, temp_path) != sha256:
+            return "sha256 tidak cocok"
+    except (OSError, EOFError, zlib.error) as e:
+        return f"file rusak: {e}"
+    conn = sqlite3.connect(temp_path)
+    try:
+        return conn.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        conn.close()
+
+# ==================== RETENSI ====================
+
+def select_keep(ids, keep_last: int, keep_daily: int):
+    """Snapshot yang dipertahankan: `keep_last` terbaru + snapshot terakhir tiap hari untuk `keep_daily` hari terakhir"""
+    keep = set(ids[-keep_last:]) if keep_last else set()
+    days = {}
+    for snapshot_id in ids:
+        days[snapshot_id[:8]] = snapshot_id
+    for day in sorted(days)[-keep_daily:] if keep_daily else []:
+        keep.add(days[day])
+    return keep
+
+def prune(directory: str = None, keep_last: int = None, keep_daily: int = None, verbose: bool = True):
+    directory = directory or settings.BACKUP_DIR
+    keep_last = settings.BACKUP_KEEP_LAST if keep_last is None else keep_last
+    keep_daily = settings.BACKUP_KEEP_DAILY if keep_daily is None else keep_daily
+    ids = snapshot_ids(directory)
+    keep = select_keep(ids, keep_last, keep_daily)
+    removed = [snapshot_id for snapshot_id in ids if snapshot_id not in keep]
+    for snapshot_id in removed:
+        # File uploads yang di-hardlink snapshot lain tetap ada
+        shutil.rmtree(os.path.join(directory, snapshot_id), ignore_errors=True)
+    if verbose and removed:
+        print(f"🗑️  {len(removed)} snapshot lama dihapus, {len(keep)} disimpan")
+    return removed
+
+# ==================== RESTORE ====================
+
+def restore_snapshot(snapshot_id: str, directory: str = None, upload_dir: str = UPLOAD_DIR, verbose: bool = True):
+    """
+    Kembalikan database dan uploads dari snapshot (aplikasi harus berhenti). Setiap database
+    diverifikasi dulu; file lama dipindah ke <path>.before-restore-<waktu>, bukan dihapus.
+    """
+    directory = directory or settings.BACKUP_DIR
+    manifest = load_manifest(snapshot_id, directory)
+    path = os.path.join(directory, snapshot_id)
+    suffix = f".before-restore-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+
+    # Verifikasi semua database sebelum mengganti satupun
+    staged = []
+    try:
+        for name, info in manifest["databases"].items():
+            target = info["source"]
+            temp_path = target + ".restore-tmp"
+            result = _check_database(os.path.join(path, info["file"]), temp_path, info["sha256"])
+            staged.append((name, target, temp_path))
+            if result != "ok":
+                raise RuntimeError(f"Snapshot {snapshot_id} database {name} rusak: {result}")
+    except Exception:
+        for _, _, temp_path in staged:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        raise
+
+    for name, target, temp_path in staged:
+        if os.path.exists(target):
+            os.replace(target, target + suffix)
+        for extra in ("-wal", "-shm", "-journal"):
+            if os.path.exists(target + extra):
+                os.replace(target + extra, target + suffix + extra)
+        os.replace(temp_path, target)
+        if verbose:
+            print(f"  {name} -> {target}")
+
+    snapshot_uploads = os.path.join(path, "uploads")
+    stats = sync_uploads(snapshot_uploads, upload_dir, previous_dir=None) if os.path.isdir(snapshot_uploads) else {}
+    if verbose:
+        print(f"✅ Restore snapshot {snapshot_id} selesai (uploads: {stats.get('files', 0)} file); "
+              f"database sebelumnya disimpan dengan akhiran {suffix}")
+    return manifest
+
+# ==================== JADWAL ====================
+
+def run_if_due(interval_minutes: float, verbose: bool = True):
+    """Buat snapshot jika snapshot terakhir lebih tua dari interval (aman dipanggil dari banyak worker)"""
+    ids = snapshot_ids()
+    if ids:
+        last = datetime.strptime(ids[-1][:15], "%Y%m%d-%H%M%S")
+        if (datetime.now() - last).total_seconds() < interval_minutes * 60 * 0.9:
+            return None
+    return create_snapshot(verbose=verbose)
+
+async def run_periodically(interval_minutes: float):
+    """Task background (dijalankan dari startup_event); backup berjalan di thread pool"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(min(interval_minutes * 60, 300))
+        try:
+            await loop.run_in_executor(None, run_if_due, interval_minutes)
+        except Exception as e:
+            print(f"Backup error: {e}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backup online database + uploads CivitasFix")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("create", help="Buat snapshot sekarang")
+    subparsers.add_parser("list", help="Daftar snapshot")
+    verify = subparsers.add_parser("verify", help="Cek sha256 + integrity_check snapshot")
+    verify.add_argument("snapshot_id", nargs="?", help="Default snapshot terbaru")
+    prune_parser = subparsers.add_parser("prune", help="Hapus snapshot di luar retensi")
+    prune_parser.add_argument("--keep-last", type=int, default=settings.BACKUP_KEEP_LAST)
+    prune_parser.add_argument("--keep-daily", type=int, default=settings.BACKUP_KEEP_DAILY)
+    restore = subparsers.add_parser("restore", help="Restore snapshot (hentikan aplikasi dulu)")
+    restore.add_argument("snapshot_id")
+    args = parser.parse_args(argv)
+
+    if args.command == "create":
+        create_snapshot()
+    elif args.command == "list":
+        for snapshot_id in snapshot_ids():
+            manifest = load_manifest(snapshot_id)
+            size = sum(info["compressed_size"] for info in manifest["databases"].values())
+            print(f"{snapshot_id}  {len(manifest['databases'])} database  {size / 1024 / 1024:.1f} MB  "
+                  f"{manifest['uploads']['files']} upload")
+    elif args.command == "verify":
+        ids = snapshot_ids()
+        snapshot_id = args.snapshot_id or (ids[-1] if ids else None)
+        if snapshot_id is None:
+            print("Belum ada snapshot")
+            return
+        results = verify_snapshot(snapshot_id)
+        for name, result in results.items():
+            print(f"{'✅' if result == 'ok' else '❌'} {name}: {result}")
+        if any(result != "ok" for result in results.values()):
+            raise SystemExit(1)
+    elif args.command == "prune":
+        prune(keep_last=args.keep_last, keep_daily=args.keep_daily)
+    elif args.command == "restore":
+        restore_snapshot(args.snapshot_id)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import threading
+from collections import OrderedDict
+
+from app import metrics
+from app.config import settings
+
+# Cache in-process (per worker) untuk baris laporan, history dan list laporan per user.
+# Entry dikelompokkan per scope ETag ('laporan:<id>', 'user:<id>') dan setiap varian
+# (mis. 'with-history', 'archived:history') menyimpan versi change_counter saat dibaca.
+# Endpoint GET sudah membaca versi itu untuk ETag, jadi entry hanya dipakai jika versinya
+# masih sama. Versi dinaikkan trigger database untuk setiap tulis (termasuk dari worker lain,
+# job eskalasi/arsip, atau SQL manual), sehingga change_counter sekaligus menjadi kanal
+# invalidasi antar worker tanpa komponen tambahan.
+# Path tulis di worker ini juga memperbarui cache langsung (write-through) atau membuang scope-nya.
+# Generation counter mencegah hasil baca lama menimpa entry yang lebih baru: fill() hanya
+# disimpan jika tidak ada tulis ke cache sejak pembacaan dimulai.
+
+cache_requests_total = metrics.registry.register(metrics.Counter(
+    "civitasfix_cache_requests_total", "Lookup cache laporan in-process", ("scope", "result")
+))
+
+class VersionedCache:
+    """LRU per scope, dibatasi `max_entries` scope"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.generation = 0
+        self._scopes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, scope: str, variant: str, version: int):
+        """Nilai cache jika ada dan versinya sama dengan versi database saat ini, selain itu None"""
+        kind = scope.split(":", 1)[0]
+        with self._lock:
+            entry = self._scopes.get(scope, {}).get(variant)
+            if entry is not None and entry[0] == version:
+                self._scopes.move_to_end(scope)
+                cache_requests_total.inc((kind, "hit"))
+                return entry[1]
+        cache_requests_total.inc((kind, "miss" if entry is None else "stale"))
+        return None
+
+    def fill(self, scope: str, variant: str, version: int, value, generation: int):
+        """Simpan hasil baca database; diabaikan jika cache sudah ditulis sejak `generation` diambil"""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._store(scope, variant, version, value)
+
+    def put(self, scope: str, variant: str, version: int, value):
+        """Write-through dari path tulis: ganti semua varian scope dengan nilai baru"""
+        with self._lock:
+            self.generation += 1
+            self._scopes.pop(scope, None)
+            self._store(scope, variant, version, value)
+
+    def invalidate(self, *scopes: str):
+        with self._lock:
+            self.generation += 1
+            for scope in scopes:
+                self._scopes.pop(scope, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._scopes.clear()
+
+    def _store(self, scope, variant, version, value):
+        variants = self._scopes.setdefault(scope, {})
+        # Varian dengan versi lama tidak akan pernah cocok lagi
+        for name in [name for name, (v, _) in variants.items() if v != version]:
+            del variants[name]
+        variants[variant] = (version, value)
+        self._scopes.move_to_end(scope)
+        while len(self._scopes) > self.max_entries:
+            self._scopes.popitem(last=False)
+
+laporan_cache = VersionedCache(settings.CACHE_MAX_ENTRIES)
+
+def enabled() -> bool:
+    return settings.CACHE_ENABLED
+
+def cached(scope: str, variant: str, version: int, load):
+    """Ambil dari cache atau jalankan load() lalu simpan; load() tidak boleh dipakai untuk data yang dimutasi"""
+    if not enabled():
+        return load()
+    value = laporan_cache.get(scope, variant, version)
+    if value is None:
+        generation = laporan_cache.generation
+        value = load()
+        laporan_cache.fill(scope, variant, version, value, generation)
+    return value
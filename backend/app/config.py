@@ -6,6 +6,8 @@ load_dotenv()
 class Settings:
     # Untuk SQLite, kita tidak perlu DATABASE_URL yang complex
     DATABASE_URL: str = "sqlite:///./civitasfix.db"
+    # Path file SQLite (relatif terhadap working directory), bisa diganti untuk benchmark/testing
+    DATABASE_PATH: str = os.getenv("DATABASE_PATH", "civitasfix.db")
     SECRET_KEY: str = os.getenv("SECRET_KEY", "civitasfix-secret-key-2024-upn-veteran-jatim")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
@@ -14,4 +16,114 @@ class Settings:
     SMTP_USERNAME: str = os.getenv("SMTP_USERNAME", "")
     SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD", "")
 
-settings = Settings()
\ No newline at end of file
+    # Arsip laporan lama (lihat app/archive.py)
+    ARCHIVE_DATABASE_PATH: str = os.getenv("ARCHIVE_DATABASE_PATH", "civitasfix_archive.db")
+    ARCHIVE_AFTER_DAYS: int = int(os.getenv("ARCHIVE_AFTER_DAYS", 180))
+    ARCHIVE_BATCH_SIZE: int = int(os.getenv("ARCHIVE_BATCH_SIZE", 500))
+
+    # Server (dipakai oleh app/server.py)
+    HOST: str = os.getenv("HOST", "0.0.0.0")
+    PORT: int = int(os.getenv("PORT", 8000))
+    WORKERS: int = int(os.getenv("WORKERS", 1))
+    PRELOAD: bool = os.getenv("PRELOAD", "1") == "1"
+    GRACEFUL_TIMEOUT: int = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+
+    # Startup: buat tabel saat startup (dimatikan di worker jika sudah di-preload)
+    INIT_DB_ON_STARTUP: bool = os.getenv("INIT_DB_ON_STARTUP", "1") == "1"
+    # Data contoh hanya jika diminta (opt-in)
+    SEED_SAMPLE_DATA: bool = os.getenv("SEED_SAMPLE_DATA", "0") == "1"
+
+    # Observability
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "1") == "1"
+    # Query lebih lama dari ini (ms) dicatat di slow_query_log; 0 = catat semua, -1 = mati
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", 200))
+    # Agregat slow query di memori ditulis ke slow_query_log tiap sekian detik (satu transaksi, thread background)
+    SLOW_QUERY_FLUSH_SECONDS: float = float(os.getenv("SLOW_QUERY_FLUSH_SECONDS", 5))
+
+    # Rate limiting & admission control (lihat app/ratelimit.py)
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+    # Override limit per route, contoh: "login.ip=20/60,laporan_create.user=10/60"
+    RATE_LIMITS: str = os.getenv("RATE_LIMITS", "")
+    # memory = per worker; sqlite = bucket dibagi semua worker lewat file SQLite
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_DATABASE_PATH: str = os.getenv("RATE_LIMIT_DATABASE_PATH", "civitasfix_ratelimit.db")
+    # Pakai X-Forwarded-For sebagai IP client (hanya jika di belakang reverse proxy)
+    RATE_LIMIT_TRUST_FORWARDED: bool = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0") == "1"
+    # Maksimal request bersamaan untuk endpoint mahal (login, register, buat laporan, upload) per worker
+    MAX_CONCURRENT_EXPENSIVE: int = int(os.getenv("MAX_CONCURRENT_EXPENSIVE", 8))
+    ADMISSION_RETRY_AFTER: int = int(os.getenv("ADMISSION_RETRY_AFTER", 1))
+
+    # GC file uploads/ yang tidak direferensikan laporan (lihat app/upload_gc.py)
+    UPLOAD_GC_GRACE_HOURS: float = float(os.getenv("UPLOAD_GC_GRACE_HOURS", 24))
+    UPLOAD_GC_BATCH_SIZE: int = int(os.getenv("UPLOAD_GC_BATCH_SIZE", 200))
+    UPLOAD_GC_PAUSE: float = float(os.getenv("UPLOAD_GC_PAUSE", 0.1))
+    # Interval sweep background (menit); default 0 = mati, jalankan manual/cron.
+    # Jika diaktifkan, hanya satu worker yang menyapu per interval (lock file, lihat app/locks.py)
+    UPLOAD_GC_INTERVAL_MINUTES: float = float(os.getenv("UPLOAD_GC_INTERVAL_MINUTES", 0))
+
+    # Batas waktu per section GET /dashboard (detik); section yang lewat dikembalikan partial
+    DASHBOARD_SECTION_TIMEOUT: float = float(os.getenv("DASHBOARD_SECTION_TIMEOUT", 5))
+
+    # Eskalasi prioritas otomatis (lihat app/escalation.py): jam terbuka per prioritas sebelum dinaikkan
+    SLA_HOURS: str = os.getenv("SLA_HOURS", "rendah=168,sedang=72")
+    SLA_ESCALATION_BATCH_SIZE: int = int(os.getenv("SLA_ESCALATION_BATCH_SIZE", 500))
+    # Interval job eskalasi (menit), satu worker per interval (lock file, lihat app/locks.py); 0 = mati, jalankan manual/cron
+    SLA_ESCALATION_INTERVAL_MINUTES: float = float(os.getenv("SLA_ESCALATION_INTERVAL_MINUTES", 15))
+
+    # Sharding laporan per fakultas/kampus (lihat app/shards.py), kosong = satu database.
+    # SHARDS="ft=civitasfix_ft.db,feb=civitasfix_feb.db", SHARD_ROUTING="FT=ft,FEB=feb" (gedung -> shard)
+    SHARDS: str = os.getenv("SHARDS", "")
+    SHARD_ROUTING: str = os.getenv("SHARD_ROUTING", "")
+
+    # Group commit insert laporan (lihat app/group_commit.py): insert yang datang bersamaan
+    # ditulis dalam satu transaksi, menunggu maksimal MAX_DELAY_MS atau sampai MAX_BATCH baris
+    GROUP_COMMIT_ENABLED: bool = os.getenv("GROUP_COMMIT_ENABLED", "0") == "1"
+    GROUP_COMMIT_MAX_DELAY_MS: float = float(os.getenv("GROUP_COMMIT_MAX_DELAY_MS", 5))
+    GROUP_COMMIT_MAX_BATCH: int = int(os.getenv("GROUP_COMMIT_MAX_BATCH", 100))
+
+    # Header Idempotency-Key untuk POST /laporan dan PUT /laporan/{id}/status (lihat app/idempotency.py)
+    IDEMPOTENCY_TTL_HOURS: float = float(os.getenv("IDEMPOTENCY_TTL_HOURS", 24))
+    # Duplikat yang datang bersamaan menunggu eksekusi pertama maksimal sekian detik (lalu 409)
+    IDEMPOTENCY_WAIT_SECONDS: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 10))
+    # Key 'pending' lebih tua dari ini dianggap ditinggal (worker mati) dan boleh dieksekusi ulang
+    IDEMPOTENCY_PENDING_TIMEOUT: float = float(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT", 60))
+
+    # Cache in-process laporan/history/list per user (lihat app/cache.py), divalidasi versi change_counter
+    CACHE_ENABLED: bool = os.getenv("CACHE_ENABLED", "1") == "1"
+    # Maksimal scope (laporan:<id> / user:<id>) yang disimpan per worker
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+
+    # Profiling per request (lihat app/profiling.py); PROFILE_ENABLED=0 = middleware tidak dipasang
+    PROFILE_ENABLED: bool = os.getenv("PROFILE_ENABLED", "0") == "1"
+    # Fraksi request yang diprofil otomatis (0 = hanya lewat header X-Profile bertanda tangan)
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+    # Kunci HMAC header X-Profile (default SECRET_KEY)
+    PROFILE_SECRET: str = os.getenv("PROFILE_SECRET", "")
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_KEEP: int = int(os.getenv("PROFILE_KEEP", 50))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", 1))
+    PROFILE_TRACEMALLOC_FRAMES: int = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", 10))
+
+    # Backup online database + uploads (lihat app/backup.py)
+    BACKUP_DIR: str = os.getenv("BACKUP_DIR", "backups")
+    # Interval snapshot otomatis (menit); 0 = mati, jalankan manual/cron: python -m app.backup create
+    BACKUP_INTERVAL_MINUTES: float = float(os.getenv("BACKUP_INTERVAL_MINUTES", 0))
+    # Halaman per step online backup dan jeda antar step (tulis aplikasi berjalan di sela-selanya)
+    BACKUP_PAGES_PER_STEP: int = int(os.getenv("BACKUP_PAGES_PER_STEP", 256))
+    BACKUP_STEP_PAUSE_MS: float = float(os.getenv("BACKUP_STEP_PAUSE_MS", 10))
+    # Retensi: snapshot terbaru + satu snapshot per hari untuk sekian hari terakhir
+    BACKUP_KEEP_LAST: int = int(os.getenv("BACKUP_KEEP_LAST", 24))
+    BACKUP_KEEP_DAILY: int = int(os.getenv("BACKUP_KEEP_DAILY", 14))
+
+    # Provisioning user massal dari roster CSV (lihat app/roster.py)
+    ROSTER_CHUNK_SIZE: int = int(os.getenv("ROSTER_CHUNK_SIZE", 1000))
+    # Proses hash password paralel; 0 = jumlah CPU
+    ROSTER_HASH_WORKERS: int = int(os.getenv("ROSTER_HASH_WORKERS", 0))
+
+    # Rebuild index autocomplete per worker (lihat app/autocomplete.py); 0 = hanya saat startup
+    AUTOCOMPLETE_REFRESH_MINUTES: float = float(os.getenv("AUTOCOMPLETE_REFRESH_MINUTES", 10))
+
+    # Lama lease klaim antrian kerja dosen sebelum laporan kembali ke antrian (lihat app/workqueue.py)
+    WORK_QUEUE_LEASE_MINUTES: float = float(os.getenv("WORK_QUEUE_LEASE_MINUTES", 30))
+
+settings = Settings()
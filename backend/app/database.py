@@ -1,6 +1,7 @@
 import sqlite3
 import os
 from app.config import settings
+from app import enums
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,10 +9,14 @@ logger = logging.getLogger(__name__)
 # Gunakan SQLite untuk development
 DATABASE_URL = "sqlite:///./civitasfix.db"
 
+# Nama file foto dari foto_url ("http://host/uploads/<file>" -> "<file>"), dipakai sebagai
+# expression index supaya GC upload bisa cek referensi tanpa full table scan
+FOTO_FILE_EXPR = "substr(foto_url, instr(foto_url, '/uploads/') + 9)"
+
 def get_connection():
     """Get SQLite database connection"""
     try:
-        conn = sqlite3.connect("civitasfix.db", check_same_thread=False)
+        conn = sqlite3.connect(settings.DATABASE_PATH, check_same_thread=False)
         conn.row_factory = sqlite3.Row  # This enables column access by name
         
         # Enable foreign keys
@@ -22,36 +27,42 @@ def get_connection():
         logger.error(f"Database connection error: {e}")
         raise e
 
+def add_column_if_missing(cursor, table, column, definition):
+    """Migrasi sederhana: ALTER TABLE ADD COLUMN jika kolom belum ada"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
 def create_tables():
     """Create tables dengan SQLite"""
     conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        # SQLite schema
-        cursor.execute('''
+        # SQLite schema (kolom enum = kode INTEGER, lihat app/enums.py)
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 username TEXT UNIQUE NOT NULL,
                 email TEXT UNIQUE NOT NULL,
                 password_hash TEXT NOT NULL,
-                role TEXT CHECK (role IN ('mahasiswa', 'dosen')) NOT NULL,
+                role {enums.column_ddl('role')} NOT NULL,
                 nama_lengkap TEXT NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
         
-        cursor.execute('''
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS laporan (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 judul TEXT NOT NULL,
                 deskripsi TEXT NOT NULL,
-                kategori TEXT CHECK (kategori IN ('rusak_berat', 'rusak_ringan')) NOT NULL,
+                kategori {enums.column_ddl('kategori')} NOT NULL,
                 jenis_fasilitas TEXT NOT NULL,
                 lokasi TEXT NOT NULL,
-                prioritas TEXT CHECK (prioritas IN ('tinggi', 'sedang', 'rendah')) NOT NULL,
+                prioritas {enums.column_ddl('prioritas')} NOT NULL,
                 foto_url TEXT,
-                status TEXT CHECK (status IN ('dilaporkan', 'dalam_penanganan', 'selesai', 'ditolak')) DEFAULT 'dilaporkan',
+                status {enums.column_ddl('status')} DEFAULT {enums.code('status', 'dilaporkan')},
                 user_id INTEGER REFERENCES users(id),
                 dosen_id INTEGER REFERENCES users(id),
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -59,22 +70,201 @@ def create_tables():
             )
         ''')
         
-        cursor.execute('''
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS status_history (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 laporan_id INTEGER REFERENCES laporan(id),
-                status TEXT NOT NULL,
+                status {enums.column_ddl('status')} NOT NULL,
                 catatan TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 user_id INTEGER REFERENCES users(id)
             )
         ''')
         
+        # Database lama dengan kolom enum TEXT: bangun ulang tabel ke kode INTEGER (index dan
+        # trigger yang ikut terhapus dibuat lagi di bawah), lalu tabel lookup enum_<kolom>
+        enums.migrate(conn)
+        enums.create_lookup_tables(cursor)
+
+        # Hierarki lokasi hasil normalisasi teks lokasi (lihat app/lokasi.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS locations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                gedung TEXT NOT NULL,
+                lantai TEXT NOT NULL DEFAULT '',
+                ruang TEXT NOT NULL DEFAULT '',
+                UNIQUE (gedung, lantai, ruang)
+            )
+        ''')
+        add_column_if_missing(cursor, "laporan", "location_id", "INTEGER REFERENCES locations(id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_laporan_status_prioritas_location ON laporan (status, prioritas, location_id)")
+
+        # Index untuk job arsip (laporan tertutup per updated_at) dan history per laporan
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_laporan_status_updated ON laporan (status, updated_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_status_history_laporan ON status_history (laporan_id)")
+
+        # Eskalasi prioritas berbasis SLA (app/escalation.py)
+        add_column_if_missing(cursor, "laporan", "escalated_at", "TIMESTAMP")
+        from app.escalation import create_escalation_index, create_system_user
+        create_escalation_index(cursor)
+        create_system_user(cursor)
+
+        # Koordinat opsional + grid geocell untuk query radius/bbox dan heatmap (app/geo.py)
+        add_column_if_missing(cursor, "laporan", "latitude", "REAL")
+        add_column_if_missing(cursor, "laporan", "longitude", "REAL")
+        add_column_if_missing(cursor, "laporan", "geocell", "INTEGER")
+        from app.geo import create_geo_index
+        create_geo_index(cursor)
+
+        # Antrian kerja dosen: lease klaim laporan + index kandidat (app/workqueue.py)
+        add_column_if_missing(cursor, "laporan", "claim_expires_at", "TIMESTAMP")
+        from app.workqueue import create_work_queue_index
+        create_work_queue_index(cursor)
+
+        # Index nama file foto untuk GC upload yatim (app/upload_gc.py)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_laporan_foto_file ON laporan ({FOTO_FILE_EXPR}) WHERE foto_url IS NOT NULL")
+
+        # Counter versi per scope untuk ETag (conditional GET).
+        # Scope: 'laporan' (semua laporan), 'user:<id>' (laporan milik user),
+        # 'laporan:<id>' (detail + history satu laporan)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_counter (
+                scope TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+
+        cursor.executescript('''
+            CREATE TRIGGER IF NOT EXISTS trg_laporan_insert_version AFTER INSERT ON laporan
+            BEGIN
+                INSERT INTO change_counter (scope, version)
+                VALUES ('laporan', 1), ('user:' || NEW.user_id, 1), ('laporan:' || NEW.id, 1)
+                ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_laporan_update_version AFTER UPDATE ON laporan
+            BEGIN
+                INSERT INTO change_counter (scope, version)
+                VALUES ('laporan', 1), ('user:' || NEW.user_id, 1), ('laporan:' || NEW.id, 1)
+                ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_laporan_delete_version AFTER DELETE ON laporan
+            BEGIN
+                INSERT INTO change_counter (scope, version)
+                VALUES ('laporan', 1), ('user:' || OLD.user_id, 1), ('laporan:' || OLD.id, 1)
+                ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_history_insert_version AFTER INSERT ON status_history
+            BEGIN
+                INSERT INTO change_counter (scope, version)
+                VALUES ('laporan:' || NEW.laporan_id, 1)
+                ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+            END;
+        ''')
+
+        # Change log untuk delta sync (GET /laporan/changes).
+        # seq = urutan perubahan monotonik (AUTOINCREMENT, tidak pernah dipakai ulang).
+        # Satu baris per entity: INSERT OR REPLACE memberi seq baru tiap perubahan,
+        # jadi ukuran tabel tetap O(jumlah baris), bukan O(jumlah perubahan).
+        # deleted: 0 = ada, 1 = dihapus, 2 = dipindah ke arsip (app/archive.py, masih bisa dibaca)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                entity TEXT CHECK (entity IN ('laporan', 'status_history')) NOT NULL,
+                entity_id INTEGER NOT NULL,
+                user_id INTEGER,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_change_log_entity ON change_log (entity, entity_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_user_seq ON change_log (user_id, seq)")
+
+        cursor.executescript('''
+            CREATE TRIGGER IF NOT EXISTS trg_laporan_insert_changelog AFTER INSERT ON laporan
+            BEGIN
+                INSERT OR REPLACE INTO change_log (entity, entity_id, user_id, deleted)
+                VALUES ('laporan', NEW.id, NEW.user_id, 0);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_laporan_update_changelog AFTER UPDATE ON laporan
+            BEGIN
+                INSERT OR REPLACE INTO change_log (entity, entity_id, user_id, deleted)
+                VALUES ('laporan', NEW.id, NEW.user_id, 0);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_laporan_delete_changelog AFTER DELETE ON laporan
+            BEGIN
+                INSERT OR REPLACE INTO change_log (entity, entity_id, user_id, deleted)
+                VALUES ('laporan', OLD.id, OLD.user_id, 1);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_history_insert_changelog AFTER INSERT ON status_history
+            BEGIN
+                INSERT OR REPLACE INTO change_log (entity, entity_id, user_id, deleted)
+                VALUES ('status_history', NEW.id, (SELECT user_id FROM laporan WHERE id = NEW.laporan_id), 0);
+            END;
+        ''')
+
+        # Bucket harian untuk trend analytics (lihat app/trends.py)
+        from app.trends import create_trend_tables
+        create_trend_tables(cursor)
+
+        # Slow query log (lihat app/slowlog.py), satu baris per statement fingerprint
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS slow_query_log (
+                fingerprint TEXT PRIMARY KEY,
+                calls INTEGER NOT NULL DEFAULT 0,
+                total_ms REAL NOT NULL DEFAULT 0,
+                max_ms REAL NOT NULL DEFAULT 0,
+                last_rows INTEGER,
+                param_shape TEXT,
+                query_plan TEXT,
+                full_scan INTEGER NOT NULL DEFAULT 0,
+                first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Hasil request dengan header Idempotency-Key (app/idempotency.py), dibuang setelah expires_at
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                user_id INTEGER NOT NULL,
+                key TEXT NOT NULL,
+                route TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending' CHECK(state IN ('pending', 'done')),
+                status_code INTEGER,
+                response TEXT,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (user_id, key)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency_keys (expires_at)")
+
+        # Backfill sekali untuk database lama (hanya jika change_log masih kosong)
+        cursor.execute('''
+            INSERT INTO change_log (entity, entity_id, user_id)
+            SELECT 'laporan', id, user_id FROM laporan
+            WHERE NOT EXISTS (SELECT 1 FROM change_log)
+            ORDER BY updated_at
+        ''')
+        cursor.execute('''
+            INSERT OR IGNORE INTO change_log (entity, entity_id, user_id)
+            SELECT 'status_history', sh.id, l.user_id
+            FROM status_history sh JOIN laporan l ON sh.laporan_id = l.id
+            WHERE NOT EXISTS (SELECT 1 FROM change_log WHERE entity = 'status_history')
+            ORDER BY sh.id
+        ''')
+
         conn.commit()
         print("✅ SQLite tables created successfully!")
-        
-        # Insert sample data for testing
-        insert_sample_data(conn, cursor)
+
+        # Schema shard laporan (jika SHARDS dikonfigurasi) mengikuti schema utama
+        from app.shards import init_shards
+        init_shards()
         
     except Exception as e:
         print(f"❌ Error creating tables: {e}")
@@ -83,11 +273,21 @@ def create_tables():
         cursor.close()
         conn.close()
 
+def seed_sample_data():
+    """Insert sample data (opt-in, lihat settings.SEED_SAMPLE_DATA)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        insert_sample_data(conn, cursor)
+    finally:
+        cursor.close()
+        conn.close()
+
 def insert_sample_data(conn, cursor):
     """Insert sample data untuk testing"""
     try:
-        # Check if users already exist
-        cursor.execute("SELECT COUNT(*) as count FROM users")
+        # Check if users already exist (user sistem id 0 dari create_tables tidak dihitung)
+        cursor.execute("SELECT COUNT(*) as count FROM users WHERE id > 0")
         result = cursor.fetchone()
         user_count = result[0] if result else 0
         
@@ -111,7 +311,7 @@ def insert_sample_data(conn, cursor):
                     
                     cursor.execute(
                         "INSERT OR IGNORE INTO users (username, email, password_hash, role, nama_lengkap) VALUES (?, ?, ?, ?, ?)",
-                        (user[0], user[1], hashed_password, user[3], user[4])
+                        (user[0], user[1], hashed_password, enums.code('role', user[3]), user[4])
                     )
                     print(f"✅ User {user[0]} created")
                 except Exception as e:
@@ -126,9 +326,11 @@ def insert_sample_data(conn, cursor):
             
             for report in sample_reports:
                 try:
+                    judul, deskripsi, kategori, jenis_fasilitas, lokasi, prioritas, foto_url, user_id, status = report
                     cursor.execute(
                         "INSERT INTO laporan (judul, deskripsi, kategori, jenis_fasilitas, lokasi, prioritas, foto_url, user_id, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                        report
+                        (judul, deskripsi, enums.code('kategori', kategori), jenis_fasilitas, lokasi,
+                         enums.code('prioritas', prioritas), foto_url, user_id, enums.code('status', status))
                     )
                 except Exception as e:
                     print(f"Error inserting report: {e}")
@@ -1,12 +1,12 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import time
 from app.config import settings
+from app import metrics
 
 async def send_email(to_email: str, subject: str, body: str):
     """
     Send email menggunakan SMTP
     """
+    started = time.perf_counter()
     try:
         # Jika SMTP tidak dikonfigurasi, skip
         if not settings.SMTP_USERNAME or not settings.SMTP_PASSWORD:
@@ -14,6 +14,11 @@ async def send_email(to_email: str, subject: str, body: str):
             print(f"Subject: {subject}")
             return True
 
+        # Import saat dibutuhkan saja (smtplib/email.mime tidak dimuat saat startup)
+        import smtplib
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+
         msg = MIMEMultipart()
         msg['From'] = settings.SMTP_USERNAME
         msg['To'] = to_email
@@ -27,9 +32,11 @@ async def send_email(to_email: str, subject: str, body: str):
         server.send_message(msg)
         server.quit()
         print(f"✅ Email sent to {to_email}")
+        metrics.email_send_duration.observe(time.perf_counter() - started, ("sent",))
         return True
     except Exception as e:
         print(f"❌ Error sending email: {e}")
+        metrics.email_send_duration.observe(time.perf_counter() - started, ("error",))
         return False
 
 async def send_status_notification(email: str, laporan_id: int, status: str, catatan: str = None):
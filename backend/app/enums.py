@@ -0,0 +1,266 @@
+import argparse
+import time
+
+# Kolom enum (status, kategori, prioritas, role) disimpan sebagai kode INTEGER kecil, bukan
+# TEXT berulang seperti 'dalam_penanganan' di setiap baris dan setiap entry index. Kode
+# = posisi nama di tuple di bawah (mulai 1); nama baru hanya boleh ditambahkan di akhir.
+# Tabel lookup enum_<kolom> (code, name) menyimpan pemetaan yang sama di database.
+# API tetap memakai nama: nilai di-encode saat ditulis (code/codes) dan baris hasil query
+# di-decode di boundary (execute_query, arsip, geo, group commit), jadi schema response
+# tidak berubah. Database lama dimigrasi sekali oleh create_tables() (atau
+# `python -m app.enums --migrate`): tabel dibangun ulang dengan kolom INTEGER dan baris
+# disalin per batch.
+
+STATUS = ("dilaporkan", "dalam_penanganan", "selesai", "ditolak")
+KATEGORI = ("rusak_ringan", "rusak_berat")
+PRIORITAS = ("rendah", "sedang", "tinggi")
+ROLE = ("mahasiswa", "dosen")
+
+ENUMS = {"status": STATUS, "kategori": KATEGORI, "prioritas": PRIORITAS, "role": ROLE}
+CODES = {column: {name: i + 1 for i, name in enumerate(names)} for column, names in ENUMS.items()}
+NAMES = {column: {i + 1: name for i, name in enumerate(names)} for column, names in ENUMS.items()}
+
+# Tabel (per database laporan/shard) dan kolom enum-nya
+TABLE_COLUMNS = {
+    "users": ("role",),
+    "laporan": ("kategori", "prioritas", "status"),
+    "status_history": ("status",),
+}
+MIGRATE_BATCH_SIZE = 5000
+
+def code(column: str, name):
+    """Nama -> kode; nilai tidak dikenal dikembalikan apa adanya (ditolak CHECK constraint)"""
+    return CODES[column].get(name, name)
+
+def codes(column: str, names) -> tuple:
+    return tuple(code(column, name) for name in names)
+
+def name(column: str, value):
+    """Kode -> nama; nilai lain (mis. baris lama yang masih TEXT) dikembalikan apa adanya"""
+    return NAMES[column].get(value, value)
+
+def sql_codes(column: str, names) -> str:
+    """Literal SQL untuk IN (...): ('selesai', 'ditolak') -> '3, 4'"""
+    return ", ".join(str(CODES[column][n]) for n in names)
+
+def sql_name(column: str, expr: str) -> str:
+    """Ekspresi SQL yang menerjemahkan kode di `expr` ke nama (untuk nilai yang disimpan sebagai teks)"""
+    cases = " ".join(f"WHEN {c} THEN '{n}'" for c, n in NAMES[column].items())
+    return f"(CASE {expr} {cases} ELSE {expr} END)"
+
+def column_ddl(column: str) -> str:
+    """Tipe + CHECK kolom enum untuk CREATE TABLE"""
+    return f"INTEGER CHECK ({column} IN ({', '.join(str(c) for c in NAMES[column])}))"
+
+# ==================== DECODE ====================
+
+def to_dicts(columns, rows):
+    """Baris hasil query -> list dict, kolom enum diterjemahkan ke nama"""
+    enum_columns = [(i, NAMES[column]) for i, column in enumerate(columns) if column in NAMES]
+    if not enum_columns:
+        return [dict(zip(columns, row)) for row in rows]
+    results = []
+    for row in rows:
+        values = list(row)
+        for i, names in enum_columns:
+            values[i] = names.get(values[i], values[i])
+        results.append(dict(zip(columns, values)))
+    return results
+
+def decode(row: dict) -> dict:
+    """Terjemahkan kolom enum satu dict baris (in place)"""
+    for column, names in NAMES.items():
+        if column in row:
+            row[column] = names.get(row[column], row[column])
+    return row
+
+# ==================== SCHEMA & MIGRASI ====================
+
+def create_lookup_tables(cursor, schema: str = "main"):
+    """Tabel enum_<kolom> (code, name), dipanggil dari database.create_tables() dan arsip"""
+    for column, names in NAMES.items():
+        cursor.execute(
+            f"""CREATE TABLE IF NOT EXISTS {schema}.enum_{column} (
+                    code INTEGER PRIMARY KEY,
+                    name TEXT UNIQUE NOT NULL
+                )"""
+        )
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO {schema}.enum_{column} (code, name) VALUES (?, ?)", names.items()
+        )
+
+def _case(column: str) -> str:
+    """Ekspresi salin baris lama: nama TEXT -> kode, nilai yang sudah kode dibiarkan"""
+    cases = " ".join(f"WHEN '{n}' THEN {c}" for n, c in CODES[column].items())
+    return f"CASE {column} {cases} ELSE {column} END"
+
+def _split_columns(body: str):
+    """Isi kurung CREATE TABLE -> definisi kolom/constraint (pisah koma di luar kurung)"""
+    parts, depth, current = [], 0, []
+    for char in body:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current).strip())
+    return parts
+
+def _new_table_sql(conn, table: str, new_table: str) -> str:
+    """CREATE TABLE `new_table` dari definisi `table` dengan kolom enum diganti INTEGER"""
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+    info = {row[1]: row for row in conn.execute(f"PRAGMA table_info({table})")}
+    start, end = sql.index("("), sql.rindex(")")
+    definitions = []
+    for definition in _split_columns(sql[start + 1:end]):
+        column = definition.split()[0].strip('"`[]')
+        if column in TABLE_COLUMNS[table]:
+            _, _, _, notnull, default, _ = info[column]
+            definition = f"{column} {column_ddl(column)}"
+            if notnull:
+                definition += " NOT NULL"
+            if default is not None:
+                definition += f" DEFAULT {code(column, default.strip(chr(39)))}"
+        definitions.append(definition)
+    return f"CREATE TABLE {new_table} (\n    " + ",\n    ".join(definitions) + "\n)" + sql[end + 1:]
+
+def needs_migration(conn, table: str) -> bool:
+    """True jika salah satu kolom enum tabel masih bertipe TEXT"""
+    types = {row[1]: row[2].upper() for row in conn.execute(f"PRAGMA table_info({table})")}
+    return any(types.get(column) == "TEXT" for column in TABLE_COLUMNS[table])
+
+def migrate_table(conn, table: str, batch_size: int = MIGRATE_BATCH_SIZE, verbose: bool = True) -> int:
+    """
+    Bangun ulang `table` dengan kolom enum INTEGER: salin baris per batch (urut id, bisa
+    dilanjutkan jika terputus) ke tabel baru, lalu DROP + RENAME dalam satu transaksi.
+    Index dan trigger tabel ikut terhapus dan dibuat ulang oleh create_tables().
+    Jalankan saat aplikasi tidak melayani tulis (startup / maintenance).
+    """
+    new_table = f"{table}__enum_new"
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    select = ", ".join(_case(c) if c in TABLE_COLUMNS[table] else c for c in columns)
+    column_list = ", ".join(columns)
+
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (new_table,)).fetchone():
+        conn.execute(_new_table_sql(conn, table, new_table))
+        conn.commit()
+
+    copied = 0
+    last_id = conn.execute(f"SELECT COALESCE(MAX(id), -1) FROM {new_table}").fetchone()[0]
+    while True:
+        moved = conn.execute(
+            f"""INSERT INTO {new_table} ({column_list})
+                SELECT {select} FROM {table} WHERE id > ? ORDER BY id LIMIT ?""",
+            (last_id, batch_size)
+        ).rowcount
+        conn.commit()
+        if not moved:
+            break
+        copied += moved
+        last_id = conn.execute(f"SELECT MAX(id) FROM {new_table}").fetchone()[0]
+        if verbose:
+            print(f"  {table}: {copied} baris disalin")
+
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+        # AUTOINCREMENT tidak boleh mundur (id yang sudah diarsipkan / rentang id shard)
+        if seq is not None:
+            updated = conn.execute(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (seq[0], table)
+            ).rowcount
+            if not updated:
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, seq[0]))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF")
+    return copied
+
+def migrate(conn, tables=tuple(TABLE_COLUMNS), batch_size: int = MIGRATE_BATCH_SIZE, verbose: bool = True) -> dict:
+    """Migrasi tabel enum yang masih TEXT di koneksi ini (database utama atau shard)"""
+    pending = [
+        table for table in tables
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        and needs_migration(conn, table)
+    ]
+    if not pending:
+        return {}
+    conn.commit()
+    # DROP TABLE dengan foreign key aktif akan menghapus/menolak baris yang mereferensikannya
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = OFF")
+    stats = {}
+    started = time.perf_counter()
+    try:
+        for table in pending:
+            stats[table] = migrate_table(conn, table, batch_size, verbose)
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {'ON' if foreign_keys else 'OFF'}")
+    if verbose:
+        print(f"✅ Migrasi enum selesai dalam {time.perf_counter() - started:.1f} detik: {stats}")
+    return stats
+
+def migrate_archive(conn, batch_size: int = MIGRATE_BATCH_SIZE):
+    """
+    Arsip (ATTACH sebagai `archive`, kolom tanpa tipe): ubah nilai TEXT lama ke kode per batch.
+    Tabel lookup di arsip menandai arsip yang sudah memakai kode.
+    """
+    if conn.execute("SELECT 1 FROM archive.sqlite_master WHERE name = 'enum_status'").fetchone():
+        return
+    for table in ("laporan", "status_history"):
+        enum_columns = TABLE_COLUMNS[table]
+        assignments = ", ".join(f"{column} = {_case(column)}" for column in enum_columns)
+        while True:
+            updated = conn.execute(
+                f"""UPDATE archive.{table} SET {assignments}
+                    WHERE id IN (SELECT id FROM archive.{table} WHERE typeof(status) = 'text' LIMIT ?)""",
+                (batch_size,)
+            ).rowcount
+            conn.commit()
+            if not updated:
+                break
+    create_lookup_tables(conn, "archive")
+    conn.commit()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kode integer untuk kolom status/kategori/prioritas/role")
+    parser.add_argument("--migrate", action="store_true", help="Migrasi database utama, shard dan arsip")
+    parser.add_argument("--batch-size", type=int, default=MIGRATE_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    if not args.migrate:
+        for column, names in NAMES.items():
+            print(f"{column}: " + ", ".join(f"{c}={n}" for c, n in names.items()))
+        return
+
+    from app import archive, shards
+    for shard in shards.SHARDS:
+        conn = shards.connect(shard)
+        try:
+            tables = tuple(TABLE_COLUMNS) if shard.index == 0 else shards.SHARDED_TABLES
+            migrate(conn, tables, args.batch_size)
+        finally:
+            conn.close()
+    if archive.archive_exists():
+        conn = shards.connect(shards.SHARDS[0])
+        try:
+            with archive.attach(conn):
+                migrate_archive(conn, args.batch_size)
+        finally:
+            conn.close()
+    # Index/trigger tabel yang dibangun ulang dibuat kembali
+    from app.database import create_tables
+    create_tables()
+
+if __name__ == "__main__":
+    main()
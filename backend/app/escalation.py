@@ -0,0 +1,184 @@
+import argparse
+import asyncio
+import secrets
+import time
+
+from app import auth, enums, locks, metrics, shards
+from app.config import settings
+from app.database import get_connection
+
+# Eskalasi prioritas otomatis berdasarkan SLA: laporan yang masih terbuka lebih lama dari
+# batas SLA prioritasnya dinaikkan satu tingkat (rendah -> sedang -> tinggi) dan dicatat
+# di status_history oleh user "sistem". Umur dihitung dari eskalasi terakhir (escalated_at)
+# atau created_at, memakai partial index idx_laporan_open_escalation.
+# Setiap batch = satu transaksi pendek (SELECT id + INSERT history + UPDATE berbasis set),
+# dengan jeda antar batch supaya aman dijalankan saat aplikasi melayani request.
+
+OPEN_STATUSES_SQL = f"({enums.sql_codes('status', ('dilaporkan', 'dalam_penanganan'))})"
+NEXT_PRIORITAS = {"sedang": "tinggi", "rendah": "sedang"}
+AGE_EXPR = "COALESCE(escalated_at, created_at)"
+
+# Username/email dicadangkan: user ini dibuat oleh create_tables() dan ditolak di /register,
+# jadi tidak bisa diambil alih dengan mendaftar sebagai "sistem"
+SYSTEM_USERNAME = "sistem"
+SYSTEM_EMAIL = "sistem@civitasfix.local"
+
+escalation_run_duration = metrics.registry.register(metrics.Histogram(
+    "civitasfix_sla_escalation_run_duration_seconds", "Durasi satu run eskalasi SLA"
+))
+escalation_escalated_total = metrics.registry.register(metrics.Counter(
+    "civitasfix_sla_escalated_total", "Laporan yang prioritasnya dinaikkan karena SLA", ("from", "to")
+))
+
+def parse_sla_hours(text: str) -> dict:
+    """'rendah=168,sedang=72' -> {'rendah': 168.0, 'sedang': 72.0}"""
+    thresholds = {}
+    for item in (text or "").split(","):
+        prioritas, _, hours = item.strip().partition("=")
+        if prioritas in NEXT_PRIORITAS and hours:
+            thresholds[prioritas] = float(hours)
+    return thresholds
+
+def create_escalation_index(cursor):
+    """Dipanggil dari database.create_tables()"""
+    cursor.execute(
+        f"""CREATE INDEX IF NOT EXISTS idx_laporan_open_escalation
+            ON laporan (prioritas, {AGE_EXPR})
+            WHERE status IN {OPEN_STATUSES_SQL}"""
+    )
+
+def create_system_user(cursor):
+    """Dipanggil dari database.create_tables(): user "sistem" untuk status_history eskalasi (password acak)"""
+    row = cursor.execute("SELECT email FROM users WHERE username = ?", (SYSTEM_USERNAME,)).fetchone()
+    if row is None:
+        # id 0: di luar urutan AUTOINCREMENT, jadi id user biasa (dan data sample) tidak bergeser
+        cursor.execute(
+            """INSERT INTO users (id, username, email, password_hash, role, nama_lengkap)
+               VALUES (0, ?, ?, ?, ?, ?)""",
+            (SYSTEM_USERNAME, SYSTEM_EMAIL, auth.hash_password(secrets.token_urlsafe(32)),
+             enums.code("role", "dosen"), "Sistem (Eskalasi SLA)")
+        )
+    elif row[0] != SYSTEM_EMAIL:
+        print(f"⚠️  Username '{SYSTEM_USERNAME}' sudah dipakai akun biasa; eskalasi SLA tidak berjalan "
+              f"sampai akun tersebut diganti namanya")
+
+def is_reserved(username: str, email: str = None) -> bool:
+    return username == SYSTEM_USERNAME or email == SYSTEM_EMAIL
+
+def system_user_id(conn) -> int:
+    """Id user "sistem" (dicocokkan username + email cadangan, bukan username saja)"""
+    row = conn.execute(
+        "SELECT id FROM users WHERE username = ? AND email = ?", (SYSTEM_USERNAME, SYSTEM_EMAIL)
+    ).fetchone()
+    if row is None:
+        raise RuntimeError(f"User '{SYSTEM_USERNAME}' tidak ditemukan, jalankan create_tables()")
+    return row[0]
+
+def escalate_batch(conn, prioritas: str, hours: float, batch_size: int, user_id: int) -> int:
+    """Naikkan prioritas maksimal `batch_size` laporan dalam satu transaksi; return jumlah baris"""
+    target = NEXT_PRIORITAS[prioritas]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        ids = [row[0] for row in conn.execute(
+            f"""SELECT id FROM laporan
+                WHERE status IN {OPEN_STATUSES_SQL}
+                  AND prioritas = ?
+                  AND {AGE_EXPR} < datetime('now', ?)
+                LIMIT ?""",
+            (enums.code("prioritas", prioritas), f"{-hours} hours", batch_size)
+        )]
+        if not ids:
+            conn.rollback()
+            return 0
+
+        placeholders = ",".join("?" * len(ids))
+        catatan = f"Prioritas otomatis dinaikkan dari {prioritas} ke {target} (SLA {hours:g} jam terlampaui)"
+        conn.execute(
+            f"""INSERT INTO status_history (laporan_id, status, catatan, user_id)
+                SELECT id, status, ?, ? FROM laporan WHERE id IN ({placeholders})""",
+            [catatan, user_id] + ids
+        )
+        conn.execute(
+            f"""UPDATE laporan SET prioritas = ?, escalated_at = datetime('now')
+                WHERE id IN ({placeholders})""",
+            [enums.code("prioritas", target)] + ids
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    escalation_escalated_total.inc((prioritas, target), len(ids))
+    return len(ids)
+
+def run(sla_hours: dict = None, batch_size: int = None, pause_seconds: float = 0.05, verbose: bool = True):
+    """Satu run eskalasi untuk semua tingkat prioritas; return statistik"""
+    sla_hours = parse_sla_hours(settings.SLA_HOURS) if sla_hours is None else sla_hours
+    batch_size = batch_size or settings.SLA_ESCALATION_BATCH_SIZE
+
+    stats = {"escalated": {}, "batches": 0, "seconds": 0.0}
+    started = time.perf_counter()
+    try:
+        primary = get_connection()
+        try:
+            user_id = system_user_id(primary)
+        finally:
+            primary.close()
+
+        for shard in shards.SHARDS:
+            conn = shards.connect(shard)
+            # Autocommit: transaksi diatur eksplisit per batch dengan BEGIN IMMEDIATE
+            conn.isolation_level = None
+            try:
+                # sedang -> tinggi lebih dulu supaya laporan yang baru naik ke sedang tidak langsung naik lagi
+                for prioritas in ("sedang", "rendah"):
+                    hours = sla_hours.get(prioritas)
+                    if hours is None:
+                        continue
+                    key = f"{prioritas}->{NEXT_PRIORITAS[prioritas]}"
+                    stats["escalated"].setdefault(key, 0)
+                    while True:
+                        count = escalate_batch(conn, prioritas, hours, batch_size, user_id)
+                        if not count:
+                            break
+                        stats["escalated"][key] += count
+                        stats["batches"] += 1
+                        if count < batch_size:
+                            break
+                        if pause_seconds:
+                            time.sleep(pause_seconds)
+            finally:
+                conn.close()
+    finally:
+        elapsed = time.perf_counter() - started
+        escalation_run_duration.observe(elapsed)
+
+    stats["seconds"] = round(elapsed, 3)
+    if verbose and any(stats["escalated"].values()):
+        print(f"⏫ Eskalasi SLA: {stats}")
+    return stats
+
+async def run_periodically(interval_minutes: float):
+    """
+    Task background (dijalankan dari startup_event); run berjalan di thread pool.
+    Task ada di setiap worker, tapi lock file membuat hanya satu worker yang menjalankan run per interval.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(min(interval_minutes * 60, 300))
+        try:
+            await loop.run_in_executor(None, locks.run_if_due, "sla_escalation", interval_minutes, run)
+        except Exception as e:
+            print(f"SLA escalation error: {e}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Naikkan prioritas laporan terbuka yang melewati SLA")
+    parser.add_argument("--sla", default=settings.SLA_HOURS, help="Batas jam per prioritas, contoh rendah=168,sedang=72")
+    parser.add_argument("--batch-size", type=int, default=settings.SLA_ESCALATION_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=0.05, help="Jeda antar batch (detik)")
+    args = parser.parse_args(argv)
+
+    stats = run(parse_sla_hours(args.sla), args.batch_size, args.pause, verbose=False)
+    print(f"✅ Eskalasi selesai: {stats}")
+
+if __name__ == "__main__":
+    main()
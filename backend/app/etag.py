@@ -0,0 +1,38 @@
+from fastapi import Request, Response
+
+# Validator murah untuk conditional GET.
+# Versi per scope dijaga oleh trigger di tabel change_counter (lihat database.create_tables),
+# jadi cek ETag cukup 1 lookup primary key tanpa query/serialisasi data laporan.
+
+def get_version(conn, scope: str) -> int:
+    """Ambil versi terakhir untuk sebuah scope (0 jika belum pernah berubah)"""
+    row = conn.execute("SELECT version FROM change_counter WHERE scope = ?", (scope,)).fetchone()
+    return row[0] if row else 0
+
+def make_etag(scope: str, version: int) -> str:
+    """Bentuk ETag dari scope + versi"""
+    return f'"{scope}-v{version}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Cek header If-None-Match (mendukung daftar ETag, weak ETag dan '*')"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+def set_etag(response: Response, etag: str):
+    """Pasang ETag + Cache-Control supaya client selalu revalidate"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+def not_modified(etag: str) -> Response:
+    """Response 304 tanpa body"""
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
@@ -0,0 +1,191 @@
+import math
+
+from app import enums, shards
+
+# Koordinat laporan (latitude/longitude opsional) dengan index grid.
+# Setiap laporan berkoordinat diberi geocell = kode Morton (bit x/y diselang-seling) dari tile
+# Web Mercator di zoom GRID_ZOOM (~38 m di ekuator). Tile di zoom z <= GRID_ZOOM adalah satu
+# rentang geocell yang berurutan, sehingga:
+# - query bbox/radius = beberapa range scan pada index geocell + filter koordinat exact
+# - heatmap per tile zoom z = GROUP BY geocell >> (2 * (GRID_ZOOM - z)) dari covering index,
+#   client menerima agregat per tile, bukan setiap baris laporan.
+# Bbox yang melewati antimeridian (min_lng > max_lng) tidak didukung.
+
+GRID_ZOOM = 20
+MAX_LAT = 85.05112878  # batas Web Mercator
+EARTH_RADIUS_M = 6371008.8
+# Maksimal range geocell per query (bbox dipecah menjadi tile di zoom yang cukup kasar)
+MAX_RANGES = 16
+
+OPEN_STATUSES = ("dilaporkan", "dalam_penanganan")
+
+def validate(latitude, longitude):
+    """Raise ValueError jika koordinat tidak lengkap atau di luar rentang"""
+    if (latitude is None) != (longitude is None):
+        raise ValueError("latitude dan longitude harus diisi bersamaan")
+    if latitude is None:
+        return
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        raise ValueError("Koordinat di luar rentang (latitude -90..90, longitude -180..180)")
+
+def to_tile(latitude: float, longitude: float, zoom: int):
+    """Koordinat -> (x, y) tile Web Mercator di zoom tertentu"""
+    n = 1 << zoom
+    lat = math.radians(max(-MAX_LAT, min(MAX_LAT, latitude)))
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1.0 - math.log(math.tan(lat) + 1 / math.cos(lat)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+def tile_bounds(zoom: int, x: int, y: int):
+    """(min_lat, min_lng, max_lat, max_lng) sebuah tile"""
+    n = 1 << zoom
+
+    def lat(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    return lat(y + 1), x / n * 360.0 - 180.0, lat(y), (x + 1) / n * 360.0 - 180.0
+
+def interleave(x: int, y: int) -> int:
+    code = 0
+    for bit in range(GRID_ZOOM):
+        code |= ((x >> bit) & 1) << (2 * bit) | ((y >> bit) & 1) << (2 * bit + 1)
+    return code
+
+def deinterleave(code: int):
+    x = y = 0
+    for bit in range(GRID_ZOOM):
+        x |= ((code >> (2 * bit)) & 1) << bit
+        y |= ((code >> (2 * bit + 1)) & 1) << bit
+    return x, y
+
+def geocell(latitude, longitude):
+    """Kode grid untuk kolom laporan.geocell (None jika tanpa koordinat)"""
+    if latitude is None or longitude is None:
+        return None
+    return interleave(*to_tile(latitude, longitude, GRID_ZOOM))
+
+def cell_ranges(min_lat: float, min_lng: float, max_lat: float, max_lng: float, max_ranges: int = MAX_RANGES):
+    """Rentang geocell (inklusif) yang menutupi bbox, memakai zoom terbesar dengan <= max_ranges tile"""
+    for zoom in range(GRID_ZOOM, -1, -1):
+        x0, y0 = to_tile(max_lat, min_lng, zoom)
+        x1, y1 = to_tile(min_lat, max_lng, zoom)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= max_ranges or zoom == 0:
+            break
+    shift = 2 * (GRID_ZOOM - zoom)
+    starts = sorted(interleave(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+    ranges = []
+    for code in starts:
+        low, high = code << shift, ((code + 1) << shift) - 1
+        if ranges and ranges[-1][1] + 1 == low:
+            ranges[-1][1] = high
+        else:
+            ranges.append([low, high])
+    return [tuple(r) for r in ranges]
+
+def distance_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Jarak haversine dalam meter"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlmb = phi2 - phi1, math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+def radius_bbox(latitude: float, longitude: float, radius_m: float):
+    """Bbox yang memuat lingkaran radius_m di sekitar titik"""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlng = dlat / max(math.cos(math.radians(latitude)), 1e-6)
+    return (max(-90.0, latitude - dlat), max(-180.0, longitude - dlng),
+            min(90.0, latitude + dlat), min(180.0, longitude + dlng))
+
+def create_geo_index(cursor):
+    """Dipanggil dari database.create_tables(); covering untuk query bbox dan heatmap"""
+    cursor.execute(
+        """CREATE INDEX IF NOT EXISTS idx_laporan_geocell
+           ON laporan (geocell, latitude, longitude, status, prioritas)
+           WHERE geocell IS NOT NULL"""
+    )
+
+def _where(bbox, statuses):
+    min_lat, min_lng, max_lat, max_lng = bbox
+    ranges = cell_ranges(min_lat, min_lng, max_lat, max_lng)
+    conditions = [
+        "geocell IS NOT NULL",
+        "(" + " OR ".join("geocell BETWEEN ? AND ?" for _ in ranges) + ")",
+        "latitude BETWEEN ? AND ?",
+        "longitude BETWEEN ? AND ?",
+    ]
+    params = [value for r in ranges for value in r] + [min_lat, max_lat, min_lng, max_lng]
+    if statuses:
+        conditions.append(f"status IN ({','.join('?' * len(statuses))})")
+        params.extend(enums.codes("status", statuses))
+    return " AND ".join(conditions), params
+
+def in_bbox(conn, bbox, statuses=None, limit: int = 500):
+    """Laporan di dalam bbox (satu shard), terbaru dulu"""
+    where, params = _where(bbox, statuses)
+    cursor = conn.execute(
+        f"SELECT * FROM laporan WHERE {where} ORDER BY created_at DESC LIMIT ?", params + [limit]
+    )
+    return enums.to_dicts([desc[0] for desc in cursor.description], cursor.fetchall())
+
+def search(primary_conn, bbox=None, center=None, radius_m=None, statuses=None, limit: int = 500):
+    """
+    Laporan di semua shard dalam bbox, atau dalam radius_m dari center (lat, lng) dengan
+    field distance_m, urut jarak terdekat.
+    """
+    if center is not None:
+        bbox = radius_bbox(center[0], center[1], radius_m)
+
+        def load(conn):
+            nearby = []
+            for laporan in in_bbox(conn, bbox, statuses, limit=1000000):
+                distance = distance_m(center[0], center[1], laporan['latitude'], laporan['longitude'])
+                if distance <= radius_m:
+                    nearby.append({**laporan, 'distance_m': round(distance, 1)})
+            return sorted(nearby, key=lambda laporan: laporan['distance_m'])[:limit]
+
+        results = shards.fan_out(load, primary_conn)
+        return shards.merge_sorted(results, key=lambda laporan: laporan['distance_m'], reverse=False, limit=limit)
+
+    results = shards.fan_out(lambda conn: in_bbox(conn, bbox, statuses, limit), primary_conn)
+    return shards.merge_sorted(results, key=lambda laporan: laporan['created_at'], limit=limit)
+
+def heatmap(primary_conn, zoom: int, bbox=None, statuses=None):
+    """
+    Jumlah laporan per tile (zoom, x, y) beserta titik tengah rata-rata, dihitung di setiap
+    shard dengan GROUP BY pada geocell lalu digabung.
+    """
+    zoom = max(0, min(GRID_ZOOM, zoom))
+    shift = 2 * (GRID_ZOOM - zoom)
+    bbox = bbox or (-90.0, -180.0, 90.0, 180.0)
+    where, params = _where(bbox, statuses)
+
+    def load(conn):
+        return conn.execute(
+            f"""SELECT geocell >> ? AS tile, COUNT(*) AS total,
+                       SUM(status IN ({enums.sql_codes('status', OPEN_STATUSES)})) AS open,
+                       SUM(prioritas = {enums.code('prioritas', 'tinggi')}) AS tinggi,
+                       SUM(latitude) AS sum_lat, SUM(longitude) AS sum_lng
+                FROM laporan WHERE {where}
+                GROUP BY tile""",
+            [shift] + params
+        ).fetchall()
+
+    tiles = {}
+    for rows in shards.fan_out(load, primary_conn):
+        for tile, total, open_count, tinggi, sum_lat, sum_lng in rows:
+            merged = tiles.setdefault(tile, [0, 0, 0, 0.0, 0.0])
+            merged[0] += total
+            merged[1] += open_count
+            merged[2] += tinggi
+            merged[3] += sum_lat
+            merged[4] += sum_lng
+
+    result = []
+    for tile, (total, open_count, tinggi, sum_lat, sum_lng) in sorted(tiles.items()):
+        x, y = deinterleave(tile)
+        result.append({
+            "zoom": zoom, "x": x, "y": y,
+            "total": total, "open": open_count, "tinggi": tinggi,
+            "latitude": round(sum_lat / total, 6), "longitude": round(sum_lng / total, 6),
+        })
+    return result
@@ -0,0 +1,162 @@
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import enums, metrics, shards
+from app.config import settings
+
+# Group commit untuk burst pembuatan laporan (opsional, GROUP_COMMIT_ENABLED=1).
+# Tanpa mode ini setiap POST /laporan = satu transaksi + satu fsync, dan request yang datang
+# bersamaan saling menunggu write lock SQLite. Di mode ini satu writer per shard mengumpulkan
+# insert yang masuk selama maksimal GROUP_COMMIT_MAX_DELAY_MS (atau sampai GROUP_COMMIT_MAX_BATCH
+# baris), menulis semuanya dalam satu transaksi, lalu mengembalikan baris baru ke tiap pemanggil.
+# Latency tambahan per insert dibatasi max delay + durasi satu commit.
+# Setiap baris memakai SAVEPOINT sendiri: baris yang gagal (mis. constraint) hanya
+# menggagalkan pemanggilnya, bukan seluruh batch.
+
+group_commit_batch_size = metrics.registry.register(metrics.Histogram(
+    "civitasfix_group_commit_batch_size", "Jumlah insert per transaksi group commit", ("table",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+))
+group_commit_duration = metrics.registry.register(metrics.Histogram(
+    "civitasfix_group_commit_duration_seconds", "Durasi satu transaksi group commit", ("table",)
+))
+group_commit_wait = metrics.registry.register(metrics.Histogram(
+    "civitasfix_group_commit_wait_seconds", "Waktu dari submit sampai baris ter-commit", ("table",)
+))
+
+class GroupCommitWriter:
+    """Writer untuk satu shard; semua transaksi dijalankan di satu thread dengan koneksi sendiri"""
+
+    def __init__(self, shard, max_delay_ms: float = None, max_batch: int = None):
+        self.shard = shard
+        self.max_delay = (settings.GROUP_COMMIT_MAX_DELAY_MS if max_delay_ms is None else max_delay_ms) / 1000
+        self.max_batch = max_batch or settings.GROUP_COMMIT_MAX_BATCH
+        self.loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._full = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"group-commit-{shard.name}")
+        self._conn = None
+        self._task = asyncio.create_task(self._run())
+
+    async def insert(self, table: str, values: dict) -> dict:
+        """Antrekan INSERT; return baris baru (dict) setelah transaksinya ter-commit"""
+        future = self.loop.create_future()
+        self._queue.put_nowait((table, values, future, time.perf_counter()))
+        if self._queue.qsize() >= self.max_batch:
+            self._full.set()
+        return await future
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            # Tunggu insert lain sampai max delay, kecuali batch sudah penuh lebih dulu
+            if self.max_delay > 0 and self._queue.qsize() < self.max_batch - 1:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            while len(batch) < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    # close(): batch terakhir tetap di-commit
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                results = await self.loop.run_in_executor(
+                    self._executor, self._commit, [(table, values) for table, values, _, _ in batch]
+                )
+            except Exception as e:
+                results = [e] * len(batch)
+
+            committed = time.perf_counter()
+            for (table, _, future, submitted), result in zip(batch, results):
+                group_commit_wait.observe(committed - submitted, (table,))
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = shards.connect(self.shard)
+            # Autocommit: transaksi diatur eksplisit per batch
+            self._conn.isolation_level = None
+        return self._conn
+
+    def _commit(self, items):
+        """Jalankan satu batch insert dalam satu transaksi (di thread writer)"""
+        conn = self._connection()
+        started = time.perf_counter()
+        results = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table, values in items:
+                columns = ", ".join(values)
+                placeholders = ", ".join("?" * len(values))
+                conn.execute("SAVEPOINT group_row")
+                try:
+                    row = conn.execute(
+                        f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) RETURNING *",
+                        tuple(values.values())
+                    ).fetchone()
+                    results.append(enums.decode(dict(row)))
+                except sqlite3.Error as e:
+                    conn.execute("ROLLBACK TO group_row")
+                    results.append(e)
+                conn.execute("RELEASE group_row")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            table = items[0][0]
+            group_commit_batch_size.observe(len(items), (table,))
+            group_commit_duration.observe(elapsed, (table,))
+            metrics.observe_query(f"INSERT INTO {table} (group commit)", elapsed)
+        return results
+
+    async def close(self):
+        """Selesaikan insert yang masih antre lalu hentikan writer"""
+        self._queue.put_nowait(None)
+        self._full.set()
+        await self._task
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._executor.submit(conn.close).result()
+        self._executor.shutdown(wait=False)
+
+_writers = {}
+
+def enabled() -> bool:
+    return settings.GROUP_COMMIT_ENABLED
+
+def get_writer(shard) -> GroupCommitWriter:
+    """Writer shard untuk event loop yang sedang berjalan (dibuat saat insert pertama)"""
+    writer = _writers.get(shard.index)
+    if writer is None or writer.loop is not asyncio.get_running_loop():
+        writer = _writers[shard.index] = GroupCommitWriter(shard)
+    return writer
+
+async def insert(shard, table: str, values: dict) -> dict:
+    return await get_writer(shard).insert(table, values)
+
+async def close():
+    """Dipanggil dari shutdown_event"""
+    writers = list(_writers.values())
+    _writers.clear()
+    loop = asyncio.get_running_loop()
+    for writer in writers:
+        if writer.loop is loop:
+            await writer.close()
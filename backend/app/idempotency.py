@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import json
+import time
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+
+from app import metrics
+from app.config import settings
+
+# Idempotency-Key untuk request tulis yang sering di-retry frontend (POST /laporan,
+# PUT /laporan/{id}/status). Eksekusi pertama menandai key 'pending' di tabel
+# idempotency_keys (per user), lalu menyimpan response-nya; request ulang dengan key yang
+# sama me-replay response tersimpan tanpa eksekusi ulang (tanpa laporan/foto/history/email
+# ganda). Duplikat yang datang saat eksekusi pertama masih berjalan menunggu hasilnya.
+# Key dengan isi request berbeda (termasuk isi file foto) ditolak 422. Hasil disimpan IDEMPOTENCY_TTL_HOURS.
+
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.05
+PURGE_INTERVAL = 300
+
+idempotency_requests_total = metrics.registry.register(metrics.Counter(
+    "civitasfix_idempotency_requests_total", "Request dengan header Idempotency-Key", ("route", "result")
+))
+
+# Duplikat di worker yang sama dibangunkan lewat event; antar worker lewat polling tabel
+_events = {}
+_last_purge = 0.0
+
+def fingerprint(*parts) -> str:
+    """Hash isi request supaya key yang dipakai ulang untuk request lain bisa dideteksi"""
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+
+async def upload_digest(upload, chunk_size: int = 1024 * 1024):
+    """'<ukuran>:<sha256>' isi file upload untuk fingerprint; file di-seek kembali ke awal untuk disimpan"""
+    if upload is None or not upload.filename:
+        return None
+    digest = hashlib.sha256()
+    size = 0
+    while chunk := await upload.read(chunk_size):
+        digest.update(chunk)
+        size += len(chunk)
+    await upload.seek(0)
+    return f"{size}:{digest.hexdigest()}"
+
+class Idempotency:
+    """Hasil begin(): `replay` berisi response tersimpan, atau None jika request ini yang mengeksekusi"""
+
+    def __init__(self, conn=None, user_id=None, key=None, route=None, replay=None):
+        self.conn = conn
+        self.user_id = user_id
+        self.key = key
+        self.route = route
+        self.replay = replay
+
+    def store(self, body, status_code: int = 200):
+        """Simpan response eksekusi pertama (body sudah berupa data JSON)"""
+        if self.key is None:
+            return
+        self.conn.execute(
+            """UPDATE idempotency_keys SET state = 'done', status_code = ?, response = ?
+               WHERE user_id = ? AND key = ?""",
+            (status_code, json.dumps(body), self.user_id, self.key)
+        )
+        self.conn.commit()
+        self._wake()
+
+    def release(self):
+        """Eksekusi gagal: hapus tanda pending supaya retry berikutnya dieksekusi ulang"""
+        if self.key is None:
+            return
+        try:
+            self.conn.rollback()
+            self.conn.execute(
+                "DELETE FROM idempotency_keys WHERE user_id = ? AND key = ? AND state = 'pending'",
+                (self.user_id, self.key)
+            )
+            self.conn.commit()
+        finally:
+            self._wake()
+
+    def _wake(self):
+        event = _events.pop((self.user_id, self.key), None)
+        if event is not None:
+            event.set()
+
+def _purge_expired(conn, now: float):
+    global _last_purge
+    if now - _last_purge < PURGE_INTERVAL:
+        return
+    _last_purge = now
+    conn.execute("DELETE FROM idempotency_keys WHERE expires_at < ?", (now,))
+    conn.commit()
+
+def _claim(conn, user_id, key, route, request_fingerprint, now: float) -> bool:
+    """Tandai key pending untuk request ini; False jika key sudah dipegang request lain"""
+    expires_at = now + settings.IDEMPOTENCY_TTL_HOURS * 3600
+    inserted = conn.execute(
+        """INSERT OR IGNORE INTO idempotency_keys (user_id, key, route, fingerprint, created_at, expires_at)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (user_id, key, route, request_fingerprint, now, expires_at)
+    ).rowcount
+    if not inserted:
+        # Ambil alih key yang sudah kedaluwarsa atau pending yang ditinggal worker mati
+        inserted = conn.execute(
+            """UPDATE idempotency_keys
+               SET route = ?, fingerprint = ?, state = 'pending', status_code = NULL, response = NULL,
+                   created_at = ?, expires_at = ?
+               WHERE user_id = ? AND key = ?
+                 AND (expires_at < ? OR (state = 'pending' AND created_at < ?))""",
+            (route, request_fingerprint, now, expires_at, user_id, key,
+             now, now - settings.IDEMPOTENCY_PENDING_TIMEOUT)
+        ).rowcount
+    conn.commit()
+    return bool(inserted)
+
+async def begin(conn, user_id: int, key, route: str, request_fingerprint: str) -> Idempotency:
+    """
+    Panggil sebelum eksekusi endpoint. Tanpa header key: eksekusi biasa. Jika key sudah
+    selesai, return Idempotency dengan `replay`; jika masih pending, tunggu hasilnya
+    (maksimal IDEMPOTENCY_WAIT_SECONDS, lalu 409).
+    """
+    if key is None:
+        return Idempotency()
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key harus 1-{MAX_KEY_LENGTH} karakter"
+        )
+
+    _purge_expired(conn, time.time())
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    waited = False
+    while True:
+        if _claim(conn, user_id, key, route, request_fingerprint, time.time()):
+            idempotency_requests_total.inc((route, "executed"))
+            _events.setdefault((user_id, key), asyncio.Event())
+            return Idempotency(conn, user_id, key, route)
+
+        row = conn.execute(
+            "SELECT route, fingerprint, state, status_code, response FROM idempotency_keys WHERE user_id = ? AND key = ?",
+            (user_id, key)
+        ).fetchone()
+        if row is None:
+            # Dihapus (eksekusi pertama gagal / purge) di antara claim dan select: coba claim lagi
+            continue
+        if row["route"] != route or row["fingerprint"] != request_fingerprint:
+            idempotency_requests_total.inc((route, "mismatch"))
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key sudah dipakai untuk request yang berbeda"
+            )
+        if row["state"] == "done":
+            idempotency_requests_total.inc((route, "waited" if waited else "replayed"))
+            return Idempotency(replay=JSONResponse(
+                content=json.loads(row["response"]),
+                status_code=row["status_code"],
+                headers={"Idempotency-Replayed": "true"}
+            ))
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            idempotency_requests_total.inc((route, "conflict"))
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Request dengan Idempotency-Key ini masih diproses",
+                headers={"Retry-After": "1"}
+            )
+        waited = True
+        event = _events.get((user_id, key))
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(min(POLL_SECONDS, remaining))
@@ -0,0 +1,68 @@
+import os
+import time
+
+from app.config import settings
+
+# Lock file antar proses (worker uvicorn/gunicorn dan cron) untuk job background:
+# - acquire()/release(): satu pemegang dalam satu waktu lewat O_EXCL; lock yang ditinggal proses
+#   mati dianggap basi setelah stale_seconds
+# - run_if_due(): satu eksekusi job per interval di antara SEMUA worker. Setiap worker boleh
+#   menjalankan task periodiknya, tapi hanya yang pertama mendapat lock setelah interval lewat
+#   yang benar-benar menjalankan job; waktu eksekusi terakhir = mtime file .<nama>.last
+
+STALE_SECONDS = 6 * 3600
+
+def acquire(path: str, stale_seconds: float = STALE_SECONDS) -> bool:
+    """Buat lock file secara atomik; False jika dipegang proses lain dan belum basi"""
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) < stale_seconds:
+                    return False
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return False
+
+def release(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def job_dir() -> str:
+    """Lock job disimpan di samping database utama (dipakai bersama semua worker)"""
+    return os.path.dirname(os.path.abspath(settings.DATABASE_PATH))
+
+def _last_run_age(stamp: str) -> float:
+    try:
+        return time.time() - os.path.getmtime(stamp)
+    except FileNotFoundError:
+        return float("inf")
+
+def run_if_due(name: str, interval_minutes: float, fn, directory: str = None):
+    """Jalankan fn() jika eksekusi terakhir (worker mana pun) lebih tua dari interval; return hasil fn atau None"""
+    directory = directory or job_dir()
+    stamp = os.path.join(directory, f".{name}.last")
+    # Toleransi 10% supaya worker yang timer-nya sedikit lebih cepat tidak melewatkan satu putaran
+    due_seconds = interval_minutes * 60 * 0.9
+    if _last_run_age(stamp) < due_seconds:
+        return None
+    lock = os.path.join(directory, f".{name}.lock")
+    if not acquire(lock):
+        return None
+    try:
+        # Cek ulang setelah dapat lock: worker lain bisa saja baru selesai
+        if _last_run_age(stamp) < due_seconds:
+            return None
+        result = fn()
+        with open(stamp, "w") as f:
+            f.write(str(os.getpid()))
+        return result
+    finally:
+        release(lock)
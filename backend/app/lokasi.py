@@ -0,0 +1,188 @@
+import argparse
+import re
+import threading
+import time
+
+from app import enums, shards
+
+# Normalisasi lokasi free text ("Gedung B Lantai 2 Ruang B202", "Gd. FIK lt 3", "FIK 2")
+# menjadi hierarki gedung/lantai/ruang di tabel locations, direferensikan lewat
+# laporan.location_id supaya agregasi per gedung/lantai bisa memakai index
+# (tanpa LIKE '%...%' pada kolom lokasi).
+
+_GEDUNG = re.compile(r"\b(?:gedung|gdg|gd)\.?\s*([a-z0-9]+)", re.IGNORECASE)
+_LANTAI = re.compile(r"\b(?:lantai|lt)\.?\s*(\d+)", re.IGNORECASE)
+_RUANG = re.compile(r"\b(?:ruangan|ruang|rg|r)\.?\s+([a-z0-9][a-z0-9.\-]*)", re.IGNORECASE)
+_KODE_RUANG = re.compile(r"^[A-Z]+(\d)\d{2,}$")
+_ANGKA = re.compile(r"^\d+$")
+
+OPEN_STATUSES = ("dilaporkan", "dalam_penanganan")
+
+def parse_lokasi(text: str):
+    """Return (gedung, lantai, ruang); bagian yang tidak dikenali berisi string kosong"""
+    text = (text or "").strip()
+    gedung = lantai = ruang = ""
+
+    match = _GEDUNG.search(text)
+    if match:
+        gedung = match.group(1)
+    match = _LANTAI.search(text)
+    if match:
+        lantai = str(int(match.group(1)))
+    match = _RUANG.search(text)
+    if match:
+        ruang = match.group(1).rstrip(".")
+
+    if not gedung:
+        # Tanpa kata kunci: token pertama = gedung, angka berikutnya = lantai ("FIK 2")
+        residual = _LANTAI.sub(" ", _RUANG.sub(" ", text))
+        tokens = residual.replace(",", " ").split()
+        if tokens:
+            gedung = tokens[0]
+            if not lantai and len(tokens) > 1 and _ANGKA.match(tokens[1]):
+                lantai = str(int(tokens[1]))
+
+    ruang = ruang.upper()
+    if not lantai and ruang:
+        # Kode ruang seperti A301 -> lantai 3
+        match = _KODE_RUANG.match(ruang)
+        if match:
+            lantai = match.group(1)
+
+    return gedung.upper(), lantai, ruang
+
+# Cache teks lokasi -> location_id per worker (id lokasi tidak pernah berubah)
+_location_ids = {}
+_location_lock = threading.Lock()
+_CACHE_SIZE = 10000
+
+def resolve_location_id(conn, text: str, commit: bool = True):
+    """Parse teks lokasi lalu ambil/buat baris locations; return location_id"""
+    key = (text or "").strip().lower()
+    with _location_lock:
+        cached = _location_ids.get(key)
+    if cached is not None:
+        return cached
+
+    gedung, lantai, ruang = parse_lokasi(text)
+    if not gedung:
+        return None
+    conn.execute(
+        "INSERT OR IGNORE INTO locations (gedung, lantai, ruang) VALUES (?, ?, ?)",
+        (gedung, lantai, ruang)
+    )
+    if commit:
+        conn.commit()
+    row = conn.execute(
+        "SELECT id FROM locations WHERE gedung = ? AND lantai = ? AND ruang = ?",
+        (gedung, lantai, ruang)
+    ).fetchone()
+    location_id = row[0] if row else None
+
+    if location_id is not None:
+        with _location_lock:
+            if len(_location_ids) < _CACHE_SIZE:
+                _location_ids[key] = location_id
+    return location_id
+
+def backfill(batch_size: int = 5000, verbose: bool = True):
+    """Isi laporan.location_id untuk baris lama di semua shard, per batch (keyset pagination pada id)"""
+    started = time.perf_counter()
+    updated = 0
+    for shard in shards.SHARDS:
+        conn = shards.connect(shard)
+        try:
+            last_id = 0
+            while True:
+                rows = conn.execute(
+                    """SELECT id, lokasi FROM laporan
+                       WHERE id > ? AND location_id IS NULL
+                       ORDER BY id LIMIT ?""",
+                    (last_id, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+
+                updates = []
+                for laporan_id, text in rows:
+                    location_id = resolve_location_id(conn, text, commit=False)
+                    if location_id is not None:
+                        updates.append((location_id, laporan_id))
+                conn.executemany("UPDATE laporan SET location_id = ? WHERE id = ?", updates)
+                conn.commit()
+
+                updated += len(updates)
+                if verbose:
+                    print(f"  {updated:,d} laporan diberi location_id (sampai id {last_id})", end="\r", flush=True)
+        finally:
+            conn.close()
+
+    stats = {"laporan": updated, "seconds": round(time.perf_counter() - started, 3)}
+    if verbose:
+        print(f"\n✅ Backfill lokasi selesai: {stats}")
+    return stats
+
+def aggregate(conn, level: str = "gedung", statuses=OPEN_STATUSES, prioritas: str = None, gedung: str = None):
+    """
+    Jumlah laporan per gedung atau per gedung+lantai.
+    Filter status/prioritas memakai index (status, prioritas, location_id).
+    """
+    group_columns = "lo.gedung" if level == "gedung" else "lo.gedung, lo.lantai"
+    conditions = [f"l.status IN ({','.join('?' * len(statuses))})"]
+    params = list(enums.codes("status", statuses))
+    if prioritas:
+        conditions.append("l.prioritas = ?")
+        params.append(enums.code("prioritas", prioritas))
+    if gedung:
+        conditions.append("lo.gedung = ?")
+        params.append(gedung.upper())
+
+    cursor = conn.execute(
+        f"""SELECT {group_columns}, COUNT(*) as total,
+                   SUM(l.prioritas = {enums.code('prioritas', 'tinggi')}) as tinggi,
+                   SUM(l.prioritas = {enums.code('prioritas', 'sedang')}) as sedang,
+                   SUM(l.prioritas = {enums.code('prioritas', 'rendah')}) as rendah
+            FROM laporan l
+            JOIN locations lo ON lo.id = l.location_id
+            WHERE {' AND '.join(conditions)}
+            GROUP BY {group_columns}
+            ORDER BY total DESC""",
+        params
+    )
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def aggregate_shards(primary_conn, level: str = "gedung", statuses=OPEN_STATUSES, prioritas: str = None,
+                     gedung: str = None):
+    """aggregate() di semua shard secara paralel, dijumlahkan per gedung/lantai"""
+    results = shards.fan_out(lambda conn: aggregate(conn, level, statuses, prioritas, gedung), primary_conn)
+    if len(results) == 1:
+        return results[0]
+    merged = {}
+    for rows in results:
+        for row in rows:
+            key = (row["gedung"], row.get("lantai"))
+            if key not in merged:
+                merged[key] = dict(row)
+            else:
+                for column in ("total", "tinggi", "sedang", "rendah"):
+                    merged[key][column] += row[column]
+    return sorted(merged.values(), key=lambda row: row["total"], reverse=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Normalisasi lokasi laporan ke tabel locations")
+    parser.add_argument("--backfill", action="store_true", help="Isi location_id untuk laporan lama")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--parse", help="Tampilkan hasil parse satu teks lokasi")
+    args = parser.parse_args(argv)
+
+    if args.parse:
+        print(parse_lokasi(args.parse))
+    elif args.backfill:
+        backfill(args.batch_size)
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,28 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form
+import asyncio
+import contextlib
+import time
+
+# Waktu mulai import modul, untuk mengukur lama startup worker
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer
+from pydantic import TypeAdapter
 import aiofiles
 import os
 import uuid
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, date, timedelta
 import json
+from collections import Counter
 
-from app import schemas, auth, email
-from app.database import get_connection, create_tables
+from app import schemas, auth, email, etag, metrics, slowlog, archive, trends, ratelimit, upload_gc, escalation, shards, group_commit, idempotency, cache, profiling, geo, enums, backup, roster, autocomplete, workqueue
+from app import lokasi as lokasi_helper
+from app.database import get_connection, create_tables, seed_sample_data
 from app.config import settings
 
 # Initialize FastAPI app
@@ -32,6 +43,13 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
 )
+# Metrics per route (latency histogram, status code, in-flight), lihat GET /metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+# Profiling on-demand (sampling / header X-Profile bertanda tangan), lihat app/profiling.py
+if settings.PROFILE_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
 # Create uploads directory if not exists
 if not os.path.exists("uploads"):
     os.makedirs("uploads")
@@ -47,6 +65,11 @@ def get_db():
     finally:
         conn.close()
 
+# Koneksi ke shard yang menyimpan laporan {laporan_id} (shard utama = koneksi request yang sama)
+def get_laporan_db(laporan_id: int, conn = Depends(get_db)):
+    with shards.connection(shards.shard_for_id(laporan_id), conn) as shard_conn:
+        yield shard_conn
+
 # Authentication dependency - PERBAIKI INI
 async def get_current_user(
     token: str = Depends(oauth2_scheme),  # ✅ Gunakan oauth2_scheme
@@ -89,6 +112,9 @@ async def get_current_user(
 
 # Helper function untuk execute query
 def execute_query(conn, query, params=None):
+    started = time.perf_counter()
+    failed = False
+    rows = None
     cursor = conn.cursor()
     try:
         if params:
@@ -96,35 +122,190 @@ def execute_query(conn, query, params=None):
         else:
             cursor.execute(query)
         
-        # For SELECT queries, return results
+        # For SELECT queries, return results (kode enum diterjemahkan ke nama)
         if query.strip().upper().startswith('SELECT'):
             columns = [desc[0] for desc in cursor.description]
-            results = []
-            for row in cursor.fetchall():
-                results.append(dict(zip(columns, row)))
+            results = enums.to_dicts(columns, cursor.fetchall())
+            rows = len(results)
             return results
         elif query.strip().upper().startswith('INSERT'):
             conn.commit()
+            rows = cursor.rowcount
             return cursor.lastrowid
         else:
             conn.commit()
+            rows = cursor.rowcount
             return True
     except Exception as e:
+        failed = True
         conn.rollback()
         raise e
     finally:
         cursor.close()
+        elapsed = time.perf_counter() - started
+        metrics.observe_query(query, elapsed, failed)
+        if slowlog.is_slow(elapsed):
+            slowlog.record(conn, query, params, elapsed, rows)
+
+def check_laporan_etag(conn, laporan_id, current_user, suffix=None):
+    """
+    Cek laporan ada + hak akses, lalu kembalikan (ETag, versi, laporan arsip atau None).
+    Laporan aktif cukup lookup primary key laporan dan change_counter;
+    jika tidak ada di tabel aktif, dicari di database arsip.
+    """
+    rows = execute_query(
+        conn,
+        """SELECT l.user_id, COALESCE(c.version, 0) as version
+           FROM laporan l
+           LEFT JOIN change_counter c ON c.scope = 'laporan:' || l.id
+           WHERE l.id = ?""",
+        (laporan_id,)
+    )
+    archived = None
+    if rows:
+        owner_id, version = rows[0]['user_id'], rows[0]['version']
+    else:
+        archived = archive.find_laporan(conn, laporan_id)
+        if not archived:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, 
+                detail="Laporan tidak ditemukan"
+            )
+        owner_id, version = archived['user_id'], etag.get_version(conn, f"laporan:{laporan_id}")
+
+    if (current_user['role'] == 'mahasiswa' and 
+        owner_id != current_user['id']):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, 
+            detail="Akses ditolak"
+        )
+
+    scope = f"laporan:{laporan_id}" if not suffix else f"laporan:{laporan_id}:{suffix}"
+    return etag.make_etag(scope, version), version, archived
+
+INCLUDE_OPTIONS = {"history"}
+# Batas jumlah id per query IN (di bawah limit variabel SQLite)
+HISTORY_BATCH_SIZE = 500
+
+def parse_include(include: Optional[str]) -> set:
+    """?include=history -> {"history"}; nilai tidak dikenal -> 400"""
+    requested = {item.strip() for item in (include or "").split(",") if item.strip()}
+    unknown = requested - INCLUDE_OPTIONS
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"include tidak dikenal: {', '.join(sorted(unknown))}"
+        )
+    return requested
+
+def embed_history(conn, laporans, include_archived: bool = False):
+    """
+    Tempelkan history ke setiap laporan dengan satu query batch (per HISTORY_BATCH_SIZE laporan),
+    dikelompokkan di memori, daripada satu GET /laporan/{id}/history per laporan.
+    """
+    ids = [laporan['id'] for laporan in laporans]
+    grouped = {laporan_id: [] for laporan_id in ids}
+    for start in range(0, len(ids), HISTORY_BATCH_SIZE):
+        chunk = ids[start:start + HISTORY_BATCH_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        rows = execute_query(
+            conn,
+            f"""SELECT sh.*, u.nama_lengkap 
+                FROM status_history sh 
+                JOIN users u ON sh.user_id = u.id 
+                WHERE sh.laporan_id IN ({placeholders}) 
+                ORDER BY sh.laporan_id, sh.created_at DESC""",
+            tuple(chunk)
+        )
+        for row in rows:
+            grouped[row['laporan_id']].append(row)
+        if include_archived:
+            for laporan_id, history in archive.get_histories(conn, chunk).items():
+                grouped[laporan_id].extend(history)
+
+    return [{**laporan, 'history': grouped[laporan['id']]} for laporan in laporans]
+
+def list_laporan(conn, user_id=None, include_archived: bool = False, with_history: bool = False, limit=None):
+    """
+    Laporan dari semua shard (fan-out paralel, digabung urut created_at DESC),
+    opsional milik satu user, termasuk arsip dan/atau dengan history.
+    """
+    where = "WHERE user_id = ?" if user_id is not None else ""
+    params = (user_id,) if user_id is not None else ()
+    limit_clause = " LIMIT ?" if limit else ""
+    params += (limit,) if limit else ()
+
+    def load(shard_conn):
+        laporans = execute_query(
+            shard_conn, f"SELECT * FROM laporan {where} ORDER BY created_at DESC{limit_clause}", params
+        )
+        return embed_history(shard_conn, laporans) if with_history else laporans
+
+    results = shards.fan_out(load, conn)
+    if include_archived:
+        archived = archive.list_archived(conn, user_id)
+        if with_history:
+            archived = embed_history(conn, archived, include_archived=True)
+        results.append(archived)
+    return shards.merge_sorted(results, key=lambda laporan: laporan['created_at'], limit=limit)
+
+def laporan_version(conn, scope):
+    """Versi ETag gabungan semua shard (jumlah versi per shard, tetap monotonik)"""
+    return sum(shards.fan_out(lambda shard_conn: etag.get_version(shard_conn, scope), conn))
 
 # Create tables on startup
 @app.on_event("startup")
 async def startup_event():
-    create_tables()
-    print("✅ CivitasFix API started successfully!")
+    # Jika dijalankan lewat app/server.py dengan preload, tabel sudah dibuat di proses master
+    if settings.INIT_DB_ON_STARTUP:
+        create_tables()
+    if settings.SEED_SAMPLE_DATA:
+        seed_sample_data()
+
+    # Index autocomplete lokasi / jenis_fasilitas di memori worker ini
+    try:
+        autocomplete.build(verbose=True)
+    except Exception as e:
+        print(f"Autocomplete build error: {e}")
+    if settings.AUTOCOMPLETE_REFRESH_MINUTES > 0:
+        app.state.autocomplete_task = asyncio.create_task(
+            autocomplete.run_periodically(settings.AUTOCOMPLETE_REFRESH_MINUTES)
+        )
+    # Sweeper file upload yatim di background
+    if settings.UPLOAD_GC_INTERVAL_MINUTES > 0:
+        app.state.upload_gc_task = asyncio.create_task(
+            upload_gc.run_periodically(settings.UPLOAD_GC_INTERVAL_MINUTES)
+        )
+    # Job eskalasi prioritas SLA di background
+    if settings.SLA_ESCALATION_INTERVAL_MINUTES > 0:
+        app.state.escalation_task = asyncio.create_task(
+            escalation.run_periodically(settings.SLA_ESCALATION_INTERVAL_MINUTES)
+        )
+    # Snapshot backup terjadwal (hanya satu worker yang membuat snapshot per interval)
+    if settings.BACKUP_INTERVAL_MINUTES > 0:
+        app.state.backup_task = asyncio.create_task(
+            backup.run_periodically(settings.BACKUP_INTERVAL_MINUTES)
+        )
+
+    app.state.startup_seconds = time.perf_counter() - _import_started
+    print(f"✅ CivitasFix API started successfully in {app.state.startup_seconds * 1000:.0f} ms (pid {os.getpid()})")
     print("📚 API Documentation available at: http://localhost:8000/docs")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Dipanggil setelah uvicorn selesai drain request yang masih berjalan
+    for name in ("upload_gc_task", "escalation_task", "backup_task", "autocomplete_task"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    # Commit insert yang masih antre di group commit writer
+    await group_commit.close()
+    print(f"👋 CivitasFix API worker shutting down (pid {os.getpid()})")
+
 # ==================== AUTH ENDPOINTS ====================
 
-@app.post("/register", response_model=schemas.UserResponse)
+@app.post("/register", response_model=schemas.UserResponse,
+          dependencies=[Depends(ratelimit.rate_limit("register", expensive=True))])
 async def register(user: schemas.UserCreate, conn = Depends(get_db)):
     """
     Register user baru (mahasiswa atau dosen)
@@ -144,6 +325,13 @@ async def register(user: schemas.UserCreate, conn = Depends(get_db)):
                 detail="Password minimal 6 karakter"
             )
 
+        # Username "sistem" dicadangkan untuk catatan eskalasi otomatis
+        if escalation.is_reserved(user.username, user.email):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Username tersebut dicadangkan untuk sistem"
+            )
+
         # Cek username sudah ada
         existing_users = execute_query(
             conn, 
@@ -171,7 +359,7 @@ async def register(user: schemas.UserCreate, conn = Depends(get_db)):
         user_id = execute_query(
             conn,
             "INSERT INTO users (username, email, password_hash, role, nama_lengkap) VALUES (?, ?, ?, ?, ?)",
-            (user.username, user.email, hashed_password, user.role, user.nama_lengkap)
+            (user.username, user.email, hashed_password, enums.code('role', user.role), user.nama_lengkap)
         )
         
         # Get created user
@@ -193,7 +381,8 @@ async def register(user: schemas.UserCreate, conn = Depends(get_db)):
             detail=f"Error during registration: {str(e)}"
         )
 
-@app.post("/login", response_model=schemas.Token)
+@app.post("/login", response_model=schemas.Token,
+          dependencies=[Depends(ratelimit.rate_limit("login", expensive=True))])
 async def login(user_login: schemas.UserLogin, conn = Depends(get_db)):
     """
     Login user dengan username dan password
@@ -229,7 +418,29 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
 
 # ==================== LAPORAN ENDPOINTS ====================
 
-@app.post("/laporan", response_model=schemas.LaporanResponse)
+@app.get("/autocomplete/{field}", response_model=List[schemas.AutocompleteSuggestion])
+async def get_autocomplete(
+    field: str,
+    q: str = "",
+    limit: int = autocomplete.TOP_K,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Saran lokasi / jenis_fasilitas yang diawali `q` (tidak peka huruf besar), paling sering dipakai dulu.
+    Dilayani dari index di memori, tanpa query database per ketikan.
+    """
+    if field not in autocomplete.FIELDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Field harus 'lokasi' atau 'jenis_fasilitas'"
+        )
+    limit = max(1, min(limit, autocomplete.TOP_K))
+    return autocomplete.suggest(field, q, limit)
+
+@app.post("/laporan", response_model=schemas.LaporanResponse,
+          # Dengan group commit, batas concurrency hanya untuk simpan foto (lihat di bawah): insert
+          # yang datang bersamaan justru harus bisa menumpuk supaya tergabung dalam satu batch
+          dependencies=[Depends(ratelimit.rate_limit("laporan_create", expensive=not group_commit.enabled()))])
 async def buat_laporan(
     judul: str = Form(...),
     deskripsi: str = Form(...),
@@ -237,17 +448,35 @@ async def buat_laporan(
     jenis_fasilitas: str = Form(...),
     lokasi: str = Form(...),
     foto: Optional[UploadFile] = File(None),
+    latitude: Optional[float] = Form(None),
+    longitude: Optional[float] = Form(None),
+    idempotency_key: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user),
     conn = Depends(get_db)
 ):
     """
-    Buat laporan kerusakan baru (hanya mahasiswa)
+    Buat laporan kerusakan baru (hanya mahasiswa), koordinat latitude/longitude opsional.
+    Header Idempotency-Key opsional: retry dengan key yang sama me-replay laporan yang sudah dibuat.
     """
     if current_user['role'] != 'mahasiswa':
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, 
             detail="Hanya mahasiswa yang dapat membuat laporan"
         )
+    try:
+        geo.validate(latitude, longitude)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Foto ikut di-fingerprint berdasarkan isinya (bukan nama file): retry dengan foto lain ditolak
+    idem = await idempotency.begin(
+        conn, current_user['id'], idempotency_key, "laporan_create",
+        idempotency.fingerprint(judul, deskripsi, kategori, jenis_fasilitas, lokasi,
+                                await idempotency.upload_digest(foto) if idempotency_key else None,
+                                latitude, longitude)
+    )
+    if idem.replay is not None:
+        return idem.replay
     
     try:
         # Upload foto jika ada
@@ -267,9 +496,12 @@ async def buat_laporan(
                 file_location = f"uploads/{filename}"
                 
                 # Save file
-                async with aiofiles.open(file_location, "wb") as f:
-                    content = await foto.read()
-                    await f.write(content)
+                admission = ratelimit.admission("laporan_create") if group_commit.enabled() else contextlib.nullcontext()
+                with admission:
+                    async with aiofiles.open(file_location, "wb") as f:
+                        content = await foto.read()
+                        await f.write(content)
+                metrics.upload_bytes_total.inc(("/laporan",), len(content))
                 
                 foto_url = f"http://localhost:8000/uploads/{filename}"
                 
@@ -299,16 +531,38 @@ async def buat_laporan(
             elif prioritas == "rendah":
                 prioritas = "sedang"
 
-        # Insert laporan
-        laporan_id = execute_query(
-            conn, 
-            """INSERT INTO laporan (judul, deskripsi, kategori, jenis_fasilitas, lokasi, prioritas, foto_url, user_id, status) 
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (judul, deskripsi, kategori, jenis_fasilitas, lokasi, prioritas, foto_url, current_user['id'], 'dilaporkan')
-        )
-        
-        # Get created laporan
-        laporans = execute_query(conn, "SELECT * FROM laporan WHERE id = ?", (laporan_id,))
+        # Normalisasi lokasi ke hierarki gedung/lantai/ruang
+        location_id = None
+        try:
+            location_id = lokasi_helper.resolve_location_id(conn, lokasi)
+        except Exception as e:
+            print(f"Location parse error: {e}")
+
+        # Insert laporan ke shard sesuai gedung (tanpa SHARDS: database utama)
+        shard = shards.shard_for_key(lokasi_helper.parse_lokasi(lokasi)[0])
+        if group_commit.enabled():
+            # Digabung dengan insert lain yang datang bersamaan dalam satu transaksi
+            laporans = [await group_commit.insert(shard, "laporan", {
+                "judul": judul, "deskripsi": deskripsi, "kategori": enums.code('kategori', kategori),
+                "jenis_fasilitas": jenis_fasilitas, "lokasi": lokasi, "prioritas": enums.code('prioritas', prioritas),
+                "foto_url": foto_url, "user_id": current_user['id'], "status": enums.code('status', 'dilaporkan'),
+                "location_id": location_id, "latitude": latitude, "longitude": longitude,
+                "geocell": geo.geocell(latitude, longitude),
+            })]
+        else:
+            with shards.connection(shard, conn) as shard_conn:
+                laporan_id = execute_query(
+                    shard_conn, 
+                    """INSERT INTO laporan (judul, deskripsi, kategori, jenis_fasilitas, lokasi, prioritas, foto_url, user_id, status, location_id,
+                                          latitude, longitude, geocell) 
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (judul, deskripsi, enums.code('kategori', kategori), jenis_fasilitas, lokasi, enums.code('prioritas', prioritas),
+                     foto_url, current_user['id'], enums.code('status', 'dilaporkan'), location_id,
+                     latitude, longitude, geo.geocell(latitude, longitude))
+                )
+                
+                # Get created laporan
+                laporans = execute_query(shard_conn, "SELECT * FROM laporan WHERE id = ?", (laporan_id,))
         if not laporans:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -316,44 +570,198 @@ async def buat_laporan(
             )
             
         new_laporan = laporans[0]
+        cache.laporan_cache.invalidate(f"user:{current_user['id']}")
+        autocomplete.add("lokasi", lokasi)
+        autocomplete.add("jenis_fasilitas", jenis_fasilitas)
+        idem.store(jsonable_encoder(schemas.LaporanResponse(**new_laporan)))
         return new_laporan
         
     except HTTPException:
+        idem.release()
         raise
     except Exception as e:
+        idem.release()
+        # Jangan tinggalkan foto yatim jika insert gagal
+        if foto_url:
+            try:
+                os.remove(file_location)
+            except OSError:
+                pass
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating laporan: {str(e)}"
         )
 
-@app.get("/laporan/me", response_model=List[schemas.LaporanResponse])
+@app.get("/laporan/me", response_model=List[schemas.LaporanWithHistoryResponse],
+         response_model_exclude_unset=True)
 async def get_my_laporan(
+    request: Request,
+    response: Response,
+    include_archived: bool = False,
+    include: Optional[str] = None,
     current_user: dict = Depends(get_current_user), 
     conn = Depends(get_db)
 ):
     """
-    Get semua laporan milik user yang login (mahasiswa)
+    Get semua laporan milik user yang login (mahasiswa).
+    Laporan yang sudah diarsipkan ikut ditampilkan dengan ?include_archived=true,
+    history setiap laporan ikut disertakan dengan ?include=history
     """
+    includes = parse_include(include)
     try:
-        laporans = execute_query(
-            conn, 
-            "SELECT * FROM laporan WHERE user_id = ? ORDER BY created_at DESC", 
-            (current_user['id'],)
+        # Conditional GET: cek versi dulu sebelum query semua baris
+        scope = f"user:{current_user['id']}"
+        variant = ":".join([scope] + (["archived"] if include_archived else []) + sorted(includes))
+        version = laporan_version(conn, scope)
+        current_etag = etag.make_etag(variant, version)
+        if etag.etag_matches(request, current_etag):
+            return etag.not_modified(current_etag)
+        etag.set_etag(response, current_etag)
+
+        # Polling tanpa If-None-Match: list dari cache selama versinya belum berubah
+        return cache.cached(
+            scope, variant, version,
+            lambda: list_laporan(conn, current_user['id'], include_archived, "history" in includes)
         )
-        return laporans
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error getting laporan: {str(e)}"
         )
 
-@app.get("/laporan", response_model=List[schemas.LaporanResponse])
+def parse_watermark(since: str) -> list:
+    """'12' atau '12.7.3' (satu seq per shard) -> list seq sepanjang jumlah shard"""
+    try:
+        seqs = [int(part) for part in (since or "0").split(".")]
+    except ValueError:
+        seqs = None
+    if not seqs or len(seqs) > len(shards.SHARDS) or any(seq < 0 for seq in seqs):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Watermark tidak valid")
+    # Watermark dari sebelum sharding = seq shard utama; shard lain dibaca dari awal
+    return seqs + [0] * (len(shards.SHARDS) - len(seqs))
+
+def read_changes(conn, user: dict, since: int, limit: int) -> dict:
+    """Batch perubahan berikutnya dari change_log satu shard + baris laporan/history-nya"""
+    # Ambil batch perubahan berikutnya dari change_log (range scan pada seq)
+    if user['role'] == 'mahasiswa':
+        changes = execute_query(
+            conn,
+            """SELECT seq, entity, entity_id, deleted FROM change_log
+               WHERE user_id = ? AND seq > ? ORDER BY seq LIMIT ?""",
+            (user['id'], since, limit)
+        )
+    else:
+        changes = execute_query(
+            conn,
+            "SELECT seq, entity, entity_id, deleted FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+            (since, limit)
+        )
+
+    laporan_ids = [c['entity_id'] for c in changes if c['entity'] == 'laporan' and not c['deleted']]
+    history_ids = [c['entity_id'] for c in changes if c['entity'] == 'status_history']
+
+    laporans = []
+    if laporan_ids:
+        placeholders = ",".join("?" * len(laporan_ids))
+        laporans = execute_query(
+            conn,
+            f"SELECT * FROM laporan WHERE id IN ({placeholders}) ORDER BY id",
+            tuple(laporan_ids)
+        )
+
+    history = []
+    if history_ids:
+        placeholders = ",".join("?" * len(history_ids))
+        # Tabel users hanya ada di database utama: nama_lengkap diisi pemanggil
+        history = execute_query(
+            conn,
+            f"SELECT * FROM status_history WHERE id IN ({placeholders}) ORDER BY id",
+            tuple(history_ids)
+        )
+
+    if changes:
+        watermark = changes[-1]['seq']
+    else:
+        # Tidak ada perubahan: majukan ke seq terakhir (perubahan baru pasti > seq ini)
+        latest = execute_query(conn, "SELECT COALESCE(MAX(seq), 0) as seq FROM change_log")
+        watermark = max(since, latest[0]['seq'])
+
+    return {
+        "laporan": laporans,
+        "history": history,
+        "deleted": [c['entity_id'] for c in changes if c['entity'] == 'laporan' and c['deleted'] == 1],
+        "archived": [c['entity_id'] for c in changes if c['entity'] == 'laporan' and c['deleted'] == 2],
+        "watermark": watermark,
+        "has_more": len(changes) == limit
+    }
+
+@app.get("/laporan/changes", response_model=schemas.LaporanChangesResponse)
+async def get_laporan_changes(
+    since: str = "0",
+    limit: int = 500,
+    current_user: dict = Depends(get_current_user), 
+    conn = Depends(get_db)
+):
+    """
+    Delta sync: laporan dan history yang berubah setelah watermark `since`.
+    Mahasiswa hanya menerima perubahan laporan miliknya, dosen menerima semua.
+    `archived` = laporan yang dipindah ke arsip (bukan dihapus, tetap ada di detail/include_archived).
+    Dengan SHARDS watermark berisi satu seq per shard ("12.7"), kirim kembali apa adanya;
+    tiap shard mendapat bagian `limit` sendiri dan maju sendiri-sendiri.
+    """
+    limit = max(1, min(limit, 1000))
+    seqs = parse_watermark(since)
+    shard_limit = max(1, limit // len(shards.SHARDS))
+
+    try:
+        results = []
+        for shard, shard_since in zip(shards.SHARDS, seqs):
+            with shards.connection(shard, conn) as shard_conn:
+                results.append(read_changes(shard_conn, current_user, shard_since, shard_limit))
+
+        history = [row for result in results for row in result["history"]]
+        user_ids = sorted({row['user_id'] for row in history if row['user_id'] is not None})
+        names = {}
+        if user_ids:
+            names = {row['id']: row['nama_lengkap'] for row in execute_query(
+                conn,
+                f"SELECT id, nama_lengkap FROM users WHERE id IN ({','.join('?' * len(user_ids))})",
+                tuple(user_ids)
+            )}
+        # Sama seperti JOIN users sebelumnya: history tanpa user tidak dikirim
+        history = [dict(row, nama_lengkap=names[row['user_id']]) for row in history if row['user_id'] in names]
+
+        watermarks = [result["watermark"] for result in results]
+        return {
+            "laporan": [row for result in results for row in result["laporan"]],
+            "history": history,
+            "deleted": [laporan_id for result in results for laporan_id in result["deleted"]],
+            "archived": [laporan_id for result in results for laporan_id in result["archived"]],
+            # Tanpa SHARDS tetap satu angka seperti sebelumnya
+            "watermark": watermarks[0] if len(watermarks) == 1 else ".".join(map(str, watermarks)),
+            "has_more": any(result["has_more"] for result in results)
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error getting changes: {str(e)}"
+        )
+
+@app.get("/laporan", response_model=List[schemas.LaporanWithHistoryResponse],
+         response_model_exclude_unset=True)
 async def get_all_laporan(
+    request: Request,
+    response: Response,
+    include_archived: bool = False,
+    include: Optional[str] = None,
     current_user: dict = Depends(get_current_user), 
     conn = Depends(get_db)
 ):
     """
-    Get semua laporan (hanya dosen)
+    Get semua laporan (hanya dosen).
+    Laporan yang sudah diarsipkan ikut ditampilkan dengan ?include_archived=true,
+    history setiap laporan ikut disertakan dengan ?include=history (satu query batch,
+    bukan satu request history per laporan)
     """
     if current_user['role'] != 'dosen':
         raise HTTPException(
@@ -361,36 +769,63 @@ async def get_all_laporan(
             detail="Hanya dosen yang dapat melihat semua laporan"
         )
     
+    includes = parse_include(include)
     try:
-        laporans = execute_query(
-            conn, 
-            "SELECT * FROM laporan ORDER BY created_at DESC"
-        )
-        return laporans
+        # Conditional GET: cek versi dulu sebelum query semua baris
+        variant = ":".join(["laporan"] + (["archived"] if include_archived else []) + sorted(includes))
+        current_etag = etag.make_etag(variant, laporan_version(conn, "laporan"))
+        if etag.etag_matches(request, current_etag):
+            return etag.not_modified(current_etag)
+        etag.set_etag(response, current_etag)
+
+        return list_laporan(conn, None, include_archived, "history" in includes)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error getting laporan: {str(e)}"
         )
 
-@app.get("/laporan/{laporan_id}", response_model=schemas.LaporanResponse)
+@app.get("/laporan/{laporan_id}", response_model=schemas.LaporanWithHistoryResponse,
+         response_model_exclude_unset=True)
 async def get_laporan_detail(
     laporan_id: int, 
+    request: Request,
+    response: Response,
+    include: Optional[str] = None,
     current_user: dict = Depends(get_current_user), 
-    conn = Depends(get_db)
+    conn = Depends(get_laporan_db)
 ):
     """
-    Get detail laporan by ID
+    Get detail laporan by ID (?include=history untuk menyertakan history status)
     """
+    includes = parse_include(include)
     try:
-        laporans = execute_query(conn, "SELECT * FROM laporan WHERE id = ?", (laporan_id,))
-        if not laporans:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, 
-                detail="Laporan tidak ditemukan"
-            )
-        
-        laporan_data = laporans[0]
+        # Conditional GET: akses dicek dari validator, tanpa serialisasi laporan
+        # (versi laporan:<id> juga naik saat history bertambah)
+        suffix = "with-history" if "history" in includes else None
+        current_etag, version, archived = check_laporan_etag(conn, laporan_id, current_user, suffix=suffix)
+        if etag.etag_matches(request, current_etag):
+            return etag.not_modified(current_etag)
+        etag.set_etag(response, current_etag)
+
+        # Laporan lama dibaca dari arsip (akses sudah dicek di atas)
+        if archived:
+            if "history" in includes:
+                archived = {**archived, 'history': archive.get_history(conn, laporan_id)}
+            return archived
+
+        def load_detail():
+            laporans = execute_query(conn, "SELECT * FROM laporan WHERE id = ?", (laporan_id,))
+            if not laporans:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, 
+                    detail="Laporan tidak ditemukan"
+                )
+            if "history" in includes:
+                return embed_history(conn, laporans)[0]
+            return laporans[0]
+
+        laporan_data = cache.cached(f"laporan:{laporan_id}", suffix or "row", version, load_detail)
         
         # Cek akses: mahasiswa hanya bisa lihat laporan sendiri
         if (current_user['role'] == 'mahasiswa' and 
@@ -399,7 +834,6 @@ async def get_laporan_detail(
                 status_code=status.HTTP_403_FORBIDDEN, 
                 detail="Akses ditolak"
             )
-        
         return laporan_data
     except HTTPException:
         raise
@@ -413,21 +847,36 @@ async def get_laporan_detail(
 async def update_status(
     laporan_id: int,
     status_update: schemas.StatusUpdate,
+    idempotency_key: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user),
-    conn = Depends(get_db)
+    conn = Depends(get_laporan_db),
+    primary_conn = Depends(get_db)
 ):
     """
-    Update status laporan (hanya dosen)
+    Update status laporan (hanya dosen).
+    Header Idempotency-Key opsional: retry dengan key yang sama tidak menambah history/email lagi.
     """
     if current_user['role'] != 'dosen':
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, 
             detail="Hanya dosen yang dapat mengupdate status laporan"
         )
+
+    idem = await idempotency.begin(
+        primary_conn, current_user['id'], idempotency_key, "laporan_status",
+        idempotency.fingerprint(laporan_id, status_update.status, status_update.catatan)
+    )
+    if idem.replay is not None:
+        return idem.replay
     
     try:
         # Cek laporan exists
         laporans = execute_query(conn, "SELECT * FROM laporan WHERE id = ?", (laporan_id,))
+        if not laporans and archive.find_laporan(conn, laporan_id):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Laporan sudah diarsipkan dan tidak dapat diubah"
+            )
         if not laporans:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, 
@@ -435,19 +884,25 @@ async def update_status(
             )
         
         laporan_data = laporans[0]
+        if workqueue.held_by_other(laporan_data, current_user['id']):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Laporan sedang diklaim dosen lain"
+            )
         
-        # Update laporan status
-        execute_query(
-            conn,
-            "UPDATE laporan SET status = ?, dosen_id = ?, updated_at = datetime('now') WHERE id = ?",
-            (status_update.status, current_user['id'], laporan_id)
-        )
+        # Update laporan status (klaim antrian kerja menjadi penugasan tetap); syarat lease dicek
+        # ulang di UPDATE supaya klaim dosen lain sejak SELECT di atas tidak tertimpa
+        if not workqueue.assign(conn, laporan_id, current_user['id'], enums.code('status', status_update.status)):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Laporan sedang diklaim dosen lain"
+            )
         
         # Insert status history
         execute_query(
             conn,
             "INSERT INTO status_history (laporan_id, status, catatan, user_id) VALUES (?, ?, ?, ?)",
-            (laporan_id, status_update.status, status_update.catatan, current_user['id'])
+            (laporan_id, enums.code('status', status_update.status), status_update.catatan, current_user['id'])
         )
         
         # Get user email for notification (jika ada SMTP configured)
@@ -472,7 +927,9 @@ async def update_status(
                 print(f"Email notification error: {e}")
                 # Continue without email if failed
         
-        # Get updated laporan
+        # Get updated laporan (versi dibaca lebih dulu: jika ada tulis lain di antaranya,
+        # entry cache bertanda versi lama dan tidak akan dipakai)
+        version = etag.get_version(conn, f"laporan:{laporan_id}")
         updated_laporans = execute_query(conn, "SELECT * FROM laporan WHERE id = ?", (laporan_id,))
         if not updated_laporans:
             raise HTTPException(
@@ -481,43 +938,91 @@ async def update_status(
             )
             
         updated_laporan = updated_laporans[0]
+        # Write-through: detail laporan ini langsung dari cache, list milik pelapor dibuang
+        cache.laporan_cache.put(f"laporan:{laporan_id}", "row", version, updated_laporan)
+        cache.laporan_cache.invalidate(f"user:{updated_laporan['user_id']}")
+        idem.store(jsonable_encoder(schemas.LaporanResponse(**updated_laporan)))
         return updated_laporan
         
     except HTTPException:
+        idem.release()
         raise
     except Exception as e:
+        idem.release()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error updating status: {str(e)}"
         )
 
+@app.post("/workqueue/claim", response_model=List[schemas.LaporanClaimResponse])
+async def claim_laporan(
+    limit: int = 5,
+    current_user: dict = Depends(get_current_user),
+    conn = Depends(get_db)
+):
+    """
+    Klaim `limit` laporan terbuka berikutnya yang belum ditangani dosen lain (hanya dosen),
+    urut prioritas lalu umur. Klaim berlaku sampai claim_expires_at; update status menjadikannya
+    penugasan tetap, POST /workqueue/{id}/release mengembalikannya ke antrian.
+    """
+    if current_user['role'] != 'dosen':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, 
+            detail="Hanya dosen yang dapat mengklaim laporan"
+        )
+    limit = max(1, min(limit, workqueue.MAX_CLAIM))
+
+    try:
+        return workqueue.claim(conn, current_user['id'], limit)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error claiming laporan: {str(e)}"
+        )
+
+@app.post("/workqueue/{laporan_id}/release")
+async def release_laporan(
+    laporan_id: int,
+    current_user: dict = Depends(get_current_user),
+    conn = Depends(get_laporan_db)
+):
+    """
+    Kembalikan laporan yang sedang diklaim ke antrian (hanya dosen pemegang klaim)
+    """
+    if current_user['role'] != 'dosen':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, 
+            detail="Hanya dosen yang dapat mengembalikan klaim laporan"
+        )
+    if not workqueue.release(conn, laporan_id, current_user['id']):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Laporan tidak sedang Anda klaim"
+        )
+    return {"message": "Laporan dikembalikan ke antrian"}
+
 @app.get("/laporan/{laporan_id}/history", response_model=List[schemas.StatusHistoryResponse])
 async def get_history(
     laporan_id: int, 
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user), 
-    conn = Depends(get_db)
+    conn = Depends(get_laporan_db)
 ):
     """
     Get history status untuk laporan tertentu
     """
     try:
-        # Cek apakah user berhak akses history ini
-        laporans = execute_query(conn, "SELECT * FROM laporan WHERE id = ?", (laporan_id,))
-        if not laporans:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, 
-                detail="Laporan tidak ditemukan"
-            )
-        
-        laporan_data = laporans[0]
-        if (current_user['role'] == 'mahasiswa' and 
-            laporan_data['user_id'] != current_user['id']):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN, 
-                detail="Akses ditolak"
-            )
+        # Cek apakah user berhak akses history ini (sekaligus validator ETag)
+        current_etag, version, archived = check_laporan_etag(conn, laporan_id, current_user, suffix="history")
+        if etag.etag_matches(request, current_etag):
+            return etag.not_modified(current_etag)
+        etag.set_etag(response, current_etag)
+
+        if archived:
+            return archive.get_history(conn, laporan_id)
         
-        history = execute_query(
+        history = cache.cached(f"laporan:{laporan_id}", "history", version, lambda: execute_query(
             conn,
             """SELECT sh.*, u.nama_lengkap 
                FROM status_history sh 
@@ -525,7 +1030,7 @@ async def get_history(
                WHERE sh.laporan_id = ? 
                ORDER BY sh.created_at DESC""",
             (laporan_id,)
-        )
+        ))
         return history
         
     except HTTPException:
@@ -540,6 +1045,83 @@ async def get_history(
 
 # ==================== STATISTIK ENDPOINTS ====================
 
+def statistik_parts(conn):
+    """Agregat mentah statistik dari satu shard (digabung di build_statistik)"""
+    # Laporan per status, per kategori dan per fasilitas
+    per_status = {row['status']: row['count'] for row in execute_query(
+        conn, "SELECT status, COUNT(*) as count FROM laporan GROUP BY status"
+    )}
+    per_kategori = {row['kategori']: row['count'] for row in execute_query(
+        conn, "SELECT kategori, COUNT(*) as count FROM laporan GROUP BY kategori"
+    )}
+    per_fasilitas = {row['jenis_fasilitas']: row['count'] for row in execute_query(
+        conn, "SELECT jenis_fasilitas, COUNT(*) as count FROM laporan GROUP BY jenis_fasilitas"
+    )}
+    
+    # Laporan bulan ini (SQLite format)
+    bulan_ini_result = execute_query(
+        conn,
+        "SELECT COUNT(*) as count FROM laporan WHERE strftime('%Y-%m', created_at) = strftime('%Y-%m', 'now')"
+    )
+    
+    # Total hari penanganan laporan selesai (rata-rata dihitung setelah digabung)
+    waktu_result = execute_query(
+        conn,
+        """SELECT SUM(julianday(updated_at) - julianday(created_at)) as total_days, COUNT(*) as count 
+           FROM laporan WHERE status = ?""",
+        (enums.code('status', 'selesai'),)
+    )
+    
+    return {
+        "per_status": per_status,
+        "per_kategori": per_kategori,
+        "per_fasilitas": per_fasilitas,
+        "bulan_ini": bulan_ini_result[0]['count'] if bulan_ini_result else 0,
+        "selesai_days": (waktu_result[0]['total_days'] or 0) if waktu_result else 0,
+        "selesai_count": waktu_result[0]['count'] if waktu_result else 0,
+    }
+
+def build_statistik(conn):
+    """
+    Statistik laporan (dipakai GET /statistik dan section statistik di GET /dashboard).
+    Dihitung paralel di setiap shard lalu digabung.
+    """
+    per_status, per_kategori, per_fasilitas = Counter(), Counter(), Counter()
+    bulan_ini = selesai_days = selesai_count = 0
+    for parts in shards.fan_out(statistik_parts, conn):
+        per_status.update(parts['per_status'])
+        per_kategori.update(parts['per_kategori'])
+        per_fasilitas.update(parts['per_fasilitas'])
+        bulan_ini += parts['bulan_ini']
+        selesai_days += parts['selesai_days']
+        selesai_count += parts['selesai_count']
+    
+    avg_days = selesai_days / selesai_count if selesai_count else 0
+    rata_waktu_penanganan = f"{avg_days:.1f} hari" if avg_days > 0 else "Belum ada data"
+    
+    # Format response - PASTIKAN SESUAI DENGAN SCHEMA
+    statistik_data = {
+        "total_laporan": sum(per_status.values()),
+        "laporan_bulan_ini": bulan_ini,
+        "rata_waktu_penanganan": rata_waktu_penanganan,
+        "per_status": [
+            {"status": name, "count": per_status[name]}
+            for name in ("dilaporkan", "dalam_penanganan", "selesai", "ditolak")
+        ],
+        "per_kategori": [{"kategori": name, "count": count} for name, count in sorted(per_kategori.items())],
+        # Top 10 fasilitas
+        "per_fasilitas": [
+            {"jenis_fasilitas": name, "count": count}
+            for name, count in sorted(per_fasilitas.items(), key=lambda item: (-item[1], item[0]))[:10]
+        ],
+        "dalam_penanganan": per_status["dalam_penanganan"],
+        "selesai": per_status["selesai"],
+        "ditolak": per_status["ditolak"],
+        "dilaporkan": per_status["dilaporkan"]
+    }
+    
+    return statistik_data
+
 @app.get("/statistik", response_model=schemas.StatistikResponse)
 async def get_statistik(
     current_user: dict = Depends(get_current_user), 
@@ -555,73 +1137,7 @@ async def get_statistik(
         )
     
     try:
-        # Total laporan
-        total_result = execute_query(conn, "SELECT COUNT(*) as count FROM laporan")
-        total = total_result[0]['count'] if total_result else 0
-        
-        # Laporan bulan ini (SQLite format) - PERBAIKI QUERY
-        bulan_ini_result = execute_query(
-            conn,
-            "SELECT COUNT(*) as count FROM laporan WHERE strftime('%Y-%m', created_at) = strftime('%Y-%m', 'now')"
-        )
-        bulan_ini = bulan_ini_result[0]['count'] if bulan_ini_result else 0
-        
-        # Laporan per status - PERBAIKI: Hitung masing-masing status
-        status_dilaporkan = execute_query(conn, "SELECT COUNT(*) as count FROM laporan WHERE status = 'dilaporkan'")
-        status_dalam_penanganan = execute_query(conn, "SELECT COUNT(*) as count FROM laporan WHERE status = 'dalam_penanganan'")
-        status_selesai = execute_query(conn, "SELECT COUNT(*) as count FROM laporan WHERE status = 'selesai'")
-        status_ditolak = execute_query(conn, "SELECT COUNT(*) as count FROM laporan WHERE status = 'ditolak'")
-        
-        # Format status stats untuk response
-        status_stats = [
-            {"status": "dilaporkan", "count": status_dilaporkan[0]['count'] if status_dilaporkan else 0},
-            {"status": "dalam_penanganan", "count": status_dalam_penanganan[0]['count'] if status_dalam_penanganan else 0},
-            {"status": "selesai", "count": status_selesai[0]['count'] if status_selesai else 0},
-            {"status": "ditolak", "count": status_ditolak[0]['count'] if status_ditolak else 0}
-        ]
-        
-        # Laporan per kategori - PERBAIKI QUERY
-        kategori_stats = execute_query(
-            conn,
-            "SELECT kategori, COUNT(*) as count FROM laporan GROUP BY kategori"
-        )
-        
-        # Laporan per fasilitas (top 10) - PERBAIKI QUERY
-        fasilitas_stats = execute_query(
-            conn,
-            """SELECT jenis_fasilitas, COUNT(*) as count 
-               FROM laporan 
-               GROUP BY jenis_fasilitas 
-               ORDER BY count DESC 
-               LIMIT 10"""
-        )
-        
-        # Hitung rata-rata waktu penanganan - PERBAIKI DENGAN LOGIKA REAL
-        avg_time_result = execute_query(
-            conn,
-            """SELECT AVG(julianday(updated_at) - julianday(created_at)) as avg_days 
-               FROM laporan WHERE status = 'selesai'"""
-        )
-        
-        avg_days = avg_time_result[0]['avg_days'] if avg_time_result and avg_time_result[0]['avg_days'] else 0
-        rata_waktu_penanganan = f"{avg_days:.1f} hari" if avg_days > 0 else "Belum ada data"
-        
-        # Format response - PASTIKAN SESUAI DENGAN SCHEMA
-        statistik_data = {
-            "total_laporan": total,
-            "laporan_bulan_ini": bulan_ini,
-            "rata_waktu_penanganan": rata_waktu_penanganan,
-            "per_status": status_stats,
-            "per_kategori": kategori_stats if kategori_stats else [],
-            "per_fasilitas": fasilitas_stats if fasilitas_stats else [],
-            "dalam_penanganan": status_dalam_penanganan[0]['count'] if status_dalam_penanganan else 0,
-            "selesai": status_selesai[0]['count'] if status_selesai else 0,
-            "ditolak": status_ditolak[0]['count'] if status_ditolak else 0,
-            "dilaporkan": status_dilaporkan[0]['count'] if status_dilaporkan else 0
-        }
-        
-        return statistik_data
-        
+        return build_statistik(conn)
     except Exception as e:
         print(f"Error in statistik: {e}")
         # Return default data jika error
@@ -638,9 +1154,302 @@ async def get_statistik(
             "dilaporkan": 0
         }
 
+@app.get("/statistik/trends", response_model=schemas.TrendsResponse)
+async def get_statistik_trends(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: str = "day",
+    dimension: str = "all",
+    top: int = 10,
+    current_user: dict = Depends(get_current_user), 
+    conn = Depends(get_db)
+):
+    """
+    Trend laporan per hari/minggu/bulan, per fasilitas/lokasi/prioritas (hanya dosen).
+    Dibaca dari bucket harian, default 30 hari terakhir.
+    """
+    if current_user['role'] != 'dosen':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, 
+            detail="Hanya dosen yang dapat melihat statistik"
+        )
+    if granularity not in trends.GRANULARITY_PERIOD:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"granularity harus salah satu dari: {', '.join(trends.GRANULARITY_PERIOD)}"
+        )
+    if dimension not in trends.DIMENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"dimension harus salah satu dari: {', '.join(trends.DIMENSIONS)}"
+        )
+
+    end = end or date.today()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start tidak boleh setelah end"
+        )
+
+    try:
+        buckets = trends.get_trends(
+            conn, start.isoformat(), end.isoformat(), granularity, dimension, max(1, min(top, 100))
+        )
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "granularity": granularity,
+            "dimension": dimension,
+            "buckets": buckets
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error getting trends: {str(e)}"
+        )
+
+@app.get("/statistik/lokasi", response_model=List[schemas.LokasiAggregateResponse])
+async def get_statistik_lokasi(
+    level: str = "gedung",
+    status_filter: str = "open",
+    prioritas: Optional[str] = None,
+    gedung: Optional[str] = None,
+    current_user: dict = Depends(get_current_user), 
+    conn = Depends(get_db)
+):
+    """
+    Jumlah laporan per gedung (atau per lantai) dari hierarki lokasi (hanya dosen).
+    Contoh: laporan terbuka prioritas tinggi per gedung -> ?prioritas=tinggi
+    """
+    if current_user['role'] != 'dosen':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, 
+            detail="Hanya dosen yang dapat melihat statistik"
+        )
+    if level not in ("gedung", "lantai"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="level harus 'gedung' atau 'lantai'"
+        )
+    statuses = {
+        "open": lokasi_helper.OPEN_STATUSES,
+        "all": enums.STATUS,
+    }.get(status_filter, (status_filter,))
+
+    try:
+        return lokasi_helper.aggregate_shards(conn, level, statuses, prioritas, gedung)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error getting statistik lokasi: {str(e)}"
+        )
+
+# ==================== GEO ENDPOINTS ====================
+
+def parse_status_filter(status_filter: str):
+    return {
+        "open": lokasi_helper.OPEN_STATUSES,
+        "all": None,
+    }.get(status_filter, (status_filter,))
+
+def parse_bbox(bbox: Optional[str]):
+    """'min_lat,min_lng,max_lat,max_lng' -> tuple float; 400 jika tidak valid"""
+    if bbox is None:
+        return None
+    try:
+        min_lat, min_lng, max_lat, max_lng = (float(value) for value in bbox.split(","))
+        geo.validate(min_lat, min_lng)
+        geo.validate(max_lat, max_lng)
+        if min_lat > max_lat or min_lng > max_lng:
+            raise ValueError
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="bbox harus 'min_lat,min_lng,max_lat,max_lng' dengan min <= max"
+        )
+    return min_lat, min_lng, max_lat, max_lng
+
+@app.get("/geo/laporan", response_model=List[schemas.LaporanGeoResponse],
+         response_model_exclude_unset=True)
+async def get_laporan_geo(
+    bbox: Optional[str] = None,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    radius_m: float = 500,
+    status_filter: str = "open",
+    limit: int = 200,
+    current_user: dict = Depends(get_current_user), 
+    conn = Depends(get_db)
+):
+    """
+    Laporan berkoordinat di sekitar titik (?lat=&lng=&radius_m=, urut jarak) atau di dalam
+    bbox (?bbox=min_lat,min_lng,max_lat,max_lng, terbaru dulu), hanya dosen
+    """
+    if current_user['role'] != 'dosen':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, 
+            detail="Hanya dosen yang dapat melihat semua laporan"
+        )
+    limit = max(1, min(limit, 1000))
+    box = parse_bbox(bbox)
+    if (lat is None or lng is None) and box is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Isi lat dan lng (radius) atau bbox"
+        )
+    center = None
+    if lat is not None and lng is not None:
+        try:
+            geo.validate(lat, lng)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if not 0 < radius_m <= 50000:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="radius_m harus antara 0 dan 50000"
+            )
+        center = (lat, lng)
+
+    try:
+        return geo.search(conn, bbox=box, center=center, radius_m=radius_m,
+                          statuses=parse_status_filter(status_filter), limit=limit)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error getting laporan geo: {str(e)}"
+        )
+
+@app.get("/geo/heatmap", response_model=List[schemas.GeoTileResponse])
+async def get_geo_heatmap(
+    zoom: int = 16,
+    bbox: Optional[str] = None,
+    status_filter: str = "open",
+    current_user: dict = Depends(get_current_user), 
+    conn = Depends(get_db)
+):
+    """
+    Heatmap laporan per tile peta (zoom/x/y Web Mercator): jumlah laporan, laporan terbuka,
+    prioritas tinggi dan titik tengahnya, diagregasi di server (hanya dosen)
+    """
+    if current_user['role'] != 'dosen':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, 
+            detail="Hanya dosen yang dapat melihat statistik"
+        )
+    if not 0 <= zoom <= geo.GRID_ZOOM:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"zoom harus antara 0 dan {geo.GRID_ZOOM}"
+        )
+
+    box = parse_bbox(bbox)
+
+    try:
+        return geo.heatmap(conn, zoom, box, parse_status_filter(status_filter))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error getting heatmap: {str(e)}"
+        )
+
+# ==================== DASHBOARD ENDPOINT ====================
+
+def dashboard_laporan(current_user, limit):
+    """Section laporan terbaru + history (satu query batch per shard), sesuai hak akses user"""
+    user_id = current_user['id'] if current_user['role'] == 'mahasiswa' else None
+    return lambda conn: list_laporan(conn, user_id, with_history=True, limit=limit)
+
+def dashboard_trends(conn):
+    """Section trend 30 hari terakhir (dari bucket harian), bentuknya sama dengan /statistik/trends"""
+    end = date.today()
+    start = end - timedelta(days=29)
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "granularity": "day",
+        "dimension": "all",
+        "buckets": trends.get_trends(conn, start.isoformat(), end.isoformat())
+    }
+
+def dashboard_sections(current_user, limit):
+    """Section yang tersedia per role: nama -> (fungsi(conn), schema response)"""
+    sections = {"laporan": (dashboard_laporan(current_user, limit), List[schemas.LaporanWithHistoryResponse])}
+    if current_user['role'] == 'dosen':
+        sections["statistik"] = (build_statistik, schemas.StatistikResponse)
+        sections["lokasi"] = (lokasi_helper.aggregate_shards, List[schemas.LokasiAggregateResponse])
+        sections["trends"] = (dashboard_trends, schemas.TrendsResponse)
+    return sections
+
+async def run_dashboard_section(name, section):
+    """Jalankan satu section di thread pool dengan koneksi baca sendiri; error/timeout tidak menggagalkan dashboard"""
+    started = time.perf_counter()
+    fn, schema = section
+
+    def work():
+        section_conn = get_connection()
+        try:
+            # Hanya field schema yang dikirim, sama seperti response_model endpoint aslinya
+            return TypeAdapter(schema).validate_python(fn(section_conn))
+        finally:
+            section_conn.close()
+
+    result = {"ok": True, "data": None, "error": None}
+    try:
+        result["data"] = await asyncio.wait_for(
+            asyncio.to_thread(work), timeout=settings.DASHBOARD_SECTION_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        result.update(ok=False, error=f"timeout setelah {settings.DASHBOARD_SECTION_TIMEOUT:g} detik")
+    except Exception as e:
+        print(f"Dashboard section {name} error: {e}")
+        result.update(ok=False, error=str(e))
+    result["ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return name, result
+
+@app.get("/dashboard", response_model=schemas.DashboardResponse)
+async def get_dashboard(
+    response: Response,
+    sections: Optional[str] = None,
+    limit: int = 50,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Semua data halaman dashboard dalam satu request: user, laporan terbaru + history,
+    dan (dosen) statistik, agregasi lokasi, trend 30 hari.
+    Section dijalankan bersamaan di koneksi terpisah; section yang gagal/timeout
+    dikembalikan dengan ok=false (partial=true) tanpa menggagalkan section lain.
+    Pilih sebagian section dengan ?sections=statistik,laporan
+    """
+    started = time.perf_counter()
+    limit = max(1, min(limit, 500))
+    available = dashboard_sections(current_user, limit)
+
+    requested = [item.strip() for item in (sections or "").split(",") if item.strip()] or list(available)
+    unknown = [name for name in requested if name not in available]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Section tidak tersedia: {', '.join(unknown)}"
+        )
+
+    results = dict(await asyncio.gather(*(run_dashboard_section(name, available[name]) for name in requested)))
+
+    # Timing per section juga dikirim sebagai Server-Timing (terlihat di devtools browser)
+    response.headers["Server-Timing"] = ", ".join(
+        f"{name};dur={result['ms']}" for name, result in results.items()
+    )
+    return {
+        "user": current_user,
+        "sections": results,
+        "partial": not all(result["ok"] for result in results.values()),
+        "total_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
 # ==================== UPLOAD ENDPOINTS ====================
 
-@app.post("/upload")
+@app.post("/upload",
+          dependencies=[Depends(ratelimit.rate_limit("upload", expensive=True))])
 async def upload_file(file: UploadFile = File(...)):
     """
     Upload file (foto) untuk laporan
@@ -674,6 +1483,7 @@ async def upload_file(file: UploadFile = File(...)):
         async with aiofiles.open(file_location, "wb") as f:
             content = await file.read()
             await f.write(content)
+        metrics.upload_bytes_total.inc(("/upload",), len(content))
         
         return {
             "filename": filename,
@@ -707,14 +1517,19 @@ async def root():
             "laporan": [
                 "POST /laporan", 
                 "GET /laporan/me", 
+                "GET /laporan/changes?since=<watermark>",
                 "GET /laporan", 
                 "GET /laporan/{id}", 
                 "PUT /laporan/{id}/status",
                 "GET /laporan/{id}/history"
             ],
-            "statistik": ["GET /statistik"],
+            "statistik": ["GET /statistik", "GET /statistik/trends", "GET /statistik/lokasi"],
+            "geo": ["GET /geo/laporan?lat=&lng=&radius_m=", "GET /geo/laporan?bbox=", "GET /geo/heatmap?zoom="],
+            "workqueue": ["POST /workqueue/claim?limit=", "POST /workqueue/{id}/release"],
+            "dashboard": ["GET /dashboard"],
             "upload": ["POST /upload"],
-            "health": ["GET /health"]
+            "health": ["GET /health", "GET /metrics"],
+            "admin": ["GET /admin/slow-queries"]
         }
     }
 
@@ -744,6 +1559,7 @@ async def health_check(conn = Depends(get_db)):
             "database": "connected",
             "tables": table_status,
             "timestamp": datetime.now().isoformat(),
+            "startup_ms": round(getattr(app.state, "startup_seconds", 0) * 1000, 1),
             "environment": "development"
         }
     except Exception as e:
@@ -752,6 +1568,84 @@ async def health_check(conn = Depends(get_db)):
             detail=f"Service unhealthy: {str(e)}"
         )
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Metrics format Prometheus untuk worker ini
+    """
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics tidak aktif")
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+# ==================== ADMIN ENDPOINTS ====================
+
+@app.get("/admin/slow-queries", response_model=List[schemas.SlowQueryResponse])
+async def get_slow_queries(
+    limit: int = 20,
+    order: str = "total",
+    full_scan_only: bool = False,
+    current_user: dict = Depends(get_current_user),
+    conn = Depends(get_db)
+):
+    """
+    Statement paling lambat dari slow query log (hanya dosen)
+    """
+    if current_user['role'] != 'dosen':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, 
+            detail="Hanya dosen yang dapat melihat slow query log"
+        )
+    if order not in slowlog.ORDER_COLUMNS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"order harus salah satu dari: {', '.join(sorted(slowlog.ORDER_COLUMNS))}"
+        )
+
+    try:
+        return slowlog.top_offenders(conn, max(1, min(limit, 200)), order, full_scan_only)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error getting slow queries: {str(e)}"
+        )
+
+@app.post("/admin/users/import", response_model=schemas.RosterImportResponse)
+async def import_users(
+    file: UploadFile = File(...),
+    default_role: str = Form("mahasiswa"),
+    dry_run: bool = Form(False),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Provisioning user massal dari roster CSV (hanya dosen).
+    Kolom: username, email, nama_lengkap, role (opsional), password (opsional, kosong = dibuat otomatis
+    dan dikembalikan di `credentials`). Baris yang gagal dilaporkan di `errors` tanpa menggagalkan baris lain.
+    """
+    if current_user['role'] != 'dosen':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, 
+            detail="Hanya dosen yang dapat import user"
+        )
+    if default_role not in enums.ROLE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Role harus 'mahasiswa' atau 'dosen'"
+        )
+
+    try:
+        # Hash + insert berjalan di thread (process pool untuk hash), event loop tidak tertahan
+        return await asyncio.to_thread(roster.import_upload, file.file, default_role, dry_run)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error importing users: {str(e)}"
+        )
+
 # ==================== ERROR HANDLERS ====================
 
 @app.exception_handler(404)
@@ -770,18 +1664,14 @@ async def internal_error_handler(request, exc):
 
 @app.exception_handler(422)
 async def validation_error_handler(request, exc):
+    # HTTPException 422 dari endpoint (mis. Idempotency-Key dipakai ulang) membawa pesannya sendiri
+    detail = exc.detail if isinstance(exc, HTTPException) else "Data yang dikirim tidak valid"
     return JSONResponse(
         status_code=422,
-        content={"detail": "Data yang dikirim tidak valid"},
+        content={"detail": detail},
     )
 
-# Application entry point
+# Application entry point (production launcher, lihat app/server.py)
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+    from app.server import main
+    main()
@@ -0,0 +1,219 @@
+import re
+import threading
+import time
+
+from app.config import settings
+
+# Instrumentasi ringan format Prometheus (text exposition 0.0.4) tanpa dependency tambahan.
+# Nilai disimpan per worker process; scrape tiap worker (atau jalankan 1 worker per port).
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labelnames, labels, extra=None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, labels=(), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, labels=(), amount: float = 1):
+        self.inc(labels, -amount)
+
+    def set(self, value: float, labels=()):
+        with self._lock:
+            self._values[labels] = value
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, labels=()):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # [count per bucket..., sum, count]
+                state = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = [(labels, list(state)) for labels, state in self._values.items()]
+        for labels, state in items:
+            cumulative = 0
+            for i, bound in enumerate(self.buckets):
+                cumulative += state[i]
+                label_str = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{label_str} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{label_str} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {state[-1]}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+http_requests_total = registry.register(Counter(
+    "civitasfix_http_requests_total", "Jumlah HTTP request per route dan status code",
+    ("method", "route", "status")
+))
+http_request_duration = registry.register(Histogram(
+    "civitasfix_http_request_duration_seconds", "Latency HTTP request per route",
+    ("method", "route")
+))
+http_requests_in_progress = registry.register(Gauge(
+    "civitasfix_http_requests_in_progress", "Jumlah HTTP request yang sedang diproses"
+))
+db_query_duration = registry.register(Histogram(
+    "civitasfix_db_query_duration_seconds", "Waktu eksekusi execute_query per statement fingerprint",
+    ("statement",)
+))
+db_query_errors_total = registry.register(Counter(
+    "civitasfix_db_query_errors_total", "Jumlah query yang gagal per statement fingerprint",
+    ("statement",)
+))
+upload_bytes_total = registry.register(Counter(
+    "civitasfix_upload_bytes_total", "Total byte file yang diupload", ("endpoint",)
+))
+email_send_duration = registry.register(Histogram(
+    "civitasfix_email_send_duration_seconds", "Latency pengiriman email", ("result",)
+))
+
+# ==================== SQL FINGERPRINT ====================
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+_fingerprint_cache = {}
+_FINGERPRINT_CACHE_SIZE = 1024
+
+def fingerprint(query: str) -> str:
+    """Normalisasi SQL: literal jadi ?, daftar IN (?, ?, ...) jadi IN (?), spasi dirapikan"""
+    cached = _fingerprint_cache.get(query)
+    if cached is not None:
+        return cached
+
+    normalized = _STRING_LITERAL.sub("?", query)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("IN (?)", normalized)
+    normalized = _WHITESPACE.sub(" ", normalized).strip()
+
+    if len(_fingerprint_cache) < _FINGERPRINT_CACHE_SIZE:
+        _fingerprint_cache[query] = normalized
+    return normalized
+
+def observe_query(query: str, seconds: float, failed: bool = False):
+    # METRICS_ENABLED=0: tanpa fingerprint regex + update histogram per statement
+    if not settings.METRICS_ENABLED:
+        return
+    labels = (fingerprint(query),)
+    db_query_duration.observe(seconds, labels)
+    if failed:
+        db_query_errors_total.inc(labels)
+
+# ==================== ASGI MIDDLEWARE ====================
+
+class MetricsMiddleware:
+    """
+    ASGI middleware murni (tanpa BaseHTTPMiddleware) supaya overhead per request kecil.
+    Label route memakai template path (/laporan/{laporan_id}), bukan path asli.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths = None
+
+    def _route_label(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._route_paths is None:
+            router = scope.get("router")
+            routes = getattr(router, "routes", [])
+            self._route_paths = {
+                getattr(route, "endpoint", None) or getattr(route, "app", None): route.path
+                for route in routes
+            }
+        return self._route_paths.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+        http_requests_in_progress.inc()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_progress.dec()
+            route = self._route_label(scope)
+            method = scope["method"]
+            http_request_duration.observe(elapsed, (method, route))
+            http_requests_total.inc((method, route, str(status_code)))
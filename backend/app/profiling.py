@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from app import metrics
+from app.config import settings
+
+# Profiling on-demand per request (PROFILE_ENABLED=1; tanpa itu middleware tidak dipasang
+# sama sekali, jadi tidak ada overhead). Request diprofil jika terpilih sampling
+# PROFILE_SAMPLE_RATE atau membawa header X-Profile bertanda tangan (python -m app.profiling token).
+#
+# Per request yang diprofil ditulis ke PROFILE_DIR (hanya PROFILE_KEEP profil terakhir disimpan):
+# - <id>.cpu.folded   : stack sampling tiap PROFILE_INTERVAL_MS (format collapsed/folded,
+#                       bisa dibuka di speedscope atau flamegraph.pl)
+# - <id>.alloc.folded : selisih alokasi tracemalloc selama request per traceback (bobot = byte)
+# - <id>.json         : ringkasan (route, status, durasi, top alokasi per baris)
+# Thread event loop selalu disampling; thread lain (fan-out shard, to_thread, group commit)
+# hanya jika sedang menjalankan kode app.*. Hanya satu request diprofil dalam satu waktu,
+# dan request lain yang berjalan bersamaan di event loop ikut terlihat di profil.
+
+HEADER = "x-profile"
+
+profiles_captured_total = metrics.registry.register(metrics.Counter(
+    "civitasfix_profiles_captured_total", "Request yang diprofil", ("trigger",)
+))
+
+# ==================== TOKEN HEADER ====================
+
+def _secret() -> bytes:
+    return (settings.PROFILE_SECRET or settings.SECRET_KEY).encode()
+
+def make_token(ttl_seconds: int = 600) -> str:
+    """Nilai header X-Profile yang berlaku sampai `ttl_seconds` dari sekarang"""
+    expires = int(time.time()) + ttl_seconds
+    signature = hmac.new(_secret(), f"profile:{expires}".encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+def verify_token(token: str) -> bool:
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = hmac.new(_secret(), f"profile:{expires}".encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature, expected)
+
+# ==================== STACK SAMPLER ====================
+
+def _frame_name(frame) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_qualname}"
+
+def _collapse(frame):
+    """Stack dari root ke leaf sebagai list nama frame"""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+class StackSampler(threading.Thread):
+    """Ambil stack thread-thread aplikasi tiap `interval` detik sampai stop()"""
+
+    def __init__(self, main_thread_id: int, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.main_thread_id = main_thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        names = {}
+        while not self._stopped.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                stack = _collapse(frame)
+                if thread_id != self.main_thread_id and not any(name.startswith("app.") for name in stack):
+                    continue
+                if thread_id not in names:
+                    names[thread_id] = next(
+                        (t.name for t in threading.enumerate() if t.ident == thread_id), str(thread_id)
+                    )
+                self.stacks[";".join([names[thread_id]] + stack)] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+# ==================== OUTPUT ====================
+
+def _write_folded(path: str, weights):
+    with open(path, "w") as f:
+        for stack, weight in sorted(weights.items(), key=lambda item: -item[1]):
+            f.write(f"{stack} {weight}\n")
+
+def _allocation_stats(before, after):
+    ignore = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        # Alokasi sampler sendiri (thread profile-sampler) bukan bagian dari request
+        tracemalloc.Filter(False, __file__, all_frames=True),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    )
+    before, after = before.filter_traces(ignore), after.filter_traces(ignore)
+    folded = Counter()
+    for stat in after.compare_to(before, "traceback"):
+        if stat.size_diff > 0:
+            stack = ";".join(f"{frame.filename}:{frame.lineno}" for frame in stat.traceback)
+            folded[stack] += stat.size_diff
+    top_lines = [
+        {"line": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+         "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+        for stat in after.compare_to(before, "lineno")[:30] if stat.size_diff > 0
+    ]
+    return folded, top_lines
+
+def _rotate(directory: str, keep: int):
+    profiles = sorted(name[:-len(".json")] for name in os.listdir(directory) if name.endswith(".json"))
+    for profile_id in profiles[:-keep] if keep else []:
+        for suffix in (".json", ".cpu.folded", ".alloc.folded"):
+            try:
+                os.remove(os.path.join(directory, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+def write_profile(profile_id: str, info: dict, sampler: StackSampler, before, after):
+    directory = settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, profile_id)
+
+    _write_folded(base + ".cpu.folded", sampler.stacks)
+    allocations, top_lines = _allocation_stats(before, after)
+    _write_folded(base + ".alloc.folded", allocations)
+    info.update({
+        "samples": sampler.samples,
+        "interval_ms": sampler.interval * 1000,
+        "allocated_bytes": sum(allocations.values()),
+        "top_allocations": top_lines,
+    })
+    with open(base + ".json", "w") as f:
+        json.dump(info, f, indent=2)
+    _rotate(directory, settings.PROFILE_KEEP)
+
+# ==================== ASGI MIDDLEWARE ====================
+
+class ProfilingMiddleware:
+    """Dipasang hanya jika PROFILE_ENABLED=1 (lihat main.py)"""
+
+    def __init__(self, app):
+        self.app = app
+        self._busy = False
+
+    def _trigger(self, scope):
+        for name, value in scope["headers"]:
+            if name == HEADER.encode():
+                return "header" if verify_token(value.decode("latin-1")) else None
+        if settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._busy:
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        self._busy = True
+        route = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{scope['method']}-{route}"
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode())
+                ]
+            await send(message)
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(settings.PROFILE_TRACEMALLOC_FRAMES)
+        sampler = StackSampler(threading.get_ident(), settings.PROFILE_INTERVAL_MS / 1000)
+        sampler.start()
+        before = tracemalloc.take_snapshot()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            sampler.stop()
+            after = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+            self._busy = False
+            profiles_captured_total.inc((trigger,))
+            info = {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status_code,
+                "trigger": trigger,
+                "duration_ms": round(elapsed * 1000, 3),
+            }
+            # Response sudah terkirim; tulis file di thread supaya event loop tidak tertahan
+            try:
+                await asyncio.to_thread(write_profile, profile_id, info, sampler, before, after)
+            except Exception as e:
+                print(f"Profiling write error: {e}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profiling request CivitasFix")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    token = subparsers.add_parser("token", help="Buat nilai header X-Profile bertanda tangan")
+    token.add_argument("--ttl", type=int, default=600, help="Masa berlaku token (detik)")
+    subparsers.add_parser("list", help="Daftar profil tersimpan di PROFILE_DIR")
+    args = parser.parse_args(argv)
+
+    if args.command == "token":
+        print(f"X-Profile: {make_token(args.ttl)}")
+        return
+    if not os.path.isdir(settings.PROFILE_DIR):
+        print(f"Belum ada profil di {settings.PROFILE_DIR}")
+        return
+    for name in sorted(os.listdir(settings.PROFILE_DIR)):
+        if name.endswith(".json"):
+            with open(os.path.join(settings.PROFILE_DIR, name)) as f:
+                info = json.load(f)
+            print(f"{info['id']}  {info['status']}  {info['duration_ms']:.1f} ms  "
+                  f"{info['allocated_bytes'] / 1024:.0f} KB  ({info['trigger']})")
+
+if __name__ == "__main__":
+    main()
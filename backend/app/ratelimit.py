@@ -0,0 +1,266 @@
+import contextlib
+import math
+import sqlite3
+import threading
+import time
+
+from fastapi import HTTPException, Request, status
+
+from app import auth, metrics
+from app.config import settings
+
+# Rate limiting (token bucket per user dan per IP, limit berbeda per route) dan admission
+# control (batas request bersamaan untuk endpoint mahal seperti login/PBKDF2 dan upload foto).
+# State bucket default di memori per worker; RATE_LIMIT_BACKEND=sqlite menyimpannya di file
+# SQLite bersama supaya limit berlaku gabungan untuk semua worker.
+# Batas concurrency selalu per worker (menjaga CPU/disk proses itu sendiri).
+
+ratelimit_rejected_total = metrics.registry.register(metrics.Counter(
+    "civitasfix_ratelimit_rejected_total", "Request yang ditolak rate limiter / admission control",
+    ("route", "reason")
+))
+expensive_in_progress = metrics.registry.register(metrics.Gauge(
+    "civitasfix_expensive_requests_in_progress", "Request endpoint mahal yang sedang diproses"
+))
+
+class Rate:
+    """`count` request per `seconds` detik; kapasitas burst = count"""
+
+    def __init__(self, count: int, seconds: float):
+        self.count = count
+        self.seconds = seconds
+
+    @property
+    def per_second(self) -> float:
+        return self.count / self.seconds
+
+    @classmethod
+    def parse(cls, text: str):
+        """'10/60' -> 10 request per 60 detik; '0' atau kosong = tanpa limit"""
+        text = (text or "").strip()
+        if not text or text == "0":
+            return None
+        count, _, seconds = text.partition("/")
+        return cls(int(count), float(seconds or 60))
+
+    def __repr__(self):
+        return f"Rate({self.count}/{self.seconds:g}s)"
+
+def parse_rules(text: str) -> dict:
+    """'login.ip=10/60,laporan_create.user=10/60' -> {('login', 'ip'): Rate(10, 60), ...}"""
+    rules = {}
+    for item in (text or "").split(","):
+        name, _, rate = item.strip().partition("=")
+        if not name or not rate:
+            continue
+        route, _, scope = name.partition(".")
+        rules[(route, scope or "ip")] = Rate.parse(rate)
+    return rules
+
+# Default per route; bisa ditimpa sebagian lewat env RATE_LIMITS dengan format yang sama
+DEFAULT_RULES = parse_rules(
+    "login.ip=20/60,"
+    "register.ip=5/60,"
+    "laporan_create.user=10/60,laporan_create.ip=30/60,"
+    "upload.user=20/60,upload.ip=60/60"
+)
+
+# ==================== BACKEND BUCKET ====================
+
+class MemoryBuckets:
+    """Token bucket di memori (per worker process)"""
+
+    MAX_KEYS = 50000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: Rate, now: float = None):
+        """Ambil 1 token; return (allowed, retry_after_seconds)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (rate.count, now))
+            tokens = min(rate.count, tokens + (now - updated) * rate.per_second)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (1 - tokens) / rate.per_second
+            if len(self._buckets) > self.MAX_KEYS:
+                self._prune(now)
+        return allowed, retry_after
+
+    def _prune(self, now: float):
+        # Bucket idle > 1 jam sudah penuh kembali, aman dibuang
+        idle = [key for key, (_, updated) in self._buckets.items() if now - updated > 3600]
+        for key in idle:
+            del self._buckets[key]
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+class SQLiteBuckets:
+    """
+    Token bucket di file SQLite yang dipakai bersama oleh semua worker.
+    Refill + ambil token dilakukan dalam satu statement UPSERT sehingga atomik antar proses.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: Rate, now: float = None):
+        # Waktu wall clock (bukan monotonic) karena dibagi antar proses
+        now = time.time() if now is None else now
+        conn = self._connection()
+        refilled = "MIN(:capacity, tokens + (:now - updated) * :per_second)"
+        row = conn.execute(
+            f"""INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (:key, :capacity - 1, :now)
+                ON CONFLICT(key) DO UPDATE SET tokens = {refilled} - 1, updated = :now
+                WHERE {refilled} >= 1
+                RETURNING tokens""",
+            {"key": key, "capacity": rate.count, "now": now, "per_second": rate.per_second}
+        ).fetchone()
+        if row is not None:
+            return True, 0.0
+
+        current = conn.execute(
+            f"SELECT {refilled} FROM rate_limit_buckets WHERE key = :key",
+            {"key": key, "capacity": rate.count, "now": now, "per_second": rate.per_second}
+        ).fetchone()
+        tokens = current[0] if current else 0.0
+        return False, max(0.0, (1 - tokens) / rate.per_second)
+
+    def reset(self):
+        self._connection().execute("DELETE FROM rate_limit_buckets")
+
+    def prune(self, idle_seconds: float = 3600):
+        """Hapus bucket yang idle (sudah penuh kembali), panggil sesekali"""
+        return self._connection().execute(
+            "DELETE FROM rate_limit_buckets WHERE updated < ?", (time.time() - idle_seconds,)
+        ).rowcount
+
+# ==================== ADMISSION CONTROL ====================
+
+class ConcurrencyLimiter:
+    """Batas jumlah request bersamaan per grup endpoint mahal (per worker)"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.limit and self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+# ==================== DEPENDENCY ====================
+
+_rules = {**DEFAULT_RULES, **parse_rules(settings.RATE_LIMITS)}
+_buckets = (
+    SQLiteBuckets(settings.RATE_LIMIT_DATABASE_PATH)
+    if settings.RATE_LIMIT_BACKEND == "sqlite" else MemoryBuckets()
+)
+_expensive = ConcurrencyLimiter(settings.MAX_CONCURRENT_EXPENSIVE)
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def client_user(request: Request):
+    """Username dari bearer token (verifikasi signature saja, tanpa query database)"""
+    header = request.headers.get("authorization", "")
+    if not header.lower().startswith("bearer "):
+        return None
+    payload = auth.verify_token(header[7:])
+    return payload.get("sub") if payload else None
+
+def _reject(route: str, reason: str, status_code: int, detail: str, retry_after: float):
+    ratelimit_rejected_total.inc((route, reason))
+    raise HTTPException(
+        status_code=status_code,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+def check_rate(request: Request, route: str):
+    """Raise 429 jika bucket per IP atau per user untuk route ini sudah habis"""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    identities = (("ip", client_ip(request)), ("user", client_user(request)))
+    for scope, identity in identities:
+        rate = _rules.get((route, scope))
+        if rate is None or identity is None:
+            continue
+        allowed, retry_after = _buckets.take(f"{route}:{scope}:{identity}", rate)
+        if not allowed:
+            _reject(route, scope, status.HTTP_429_TOO_MANY_REQUESTS,
+                    "Terlalu banyak request, coba lagi nanti", retry_after)
+
+@contextlib.contextmanager
+def admission(route: str):
+    """
+    Batas MAX_CONCURRENT_EXPENSIVE untuk sebagian handler saja (mis. simpan foto di POST /laporan
+    saat group commit aktif); penuh = 503 seperti dependency `expensive`.
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        yield
+        return
+    if not _expensive.try_acquire():
+        _reject(route, "concurrency", status.HTTP_503_SERVICE_UNAVAILABLE,
+                "Server sedang sibuk, coba lagi sebentar lagi", settings.ADMISSION_RETRY_AFTER)
+    expensive_in_progress.inc()
+    try:
+        yield
+    finally:
+        expensive_in_progress.dec()
+        _expensive.release()
+
+def rate_limit(route: str, expensive: bool = False):
+    """
+    Dependency FastAPI: Depends(ratelimit.rate_limit("login", expensive=True)).
+    Endpoint `expensive` juga dibatasi MAX_CONCURRENT_EXPENSIVE request bersamaan;
+    jika penuh, request langsung ditolak 503 (load shedding) daripada mengantre.
+    """
+    async def dependency(request: Request):
+        check_rate(request, route)
+        if not expensive:
+            yield
+            return
+        with admission(route):
+            yield
+
+    return dependency
+
+def reset():
+    """Kosongkan semua bucket (testing / benchmark)"""
+    _buckets.reset()
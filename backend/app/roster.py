@@ -0,0 +1,236 @@
+import argparse
+import csv
+import io
+import multiprocessing
+import os
+import secrets
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pydantic import ValidationError
+
+from app import enums, escalation, metrics, schemas
+from app.auth import hash_password
+from app.config import settings
+from app.database import get_connection
+
+# Provisioning user massal dari roster CSV (mahasiswa baru / dosen) sebagai pengganti
+# /register satu per satu. Kolom: username, email, nama_lengkap, role (opsional, default
+# --role), password (opsional, kosong = password acak dikembalikan di laporan hasil).
+# File dibaca streaming per ROSTER_CHUNK_SIZE baris; per chunk:
+# - validasi sama seperti /register + duplikat di dalam file
+# - cek bentrok username/email dengan users dalam satu query berbasis set (tabel temp + JOIN)
+# - hash PBKDF2 paralel di process pool (ROSTER_HASH_WORKERS proses)
+# - INSERT executemany dalam satu transaksi
+# Baris yang gagal dilaporkan per nomor baris tanpa menggagalkan baris lain.
+
+REQUIRED_COLUMNS = ("username", "email", "nama_lengkap")
+
+roster_users_total = metrics.registry.register(metrics.Counter(
+    "civitasfix_roster_users_total", "Baris roster yang diproses", ("result",)
+))
+
+def _validate(row: dict, default_role: str):
+    """Baris CSV -> (UserCreate, password dibuat otomatis atau None); ValueError jika tidak valid"""
+    generated = None
+    password = (row.get("password") or "").strip()
+    if not password:
+        password = generated = secrets.token_urlsafe(9)
+    try:
+        user = schemas.UserCreate(
+            username=(row.get("username") or "").strip(),
+            email=(row.get("email") or "").strip(),
+            nama_lengkap=(row.get("nama_lengkap") or "").strip(),
+            role=(row.get("role") or "").strip() or default_role,
+            password=password,
+        )
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+    if not user.username or not user.nama_lengkap:
+        raise ValueError("username dan nama_lengkap wajib diisi")
+    if escalation.is_reserved(user.username, user.email):
+        raise ValueError("Username tersebut dicadangkan untuk sistem")
+    if not 6 <= len(user.password) <= 72:
+        raise ValueError("Password harus 6-72 karakter")
+    if user.role not in enums.ROLE:
+        raise ValueError("Role harus 'mahasiswa' atau 'dosen'")
+    return user, generated
+
+def _conflicts(conn, users) -> dict:
+    """{index: pesan} untuk user yang username/email-nya sudah terdaftar (satu query untuk satu chunk)"""
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS roster_import (idx INTEGER PRIMARY KEY, username TEXT, email TEXT)")
+    conn.execute("DELETE FROM temp.roster_import")
+    conn.executemany(
+        "INSERT INTO temp.roster_import (idx, username, email) VALUES (?, ?, ?)",
+        [(i, user.username, user.email) for i, user in enumerate(users)]
+    )
+    rows = conn.execute(
+        """SELECT r.idx, 'Username sudah terdaftar' FROM temp.roster_import r JOIN users u ON u.username = r.username
+           UNION ALL
+           SELECT r.idx, 'Email sudah terdaftar' FROM temp.roster_import r JOIN users u ON u.email = r.email"""
+    ).fetchall()
+    conn.execute("DELETE FROM temp.roster_import")
+    conn.commit()
+    conflicts = {}
+    for idx, message in rows:
+        conflicts.setdefault(idx, message)
+    return conflicts
+
+def _insert(conn, rows) -> dict:
+    """INSERT satu chunk dalam satu transaksi; {index: error} untuk baris yang gagal"""
+    sql = "INSERT INTO users (username, email, password_hash, role, nama_lengkap) VALUES (?, ?, ?, ?, ?)"
+    try:
+        with conn:
+            conn.executemany(sql, [values for _, values in rows])
+        return {}
+    except sqlite3.IntegrityError:
+        pass
+    # User yang sama didaftarkan lewat /register di antara cek dan insert: ulangi per baris
+    failed = {}
+    with conn:
+        for idx, values in rows:
+            try:
+                conn.execute("SAVEPOINT roster_row")
+                conn.execute(sql, values)
+                conn.execute("RELEASE roster_row")
+            except sqlite3.IntegrityError:
+                conn.execute("ROLLBACK TO roster_row")
+                conn.execute("RELEASE roster_row")
+                failed[idx] = "Username atau email sudah terdaftar"
+    return failed
+
+def import_roster(stream, default_role: str = "mahasiswa", dry_run: bool = False,
+                  chunk_size: int = None, workers: int = None, conn=None, verbose: bool = False) -> dict:
+    """
+    Provision user dari CSV (file teks terbuka). Return ringkasan: jumlah dibuat/gagal,
+    error per baris dan password yang dibuat otomatis.
+    """
+    chunk_size = chunk_size or settings.ROSTER_CHUNK_SIZE
+    workers = workers or settings.ROSTER_HASH_WORKERS or os.cpu_count() or 1
+    started = time.perf_counter()
+    report = {"total": 0, "created": 0, "failed": 0, "dry_run": dry_run, "errors": [], "credentials": []}
+
+    reader = csv.DictReader(stream)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"Kolom wajib tidak ada di CSV: {', '.join(missing)}")
+
+    own_conn = conn is None
+    conn = conn or get_connection()
+    # spawn: aman dipanggil dari worker uvicorn yang punya thread (fork bisa deadlock)
+    pool = None if dry_run else ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    seen_usernames, seen_emails = set(), set()
+
+    def error(line, username, message):
+        report["failed"] += 1
+        report["errors"].append({"row": line, "username": username, "error": message})
+
+    def process(chunk):
+        users = []
+        for line, row in chunk:
+            username = (row.get("username") or "").strip()
+            try:
+                user, generated = _validate(row, default_role)
+            except ValueError as e:
+                error(line, username, str(e))
+                continue
+            if user.username in seen_usernames or user.email in seen_emails:
+                error(line, username, "Username atau email duplikat di dalam file")
+                continue
+            seen_usernames.add(user.username)
+            seen_emails.add(user.email)
+            users.append((line, user, generated))
+
+        conflicts = _conflicts(conn, [user for _, user, _ in users])
+        for idx, message in conflicts.items():
+            error(users[idx][0], users[idx][1].username, message)
+        users = [item for i, item in enumerate(users) if i not in conflicts]
+        if dry_run:
+            report["created"] += len(users)
+            return
+        if not users:
+            return
+
+        hashes = list(pool.map(hash_password, [user.password for _, user, _ in users],
+                               chunksize=max(1, len(users) // (4 * workers))))
+        rows = [
+            (i, (user.username, user.email, password_hash, enums.code("role", user.role), user.nama_lengkap))
+            for i, ((_, user, _), password_hash) in enumerate(zip(users, hashes))
+        ]
+        failed = _insert(conn, rows)
+        for i, (line, user, generated) in enumerate(users):
+            if i in failed:
+                error(line, user.username, failed[i])
+                continue
+            report["created"] += 1
+            if generated:
+                report["credentials"].append({"username": user.username, "password": generated})
+
+    try:
+        chunk = []
+        # Baris 1 = header, jadi baris data pertama = 2
+        for line, row in enumerate(reader, start=2):
+            report["total"] += 1
+            chunk.append((line, row))
+            if len(chunk) >= chunk_size:
+                process(chunk)
+                chunk = []
+                if verbose:
+                    print(f"  {report['total']} baris: {report['created']} dibuat, {report['failed']} gagal")
+        if chunk:
+            process(chunk)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if own_conn:
+            conn.close()
+
+    report["errors"].sort(key=lambda item: item["row"])
+    if not dry_run:
+        roster_users_total.inc(("created",), report["created"])
+        roster_users_total.inc(("failed",), report["failed"])
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+def import_upload(file, default_role: str = "mahasiswa", dry_run: bool = False) -> dict:
+    """import_roster untuk UploadFile (file biner) dari endpoint admin"""
+    stream = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        return import_roster(stream, default_role, dry_run)
+    finally:
+        stream.detach()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Provisioning user massal dari roster CSV")
+    parser.add_argument("csv", help="File roster (username,email,nama_lengkap[,role][,password])")
+    parser.add_argument("--role", default="mahasiswa", choices=enums.ROLE, help="Role jika kolom role kosong")
+    parser.add_argument("--dry-run", action="store_true", help="Validasi + cek bentrok saja, tanpa insert")
+    parser.add_argument("--chunk-size", type=int, default=settings.ROSTER_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=settings.ROSTER_HASH_WORKERS or None,
+                        help="Jumlah proses hash password (default jumlah CPU)")
+    parser.add_argument("--output", help="Tulis hasil per baris (error + password otomatis) ke CSV ini")
+    args = parser.parse_args(argv)
+
+    with open(args.csv, encoding="utf-8-sig", newline="") as f:
+        report = import_roster(f, args.role, args.dry_run, args.chunk_size, args.workers, verbose=True)
+
+    action = "akan dibuat" if args.dry_run else "dibuat"
+    print(f"👥 Roster: {report['created']} dari {report['total']} user {action}, "
+          f"{report['failed']} gagal ({report['seconds']} s)")
+    for item in report["errors"][:20]:
+        print(f"  baris {item['row']} ({item['username']}): {item['error']}")
+    if len(report["errors"]) > 20:
+        print(f"  ... {len(report['errors']) - 20} error lainnya")
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["row", "username", "status", "error", "password"])
+            for item in report["errors"]:
+                writer.writerow([item["row"], item["username"], "gagal", item["error"], ""])
+            for item in report["credentials"]:
+                writer.writerow(["", item["username"], "dibuat", "", item["password"]])
+        print(f"📄 Hasil per baris ditulis ke {args.output}")
+
+if __name__ == "__main__":
+    main()
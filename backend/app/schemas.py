@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Dict, Union
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -43,6 +43,10 @@ class LaporanResponse(LaporanBase):
     foto_url: Optional[str]
     user_id: int
     dosen_id: Optional[int]
+    location_id: Optional[int] = None
+    escalated_at: Optional[datetime] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     created_at: datetime
     updated_at: datetime
 
@@ -63,6 +67,10 @@ class StatusHistoryResponse(StatusHistoryBase):
     class Config:
         from_attributes = True
 
+class LaporanWithHistoryResponse(LaporanResponse):
+    # Hanya terisi jika diminta dengan ?include=history
+    history: Optional[List[StatusHistoryResponse]] = None
+
 class StatusUpdate(BaseModel):
     status: str
     catatan: Optional[str] = None
@@ -80,4 +88,105 @@ class StatistikResponse(BaseModel):
     dilaporkan: int
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class LaporanChangesResponse(BaseModel):
+    laporan: List[LaporanResponse]
+    history: List[StatusHistoryResponse]
+    deleted: List[int]
+    # Dipindah ke arsip: bukan dihapus, tetap bisa dibaca lewat detail / include_archived
+    archived: List[int] = []
+    # int tanpa SHARDS, "seq0.seq1..." (satu seq per shard) dengan SHARDS
+    watermark: Union[int, str]
+    has_more: bool
+
+class RosterRowError(BaseModel):
+    row: int
+    username: str
+    error: str
+
+class RosterCredential(BaseModel):
+    username: str
+    password: str
+
+class RosterImportResponse(BaseModel):
+    total: int
+    created: int
+    failed: int
+    dry_run: bool
+    seconds: float
+    errors: List[RosterRowError]
+    credentials: List[RosterCredential]
+
+class SlowQueryResponse(BaseModel):
+    fingerprint: str
+    calls: int
+    total_ms: float
+    max_ms: float
+    avg_ms: float
+    last_rows: Optional[int]
+    param_shape: Optional[str]
+    query_plan: Optional[str]
+    full_scan: bool
+    first_seen: datetime
+    last_seen: datetime
+
+class TrendBucket(BaseModel):
+    period: str
+    value: str
+    created: int
+    selesai: int
+    ditolak: int
+    resolution_p50_hours: Optional[float]
+    resolution_p90_hours: Optional[float]
+
+class TrendsResponse(BaseModel):
+    start: str
+    end: str
+    granularity: str
+    dimension: str
+    buckets: List[TrendBucket]
+
+class LokasiAggregateResponse(BaseModel):
+    gedung: str
+    lantai: Optional[str] = None
+    total: int
+    tinggi: int
+    sedang: int
+    rendah: int
+
+class AutocompleteSuggestion(BaseModel):
+    value: str
+    count: int
+
+class LaporanClaimResponse(LaporanResponse):
+    claim_expires_at: Optional[datetime] = None
+
+class LaporanGeoResponse(LaporanResponse):
+    distance_m: Optional[float] = None
+
+class GeoTileResponse(BaseModel):
+    zoom: int
+    x: int
+    y: int
+    total: int
+    open: int
+    tinggi: int
+    latitude: float
+    longitude: float
+
+class DashboardSection(BaseModel):
+    ok: bool
+    ms: float
+    # Tiap section divalidasi dengan schema endpoint aslinya (lihat main.dashboard_sections),
+    # jadi kolom internal (geocell, claim_expires_at, ...) tidak ikut terkirim
+    data: Optional[Union[
+        List[LaporanWithHistoryResponse], StatistikResponse, List[LokasiAggregateResponse], TrendsResponse
+    ]] = None
+    error: Optional[str] = None
+
+class DashboardResponse(BaseModel):
+    user: UserResponse
+    sections: Dict[str, DashboardSection]
+    partial: bool
+    total_ms: float
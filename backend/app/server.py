@@ -0,0 +1,71 @@
+import argparse
+import os
+import time
+
+import uvicorn
+
+from app.config import settings
+
+# Production launcher: multi-worker, preload, graceful shutdown.
+# Untuk development (auto-reload) tetap gunakan run.py.
+
+def preload(seed: bool):
+    """
+    Siapkan database sekali di proses master sebelum worker dijalankan,
+    lalu import aplikasi untuk memastikan tidak ada error import (fail fast).
+    Worker tidak perlu lagi menjalankan create_tables()/seed saat startup.
+    """
+    started = time.perf_counter()
+
+    from app.database import create_tables, seed_sample_data
+    create_tables()
+    if seed:
+        seed_sample_data()
+
+    import app.main  # noqa: F401
+
+    # Env diwarisi worker baru, settings dipakai worker di proses yang sama
+    os.environ["INIT_DB_ON_STARTUP"] = "0"
+    os.environ["SEED_SAMPLE_DATA"] = "0"
+    settings.INIT_DB_ON_STARTUP = False
+    settings.SEED_SAMPLE_DATA = False
+
+    print(f"✅ Preload selesai dalam {(time.perf_counter() - started) * 1000:.0f} ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CivitasFix API production server")
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument("--workers", type=int, default=settings.WORKERS,
+                        help="Jumlah worker process (default: env WORKERS atau 1)")
+    parser.add_argument("--preload", dest="preload", action="store_true", default=settings.PRELOAD,
+                        help="Buat tabel sekali di master sebelum worker dijalankan")
+    parser.add_argument("--no-preload", dest="preload", action="store_false")
+    parser.add_argument("--seed", action="store_true", default=settings.SEED_SAMPLE_DATA,
+                        help="Insert data contoh (opt-in)")
+    parser.add_argument("--graceful-timeout", type=int, default=settings.GRACEFUL_TIMEOUT,
+                        help="Detik menunggu request berjalan selesai saat shutdown")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--access-log", action="store_true",
+                        help="Aktifkan access log uvicorn (default mati di production)")
+    args = parser.parse_args(argv)
+
+    if args.preload:
+        preload(args.seed)
+    elif args.seed:
+        os.environ["SEED_SAMPLE_DATA"] = "1"
+        settings.SEED_SAMPLE_DATA = True
+
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        reload=False,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+        access_log=args.access_log
+    )
+
+if __name__ == "__main__":
+    main()
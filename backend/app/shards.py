@@ -0,0 +1,196 @@
+import heapq
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+
+from app import enums
+from app.config import settings
+from app.database import get_connection
+
+# Sharding horizontal laporan + status_history per fakultas/kampus.
+# Shard 0 = database utama (settings.DATABASE_PATH) yang juga menyimpan tabel global
+# (users, locations, slow_query_log, ...). Shard lain dikonfigurasi lewat SHARDS, contoh
+# "ft=civitasfix_ft.db,feb=civitasfix_feb.db", dan laporan baru diarahkan ke shard
+# berdasarkan gedung lokasinya lewat SHARD_ROUTING, contoh "FT=ft,FEB=feb".
+#
+# Id laporan/history unik global: shard ke-k memakai rentang id k * SHARD_ID_SPAN ke atas
+# (sqlite_sequence di-seed saat shard dibuat), sehingga operasi satu laporan langsung
+# diarahkan ke shard-nya dari id saja. Query lintas shard (list dosen, statistik)
+# dijalankan paralel di semua shard lalu digabung.
+#
+# Setiap shard punya file + write lock sendiri, jadi throughput tulis bertambah dengan
+# jumlah shard. Koneksi shard ATTACH database utama sebagai `global` sehingga JOIN ke
+# users/locations tetap berjalan (foreign key lintas file tidak bisa dicek SQLite,
+# jadi PRAGMA foreign_keys dimatikan di koneksi shard).
+
+SHARD_ID_SPAN = 10 ** 12
+SHARDED_TABLES = ("laporan", "status_history")
+# Tabel yang ditulis trigger laporan/status_history, ikut ada di setiap shard
+SHARD_LOCAL_TABLES = ("change_counter", "change_log", "laporan_daily_stats", "laporan_daily_resolution")
+
+class Shard:
+    def __init__(self, index: int, name: str, path: str):
+        self.index = index
+        self.name = name
+        self.path = path
+
+    def __repr__(self):
+        return f"Shard({self.index}, {self.name!r}, {self.path!r})"
+
+def parse_shards(text: str):
+    shards = [Shard(0, "main", settings.DATABASE_PATH)]
+    for item in (text or "").split(","):
+        name, _, path = item.strip().partition("=")
+        if name and path:
+            shards.append(Shard(len(shards), name, path))
+    return shards
+
+def parse_routing(text: str) -> dict:
+    routing = {}
+    for item in (text or "").split(","):
+        key, _, name = item.strip().partition("=")
+        if key and name:
+            routing[key.strip().upper()] = name.strip()
+    return routing
+
+# Urutan SHARDS tidak boleh diubah setelah ada data (index shard tersimpan di rentang id)
+SHARDS = parse_shards(settings.SHARDS)
+ROUTING = parse_routing(settings.SHARD_ROUTING)
+_by_name = {shard.name: shard for shard in SHARDS}
+
+def is_sharded() -> bool:
+    return len(SHARDS) > 1
+
+def shard_for_id(record_id: int) -> Shard:
+    """Shard pemilik laporan/history berdasarkan rentang id"""
+    index = int(record_id) // SHARD_ID_SPAN
+    return SHARDS[index] if 0 <= index < len(SHARDS) else SHARDS[0]
+
+def id_range_sql(shard: Shard, column: str = "id") -> str:
+    """Kondisi SQL padanan shard_for_id (mis. untuk baris arsip yang berasal dari berbagai shard)"""
+    if shard.index == 0:
+        return f"({column} < {SHARD_ID_SPAN} OR {column} >= {len(SHARDS) * SHARD_ID_SPAN})"
+    return f"({column} >= {shard.index * SHARD_ID_SPAN} AND {column} < {(shard.index + 1) * SHARD_ID_SPAN})"
+
+def shard_for_key(key: str) -> Shard:
+    """Shard untuk laporan baru berdasarkan shard key (gedung/fakultas); default shard utama"""
+    return _by_name.get(ROUTING.get((key or "").strip().upper()), SHARDS[0])
+
+def connect(shard: Shard):
+    if shard.index == 0:
+        return get_connection()
+    conn = sqlite3.connect(shard.path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("ATTACH DATABASE ? AS global", (settings.DATABASE_PATH,))
+    return conn
+
+@contextmanager
+def connection(shard: Shard, primary_conn=None):
+    """Koneksi ke shard; untuk shard utama pakai `primary_conn` jika diberikan"""
+    if shard.index == 0 and primary_conn is not None:
+        yield primary_conn
+        return
+    conn = connect(shard)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+# ==================== SCHEMA ====================
+
+def init_shards():
+    """
+    Buat/selaraskan schema setiap shard dari definisi di database utama (tabel, index,
+    trigger laporan/status_history dan tabel pendukungnya). Dipanggil setelah create_tables().
+    """
+    if not is_sharded():
+        return
+    primary = get_connection()
+    try:
+        tables = SHARDED_TABLES + SHARD_LOCAL_TABLES
+        placeholders = ",".join("?" * len(tables))
+        objects = primary.execute(
+            f"""SELECT type, name, tbl_name, sql FROM sqlite_master
+                WHERE sql IS NOT NULL AND tbl_name IN ({placeholders})
+                ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END""",
+            tables
+        ).fetchall()
+        columns = {
+            table: primary.execute(f"PRAGMA table_info({table})").fetchall() for table in tables
+        }
+    finally:
+        primary.close()
+
+    for shard in SHARDS[1:]:
+        conn = sqlite3.connect(shard.path)
+        try:
+            # Kolom enum TEXT lama -> kode INTEGER; index/trigger yang terhapus dibuat ulang di bawah
+            enums.migrate(conn, SHARDED_TABLES)
+            existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+            for obj_type, name, table, sql in objects:
+                if name not in existing:
+                    conn.execute(sql)
+                elif obj_type == "table":
+                    _add_missing_columns(conn, table, columns[table])
+            # Trigger yang sudah dihapus/diganti di database utama juga dibuang dari shard
+            primary_triggers = {name for obj_type, name, _, _ in objects if obj_type == "trigger"}
+            stale = conn.execute(
+                f"SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ({placeholders})", tables
+            ).fetchall()
+            for (name,) in stale:
+                if name not in primary_triggers:
+                    conn.execute(f"DROP TRIGGER {name}")
+
+            # Rentang id shard: AUTOINCREMENT melanjutkan dari nilai seq ini
+            for table in SHARDED_TABLES:
+                conn.execute(
+                    """INSERT INTO sqlite_sequence (name, seq)
+                       SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)""",
+                    (table, shard.index * SHARD_ID_SPAN, table)
+                )
+            conn.commit()
+            print(f"✅ Shard {shard.name} siap ({shard.path})")
+        finally:
+            conn.close()
+
+def _add_missing_columns(conn, table, primary_columns):
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for _, name, col_type, _, default, _ in primary_columns:
+        if name not in existing:
+            definition = f"{name} {col_type}" + (f" DEFAULT {default}" if default is not None else "")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {definition}")
+
+# ==================== FAN-OUT ====================
+
+_executor = None
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(1, len(SHARDS) - 1), thread_name_prefix="shard")
+    return _executor
+
+def fan_out(fn, primary_conn=None):
+    """
+    Jalankan fn(conn) di semua shard secara paralel, masing-masing dengan koneksinya sendiri.
+    Shard utama dijalankan di thread pemanggil (memakai `primary_conn` jika ada).
+    Return list hasil, urut index shard.
+    """
+    def work(shard):
+        with connection(shard, primary_conn) as conn:
+            return fn(conn)
+
+    if not is_sharded():
+        return [work(SHARDS[0])]
+    futures = [_get_executor().submit(work, shard) for shard in SHARDS[1:]]
+    return [work(SHARDS[0])] + [future.result() for future in futures]
+
+def merge_sorted(results, key, reverse: bool = True, limit: int = None):
+    """Gabungkan list hasil per shard yang masing-masing sudah terurut"""
+    if len(results) == 1:
+        merged = results[0]
+        return merged[:limit] if limit else merged
+    merged = heapq.merge(*results, key=key, reverse=reverse)
+    return list(islice(merged, limit)) if limit else list(merged)
@@ -0,0 +1,198 @@
+import argparse
+import atexit
+import threading
+import time
+
+from app.config import settings
+from app.database import get_connection
+from app.metrics import fingerprint
+
+# Slow query log: statement yang melewati settings.SLOW_QUERY_MS dicatat per fingerprint
+# (SQL ternormalisasi) beserta bentuk parameter, durasi, jumlah baris dan
+# EXPLAIN QUERY PLAN (diambil sekali per fingerprint per worker).
+# record() hanya mengagregasi di memori per fingerprint (tanpa tulis database di event loop /
+# saat lock tulis sedang diperebutkan); thread background menulis agregat ke slow_query_log
+# tiap SLOW_QUERY_FLUSH_SECONDS dalam satu transaksi, dan sekali lagi saat proses keluar.
+
+_explained = set()
+_explained_lock = threading.Lock()
+
+# fingerprint -> agregat yang belum ditulis
+_pending = {}
+_pending_lock = threading.Lock()
+_flusher = None
+
+UPSERT_SQL = """INSERT INTO slow_query_log
+        (fingerprint, calls, total_ms, max_ms, last_rows, param_shape, query_plan, full_scan)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(fingerprint) DO UPDATE SET
+        calls = calls + excluded.calls,
+        total_ms = total_ms + excluded.total_ms,
+        max_ms = MAX(max_ms, excluded.max_ms),
+        last_rows = excluded.last_rows,
+        param_shape = excluded.param_shape,
+        query_plan = COALESCE(excluded.query_plan, query_plan),
+        full_scan = CASE WHEN excluded.query_plan IS NULL THEN full_scan ELSE excluded.full_scan END,
+        last_seen = CURRENT_TIMESTAMP"""
+
+ORDER_COLUMNS = {
+    "total": "total_ms",
+    "max": "max_ms",
+    "calls": "calls",
+    "avg": "total_ms / calls",
+}
+
+def is_slow(seconds: float) -> bool:
+    return settings.SLOW_QUERY_MS >= 0 and seconds * 1000 >= settings.SLOW_QUERY_MS
+
+def param_shape(params) -> str:
+    """Bentuk parameter tanpa nilainya, contoh: (int, str) atau (int x 50)"""
+    if not params:
+        return "()"
+    types = [type(p).__name__ for p in params]
+    if len(types) > 5 and len(set(types)) == 1:
+        return f"({types[0]} x {len(types)})"
+    return "(" + ", ".join(types) + ")"
+
+def explain(conn, query: str, params=None) -> str:
+    rows = conn.execute("EXPLAIN QUERY PLAN " + query, params or ()).fetchall()
+    # Kolom: id, parent, notused, detail
+    return "\n".join(row[3] for row in rows)
+
+def has_full_scan(plan: str) -> bool:
+    """SCAN tanpa index = full table scan (SEARCH / SCAN ... USING INDEX tidak dihitung)"""
+    for line in (plan or "").splitlines():
+        line = line.strip()
+        if line.startswith("SCAN") and "USING" not in line:
+            return True
+    return False
+
+def record(conn, query: str, params, seconds: float, rows):
+    """Catat satu eksekusi lambat. Tidak pernah melempar error ke pemanggil."""
+    fp = fingerprint(query)
+    elapsed_ms = seconds * 1000
+    shape = param_shape(params)
+
+    plan = None
+    with _explained_lock:
+        need_plan = fp not in _explained
+        _explained.add(fp)
+    if need_plan:
+        try:
+            plan = explain(conn, query, params)
+        except Exception as e:
+            plan = f"EXPLAIN gagal: {e}"
+
+    print(f"🐢 Slow query {elapsed_ms:.1f} ms rows={rows} params={shape}: {fp}")
+    if plan:
+        print("   Query plan:\n   " + plan.replace("\n", "\n   "))
+
+    with _pending_lock:
+        entry = _pending.get(fp)
+        if entry is None:
+            _pending[fp] = {"calls": 1, "total_ms": elapsed_ms, "max_ms": elapsed_ms,
+                            "rows": rows, "shape": shape, "plan": plan}
+        else:
+            entry["calls"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["rows"] = rows
+            entry["shape"] = shape
+            entry["plan"] = plan or entry["plan"]
+    _start_flusher()
+
+def flush():
+    """Tulis semua agregat tertunda ke slow_query_log (satu transaksi); return jumlah fingerprint"""
+    global _pending
+    with _pending_lock:
+        pending, _pending = _pending, {}
+    if not pending:
+        return 0
+
+    store = None
+    try:
+        # Koneksi terpisah supaya tidak mengganggu transaksi koneksi request
+        store = get_connection()
+        store.executemany(UPSERT_SQL, [
+            (fp, entry["calls"], entry["total_ms"], entry["max_ms"], entry["rows"], entry["shape"],
+             entry["plan"], 1 if has_full_scan(entry["plan"]) else 0)
+            for fp, entry in pending.items()
+        ])
+        store.commit()
+    except Exception as e:
+        print(f"❌ Error writing slow query log: {e}")
+    finally:
+        if store is not None:
+            store.close()
+    return len(pending)
+
+def _flush_loop():
+    while True:
+        time.sleep(settings.SLOW_QUERY_FLUSH_SECONDS)
+        flush()
+
+def _start_flusher():
+    """Thread flush dibuat saat slow query pertama (daemon, per worker)"""
+    global _flusher
+    if _flusher is not None:
+        return
+    with _pending_lock:
+        if _flusher is not None:
+            return
+        _flusher = threading.Thread(target=_flush_loop, name="slowlog-flush", daemon=True)
+        _flusher.start()
+    atexit.register(flush)
+
+def top_offenders(conn, limit: int = 20, order: str = "total", full_scan_only: bool = False):
+    """Statement paling lambat, diurutkan berdasarkan total/max/calls/avg"""
+    # Agregat worker ini yang belum ditulis ikut terlihat
+    flush()
+    column = ORDER_COLUMNS.get(order, "total_ms")
+    where = "WHERE full_scan = 1" if full_scan_only else ""
+    cursor = conn.execute(
+        f"""SELECT fingerprint, calls, total_ms, max_ms, total_ms / calls as avg_ms,
+                   last_rows, param_shape, query_plan, full_scan, first_seen, last_seen
+            FROM slow_query_log
+            {where}
+            ORDER BY {column} DESC
+            LIMIT ?""",
+        (limit,)
+    )
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def reset(conn):
+    with _pending_lock:
+        _pending.clear()
+    conn.execute("DELETE FROM slow_query_log")
+    conn.commit()
+    with _explained_lock:
+        _explained.clear()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tampilkan statement paling lambat dari slow_query_log")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--order", choices=sorted(ORDER_COLUMNS), default="total")
+    parser.add_argument("--full-scan-only", action="store_true", help="Hanya statement dengan full table scan")
+    parser.add_argument("--reset", action="store_true", help="Kosongkan slow_query_log")
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    try:
+        if args.reset:
+            reset(conn)
+            print("✅ slow_query_log dikosongkan")
+            return
+
+        for entry in top_offenders(conn, args.top, args.order, args.full_scan_only):
+            flag = " [FULL SCAN]" if entry['full_scan'] else ""
+            print(f"{entry['total_ms']:10.1f} ms total | {entry['calls']:6d} calls | "
+                  f"avg {entry['avg_ms']:8.1f} ms | max {entry['max_ms']:8.1f} ms{flag}")
+            print(f"    {entry['fingerprint']}")
+            if entry['query_plan']:
+                print("    " + entry['query_plan'].replace("\n", "\n    "))
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
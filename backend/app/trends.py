@@ -0,0 +1,328 @@
+import argparse
+import time
+
+from app import enums, shards
+from app.config import settings
+
+# Trend analytics dari bucket harian yang sudah di-agregasi.
+# laporan_daily_stats      : jumlah laporan dibuat/selesai/ditolak per hari per dimensi
+# laporan_daily_resolution : histogram (sketch) waktu penyelesaian per hari per dimensi
+# Bucket dijaga incremental oleh trigger pada laporan, dan bisa di-backfill massal
+# dengan `python -m app.trends --backfill`. Endpoint trend hanya membaca bucket,
+# jadi waktu query bergantung pada panjang rentang tanggal, bukan jumlah laporan.
+
+# Dimensi -> kolom laporan (None = total semua laporan)
+DIMENSIONS = {
+    "all": None,
+    "fasilitas": "jenis_fasilitas",
+    "lokasi": "lokasi",
+    "prioritas": "prioritas",
+}
+
+# Batas atas bin histogram waktu penyelesaian (jam); bin terakhir = lebih dari batas terakhir
+BIN_BOUNDS_HOURS = [1, 2, 4, 8, 12, 24, 48, 72, 120, 168, 336, 720, 1440, 2160]
+
+GRANULARITY_PERIOD = {
+    "day": "day",
+    "week": "date(day, '-6 days', 'weekday 1')",
+    "month": "strftime('%Y-%m-01', day)",
+}
+
+CLOSED_STATUSES = ("selesai", "ditolak")
+
+def bin_expression(created: str, resolved: str) -> str:
+    """Ekspresi SQL CASE yang memetakan selisih waktu (jam) ke nomor bin"""
+    hours = f"((julianday({resolved}) - julianday({created})) * 24.0)"
+    cases = " ".join(f"WHEN {hours} <= {bound} THEN {i}" for i, bound in enumerate(BIN_BOUNDS_HOURS))
+    return f"(CASE {cases} ELSE {len(BIN_BOUNDS_HOURS)} END)"
+
+def dimension_expr(dimension: str, row: str = None) -> str:
+    column = DIMENSIONS[dimension]
+    if column is None:
+        return "''"
+    expr = f"{row}.{column}" if row else column
+    # Bucket menyimpan nama enum (mis. 'tinggi'), bukan kodenya
+    return enums.sql_name(column, expr) if column in enums.ENUMS else expr
+
+def _trigger_values(day: str, columns: str, row: str = "NEW") -> str:
+    """Satu baris VALUES per dimensi untuk baris NEW/OLD di trigger"""
+    return ", ".join(f"({day}, '{dim}', {dimension_expr(dim, row)}, {columns})" for dim in DIMENSIONS)
+
+def create_trend_tables(cursor):
+    """Dipanggil dari database.create_tables()"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS laporan_daily_stats (
+            dimension TEXT NOT NULL,
+            day TEXT NOT NULL,
+            value TEXT NOT NULL,
+            created INTEGER NOT NULL DEFAULT 0,
+            selesai INTEGER NOT NULL DEFAULT 0,
+            ditolak INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, day, value)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS laporan_daily_resolution (
+            dimension TEXT NOT NULL,
+            day TEXT NOT NULL,
+            value TEXT NOT NULL,
+            bin INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, day, value, bin)
+        ) WITHOUT ROWID
+    ''')
+
+    closed = enums.sql_codes("status", CLOSED_STATUSES)
+    selesai, ditolak = enums.code("status", "selesai"), enums.code("status", "ditolak")
+
+    def created_values(row, sign):
+        return _trigger_values(f"date({row}.created_at)", f"{sign}1, 0, 0", row)
+
+    def closed_values(row, sign):
+        return _trigger_values(
+            f"date({row}.updated_at)", f"0, {sign}({row}.status = {selesai}), {sign}({row}.status = {ditolak})", row
+        )
+
+    def resolution_values(row, sign):
+        return _trigger_values(
+            f"date({row}.updated_at)", f"{bin_expression(f'{row}.created_at', f'{row}.updated_at')}, {sign}1", row
+        )
+
+    def add_closed(row, sign=""):
+        """Kontribusi baris tertutup (selesai/ditolak + histogram) seperti di rebuild(), sign '-' = kurangi"""
+        return f'''
+            INSERT INTO laporan_daily_stats (day, dimension, value, created, selesai, ditolak)
+            SELECT * FROM (VALUES {closed_values(row, sign)}) WHERE {row}.status IN ({closed})
+            ON CONFLICT(dimension, day, value) DO UPDATE SET
+                selesai = selesai + excluded.selesai, ditolak = ditolak + excluded.ditolak;
+
+            INSERT INTO laporan_daily_resolution (day, dimension, value, bin, count)
+            SELECT * FROM (VALUES {resolution_values(row, sign)}) WHERE {row}.status = {selesai}
+            ON CONFLICT(dimension, day, value, bin) DO UPDATE SET count = count + excluded.count;'''
+
+    dimension_changed = " OR ".join(
+        f"OLD.{column} IS NOT NEW.{column}" for column in ["created_at"] + [c for c in DIMENSIONS.values() if c]
+    )
+
+    # Trigger lama yang hanya menghitung transisi terbuka -> tertutup (reopen dan
+    # selesai -> ditolak tidak tercatat, sehingga bucket menyimpang dari rebuild())
+    cursor.execute("DROP TRIGGER IF EXISTS trg_laporan_close_trends")
+    cursor.executescript(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_laporan_insert_trends AFTER INSERT ON laporan
+        BEGIN
+            INSERT INTO laporan_daily_stats (day, dimension, value, created, selesai, ditolak)
+            VALUES {created_values("NEW", "")}
+            ON CONFLICT(dimension, day, value) DO UPDATE SET created = created + 1;
+
+            -- Laporan yang langsung dimasukkan dalam status tertutup (import/bulk load)
+            {add_closed("NEW")}
+        END;
+
+        -- Perubahan tanggal dibuat / nilai dimensi (mis. eskalasi prioritas): pindahkan hitungan created
+        CREATE TRIGGER IF NOT EXISTS trg_laporan_update_created_trends
+        AFTER UPDATE OF created_at, jenis_fasilitas, lokasi, prioritas ON laporan
+        WHEN {dimension_changed}
+        BEGIN
+            INSERT INTO laporan_daily_stats (day, dimension, value, created, selesai, ditolak)
+            VALUES {created_values("OLD", "-")}
+            ON CONFLICT(dimension, day, value) DO UPDATE SET created = created + excluded.created;
+
+            INSERT INTO laporan_daily_stats (day, dimension, value, created, selesai, ditolak)
+            VALUES {created_values("NEW", "")}
+            ON CONFLICT(dimension, day, value) DO UPDATE SET created = created + excluded.created;
+        END;
+
+        -- Setiap perubahan yang menyentuh laporan tertutup (tutup, buka lagi, selesai -> ditolak,
+        -- updated_at bergeser): kurangi kontribusi OLD lalu tambahkan kontribusi NEW
+        CREATE TRIGGER IF NOT EXISTS trg_laporan_update_closed_trends
+        AFTER UPDATE OF status, updated_at, created_at, jenis_fasilitas, lokasi, prioritas ON laporan
+        WHEN (OLD.status IN ({closed}) OR NEW.status IN ({closed}))
+             AND (OLD.status IS NOT NEW.status OR OLD.updated_at IS NOT NEW.updated_at OR {dimension_changed})
+        BEGIN
+            {add_closed("OLD", "-")}
+            {add_closed("NEW")}
+        END;
+    ''')
+
+    # Database lama: isi bucket sekali dari laporan yang sudah ada
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM laporan_daily_stats), EXISTS (SELECT 1 FROM laporan)")
+    has_buckets, has_laporan = cursor.fetchone()
+    if has_laporan and not has_buckets:
+        rebuild(cursor)
+
+# ==================== BACKFILL ====================
+
+def rebuild(cursor, sources=(("main.laporan", "1"),)):
+    """Hapus lalu isi ulang bucket dari (tabel sumber, kondisi WHERE) (dipanggil di dalam transaksi)"""
+    closed = enums.sql_codes("status", CLOSED_STATUSES)
+    selesai, ditolak = enums.code("status", "selesai"), enums.code("status", "ditolak")
+    cursor.execute("DELETE FROM laporan_daily_stats")
+    cursor.execute("DELETE FROM laporan_daily_resolution")
+    for source, condition in sources:
+        for dim in DIMENSIONS:
+            expr = dimension_expr(dim)
+            cursor.execute(f'''
+                INSERT INTO laporan_daily_stats (day, dimension, value, created)
+                SELECT date(created_at), '{dim}', {expr}, COUNT(*)
+                FROM {source} WHERE {condition}
+                GROUP BY 1, 3
+                ON CONFLICT(dimension, day, value) DO UPDATE SET created = created + excluded.created
+            ''')
+            cursor.execute(f'''
+                INSERT INTO laporan_daily_stats (day, dimension, value, created, selesai, ditolak)
+                SELECT date(updated_at), '{dim}', {expr}, 0,
+                       SUM(status = {selesai}), SUM(status = {ditolak})
+                FROM {source} WHERE {condition} AND status IN ({closed})
+                GROUP BY 1, 3
+                ON CONFLICT(dimension, day, value) DO UPDATE SET
+                    selesai = selesai + excluded.selesai, ditolak = ditolak + excluded.ditolak
+            ''')
+            cursor.execute(f'''
+                INSERT INTO laporan_daily_resolution (day, dimension, value, bin, count)
+                SELECT date(updated_at), '{dim}', {expr}, {bin_expression('created_at', 'updated_at')}, COUNT(*)
+                FROM {source} WHERE {condition} AND status = {selesai}
+                GROUP BY 1, 3, 4
+                ON CONFLICT(dimension, day, value, bin) DO UPDATE SET count = count + excluded.count
+            ''')
+
+def backfill(verbose: bool = True):
+    """
+    Bangun ulang bucket setiap shard dari tabel laporan shard itu ditambah baris arsip yang
+    berasal dari shard itu (rentang id), dengan INSERT ... SELECT ... GROUP BY dalam satu
+    transaksi per shard. Endpoint trend menjumlahkan bucket semua shard, jadi setiap baris
+    arsip hanya boleh dihitung di satu shard.
+    """
+    from app import archive
+
+    started = time.perf_counter()
+    buckets = 0
+    for shard in shards.SHARDS:
+        conn = shards.connect(shard)
+        try:
+            sources = [("main.laporan", "1")]
+            attached = archive.archive_exists()
+            if attached:
+                conn.execute("ATTACH DATABASE ? AS archive", (settings.ARCHIVE_DATABASE_PATH,))
+                archive.ensure_schema(conn)
+                sources.append(("archive.laporan", shards.id_range_sql(shard)))
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rebuild(conn, sources)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            buckets += conn.execute("SELECT COUNT(*) FROM laporan_daily_stats").fetchone()[0]
+            if attached:
+                conn.execute("DETACH DATABASE archive")
+        finally:
+            conn.close()
+
+    stats = {"shards": len(shards.SHARDS), "buckets": buckets, "seconds": round(time.perf_counter() - started, 3)}
+    if verbose:
+        print(f"✅ Backfill trend selesai: {stats}")
+    return stats
+
+# ==================== QUERY ====================
+
+def percentile_from_bins(bins: dict, pct: float):
+    """Percentile (jam) dari histogram {bin: count} dengan interpolasi linear di dalam bin"""
+    total = sum(bins.values())
+    if not total:
+        return None
+    target = pct / 100 * total
+    cumulative = 0
+    for index in range(len(BIN_BOUNDS_HOURS) + 1):
+        count = bins.get(index, 0)
+        if not count:
+            continue
+        if cumulative + count >= target:
+            if index >= len(BIN_BOUNDS_HOURS):
+                return float(BIN_BOUNDS_HOURS[-1])
+            lower = BIN_BOUNDS_HOURS[index - 1] if index > 0 else 0
+            upper = BIN_BOUNDS_HOURS[index]
+            return round(lower + (upper - lower) * (target - cumulative) / count, 2)
+        cumulative += count
+    return float(BIN_BOUNDS_HOURS[-1])
+
+def get_trends(conn, start: str, end: str, granularity: str = "day", dimension: str = "all",
+               top: int = 10, percentiles=(50, 90)):
+    """Trend per periode (day/week/month) dan nilai dimensi, hanya dari tabel bucket"""
+    period = GRANULARITY_PERIOD[granularity]
+
+    def fetch(shard_conn):
+        rows = shard_conn.execute(
+            f"""SELECT {period} as period, value,
+                       SUM(created) as created, SUM(selesai) as selesai, SUM(ditolak) as ditolak
+                FROM laporan_daily_stats
+                WHERE dimension = ? AND day BETWEEN ? AND ?
+                GROUP BY 1, 2
+                ORDER BY 1, 2""",
+            (dimension, start, end)
+        ).fetchall()
+        bin_rows = shard_conn.execute(
+            f"""SELECT {period} as period, value, bin, SUM(count) as count
+                FROM laporan_daily_resolution
+                WHERE dimension = ? AND day BETWEEN ? AND ?
+                GROUP BY 1, 2, 3""",
+            (dimension, start, end)
+        ).fetchall()
+        return [tuple(row) for row in rows], [tuple(row) for row in bin_rows]
+
+    # Bucket dijaga per shard oleh trigger; jumlahkan hasil semua shard (histogram juga aditif)
+    results = shards.fan_out(fetch, conn)
+    if len(results) == 1:
+        rows, bin_rows = results[0]
+    else:
+        totals, bins = {}, {}
+        for shard_rows, shard_bins in results:
+            for row_period, value, created, selesai, ditolak in shard_rows:
+                current = totals.get((row_period, value), (0, 0, 0))
+                totals[(row_period, value)] = (current[0] + created, current[1] + selesai, current[2] + ditolak)
+            for row_period, value, bin_index, count in shard_bins:
+                bins[(row_period, value, bin_index)] = bins.get((row_period, value, bin_index), 0) + count
+        rows = [key + counts for key, counts in sorted(totals.items())]
+        bin_rows = [key + (count,) for key, count in bins.items()]
+
+    # Batasi ke `top` nilai dimensi dengan laporan terbanyak dalam rentang ini
+    allowed = None
+    if dimension != "all" and top:
+        totals = {}
+        for row in rows:
+            totals[row[1]] = totals.get(row[1], 0) + row[2]
+        allowed = set(sorted(totals, key=totals.get, reverse=True)[:top])
+
+    sketches = {}
+    for row_period, value, bin_index, count in bin_rows:
+        sketches.setdefault((row_period, value), {})[bin_index] = count
+
+    buckets = []
+    for row_period, value, created, selesai, ditolak in rows:
+        if allowed is not None and value not in allowed:
+            continue
+        bins = sketches.get((row_period, value), {})
+        bucket = {
+            "period": row_period,
+            "value": value,
+            "created": created,
+            "selesai": selesai,
+            "ditolak": ditolak,
+        }
+        for pct in percentiles:
+            bucket[f"resolution_p{pct}_hours"] = percentile_from_bins(bins, pct)
+        buckets.append(bucket)
+    return buckets
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintenance bucket trend laporan")
+    parser.add_argument("--backfill", action="store_true", help="Bangun ulang semua bucket dari data laporan")
+    args = parser.parse_args(argv)
+
+    if args.backfill:
+        backfill()
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
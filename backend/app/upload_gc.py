@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import os
+import time
+
+from app import archive, locks, metrics, shards
+from app.config import settings
+from app.database import FOTO_FILE_EXPR
+
+# Garbage collection file di uploads/ yang tidak direferensikan laporan.foto_url
+# (hasil POST /upload yang tidak pernah dipakai, atau foto yang tertinggal karena insert gagal).
+# File dipindai streaming per batch; referensi dicek lewat expression index idx_laporan_foto_file
+# (tabel aktif di semua shard dan arsip). Hanya file yang lebih tua dari grace period yang dihapus, supaya
+# upload yang laporannya belum dibuat tidak ikut terhapus.
+
+UPLOAD_DIR = "uploads"
+
+upload_gc_deleted_total = metrics.registry.register(metrics.Counter(
+    "civitasfix_upload_gc_deleted_files_total", "File upload yatim yang dihapus GC"
+))
+upload_gc_reclaimed_bytes_total = metrics.registry.register(metrics.Counter(
+    "civitasfix_upload_gc_reclaimed_bytes_total", "Byte disk yang dibebaskan GC upload"
+))
+
+def _lookup(conn, table: str, filenames) -> set:
+    placeholders = ",".join("?" * len(filenames))
+    return {row[0] for row in conn.execute(
+        f"""SELECT {FOTO_FILE_EXPR} FROM {table}
+            WHERE foto_url IS NOT NULL AND {FOTO_FILE_EXPR} IN ({placeholders})""",
+        filenames
+    )}
+
+def referenced_files(conns, filenames, include_archive: bool = True) -> set:
+    """Subset `filenames` yang masih direferensikan laporan (semua shard dan arsip); conns[0] = shard utama"""
+    found = set()
+    for conn in conns:
+        remaining = [name for name in filenames if name not in found]
+        if not remaining:
+            return found
+        found |= _lookup(conn, "main.laporan", remaining)
+    remaining = [name for name in filenames if name not in found]
+    if include_archive and remaining and archive.archive_exists():
+        with archive.attach(conns[0]):
+            found |= _lookup(conns[0], "archive.laporan", remaining)
+    return found
+
+def _old_files(directory: str, cutoff: float):
+    """Yield (nama, ukuran) file biasa yang mtime-nya sebelum cutoff, tanpa memuat seluruh listing"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if not entry.is_file(follow_symlinks=False) or entry.name.startswith("."):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime < cutoff:
+                yield entry.name, stat.st_size
+
+def sweep(grace_hours: float = None, batch_size: int = None, pause_seconds: float = None,
+          dry_run: bool = False, directory: str = UPLOAD_DIR, verbose: bool = True):
+    """
+    Hapus file upload yatim yang lebih tua dari `grace_hours`, per batch `batch_size` file
+    dengan jeda `pause_seconds` antar batch (membatasi beban disk dan database).
+    """
+    grace_hours = settings.UPLOAD_GC_GRACE_HOURS if grace_hours is None else grace_hours
+    batch_size = batch_size or settings.UPLOAD_GC_BATCH_SIZE
+    pause_seconds = settings.UPLOAD_GC_PAUSE if pause_seconds is None else pause_seconds
+
+    stats = {"checked": 0, "deleted": 0, "bytes_reclaimed": 0, "dry_run": dry_run, "seconds": 0.0}
+    started = time.perf_counter()
+    if not os.path.isdir(directory):
+        return stats
+
+    cutoff = time.time() - grace_hours * 3600
+    conns = [shards.connect(shard) for shard in shards.SHARDS]
+    try:
+        batch = []
+
+        def process(items):
+            referenced = referenced_files(conns, [name for name, _ in items])
+            for name, size in items:
+                if name in referenced:
+                    continue
+                if not dry_run:
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except FileNotFoundError:
+                        # Sudah dihapus worker lain
+                        continue
+                    upload_gc_deleted_total.inc()
+                    upload_gc_reclaimed_bytes_total.inc(amount=size)
+                stats["deleted"] += 1
+                stats["bytes_reclaimed"] += size
+            stats["checked"] += len(items)
+
+        for item in _old_files(directory, cutoff):
+            batch.append(item)
+            if len(batch) >= batch_size:
+                process(batch)
+                batch = []
+                if pause_seconds:
+                    time.sleep(pause_seconds)
+        if batch:
+            process(batch)
+    finally:
+        for conn in conns:
+            conn.close()
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    if verbose:
+        action = "akan dihapus" if dry_run else "dihapus"
+        print(f"🧹 GC upload: {stats['deleted']} dari {stats['checked']} file lama {action}, "
+              f"{stats['bytes_reclaimed'] / 1024 / 1024:.1f} MB dibebaskan ({stats['seconds']} s)")
+    return stats
+
+async def run_periodically(interval_minutes: float):
+    """
+    Task background (dijalankan dari startup_event); sweep berjalan di thread pool.
+    Task ada di setiap worker, tapi lock file membuat hanya satu worker yang menyapu per interval.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(min(interval_minutes * 60, 300))
+        try:
+            await loop.run_in_executor(None, locks.run_if_due, "upload_gc", interval_minutes, sweep)
+        except Exception as e:
+            print(f"Upload GC error: {e}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hapus file uploads/ yang tidak direferensikan laporan")
+    parser.add_argument("--grace-hours", type=float, default=settings.UPLOAD_GC_GRACE_HOURS)
+    parser.add_argument("--batch-size", type=int, default=settings.UPLOAD_GC_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=settings.UPLOAD_GC_PAUSE, help="Jeda antar batch (detik)")
+    parser.add_argument("--dry-run", action="store_true", help="Hanya hitung, jangan hapus file")
+    args = parser.parse_args(argv)
+
+    sweep(args.grace_hours, args.batch_size, args.pause, args.dry_run)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import argparse
+from collections import Counter
+from datetime import datetime
+
+from app import enums, metrics, shards
+from app.config import settings
+
+# Antrian kerja dosen: alih-alih beberapa dosen memilih laporan yang sama dari GET /laporan
+# lalu saling timpa di update_status, tiap dosen mengklaim N laporan terbuka berikutnya
+# (prioritas tertinggi, lalu yang paling lama) dengan satu UPDATE bersyarat pada dosen_id.
+# Klaim berupa lease: claim_expires_at diisi WORK_QUEUE_LEASE_MINUTES ke depan; setelah lewat,
+# laporan kembali ke antrian. update_status mengubah lease menjadi penugasan tetap
+# (claim_expires_at = NULL). Kandidat dibaca dari partial index idx_laporan_work_queue yang
+# hanya berisi laporan terbuka yang belum ditangani, jadi tidak ada scan seluruh tabel.
+
+OPEN_STATUSES_SQL = f"({enums.sql_codes('status', ('dilaporkan', 'dalam_penanganan'))})"
+# Harus sama persis dengan WHERE partial index supaya index dipakai
+CANDIDATE_SQL = f"status IN {OPEN_STATUSES_SQL} AND (dosen_id IS NULL OR claim_expires_at IS NOT NULL)"
+CLAIMABLE_SQL = f"{CANDIDATE_SQL} AND (dosen_id IS NULL OR claim_expires_at <= datetime('now'))"
+ORDER_SQL = "prioritas DESC, created_at, id"
+
+MAX_CLAIM = 50
+# Sharded: shard yang kehabisan kandidat di tengah klaim diisi dari shard lain, paling banyak sekian putaran
+MAX_ROUNDS = 3
+
+workqueue_claimed_total = metrics.registry.register(metrics.Counter(
+    "civitasfix_workqueue_claimed_total", "Laporan yang diklaim dosen dari antrian kerja"
+))
+
+def create_work_queue_index(cursor):
+    """Dipanggil dari database.create_tables()"""
+    cursor.execute(
+        f"""CREATE INDEX IF NOT EXISTS idx_laporan_work_queue
+            ON laporan (prioritas DESC, created_at)
+            WHERE {CANDIDATE_SQL}"""
+    )
+
+def _order_key(row: dict):
+    return (-enums.code("prioritas", row["prioritas"]), row["created_at"], row["id"])
+
+def _claim_where(conn, dosen_id: int, lease_minutes: float, where: str, params) -> list:
+    """UPDATE bersyarat + RETURNING dalam satu statement; baris yang sudah diklaim dosen lain tidak tersentuh"""
+    cursor = conn.execute(
+        f"""UPDATE laporan SET dosen_id = ?, claim_expires_at = datetime('now', ?)
+            WHERE {where}
+            RETURNING *""",
+        (dosen_id, f"+{lease_minutes * 60:.0f} seconds", *params)
+    )
+    columns = [desc[0] for desc in cursor.description]
+    rows = enums.to_dicts(columns, cursor.fetchall())
+    conn.commit()
+    return rows
+
+def _candidates(conn, limit: int) -> list:
+    cursor = conn.execute(
+        f"SELECT id, prioritas, created_at FROM laporan WHERE {CLAIMABLE_SQL} ORDER BY {ORDER_SQL} LIMIT ?",
+        (limit,)
+    )
+    return enums.to_dicts([desc[0] for desc in cursor.description], cursor.fetchall())
+
+def claim(primary_conn, dosen_id: int, limit: int, lease_minutes: float = None) -> list:
+    """Klaim sampai `limit` laporan terbuka berikutnya untuk dosen; return baris yang didapat (urut antrian)"""
+    lease_minutes = lease_minutes or settings.WORK_QUEUE_LEASE_MINUTES
+    next_ids = f"id IN (SELECT id FROM laporan WHERE {CLAIMABLE_SQL} ORDER BY {ORDER_SQL} LIMIT ?)"
+    if not shards.is_sharded():
+        claimed = _claim_where(primary_conn, dosen_id, lease_minutes, next_ids, (limit,))
+    else:
+        # Kandidat teratas semua shard digabung untuk menentukan jatah tiap shard, lalu tiap shard
+        # mengklaim jatahnya dengan UPDATE bersyarat yang sama (jika kandidatnya keburu diklaim
+        # dosen lain, yang terambil adalah laporan berikutnya di shard itu, bukan gagal)
+        claimed = []
+        for _ in range(MAX_ROUNDS):
+            need = limit - len(claimed)
+            if need <= 0:
+                break
+            candidates = shards.merge_sorted(
+                shards.fan_out(lambda conn: _candidates(conn, need), primary_conn),
+                key=_order_key, reverse=False, limit=need
+            )
+            if not candidates:
+                break
+            quota = Counter(shards.shard_for_id(row["id"]) for row in candidates)
+            for shard, count in quota.items():
+                with shards.connection(shard, primary_conn) as conn:
+                    claimed += _claim_where(conn, dosen_id, lease_minutes, next_ids, (count,))
+    claimed.sort(key=_order_key)
+    workqueue_claimed_total.inc(amount=len(claimed))
+    return claimed
+
+def release(conn, laporan_id: int, dosen_id: int) -> bool:
+    """Kembalikan laporan yang masih di-lease dosen ini ke antrian; False jika tidak sedang diklaim olehnya"""
+    released = conn.execute(
+        """UPDATE laporan SET dosen_id = NULL, claim_expires_at = NULL
+           WHERE id = ? AND dosen_id = ? AND claim_expires_at > datetime('now')""",
+        (laporan_id, dosen_id)
+    ).rowcount
+    conn.commit()
+    return bool(released)
+
+def assign(conn, laporan_id: int, dosen_id: int, status_code: int) -> bool:
+    """
+    Update status + jadikan penugasan tetap dosen ini (claim_expires_at = NULL), hanya jika laporan
+    tidak sedang di-lease dosen lain. Syarat lease ada di WHERE UPDATE itu sendiri, jadi klaim dari
+    worker lain di antara baca dan tulis tidak tertimpa; False = tidak ada baris yang berubah.
+    """
+    updated = conn.execute(
+        """UPDATE laporan SET status = ?, dosen_id = ?, claim_expires_at = NULL, updated_at = datetime('now')
+           WHERE id = ?
+             AND (dosen_id IS NULL OR dosen_id = ? OR claim_expires_at IS NULL
+                  OR claim_expires_at <= datetime('now'))""",
+        (status_code, dosen_id, laporan_id, dosen_id)
+    ).rowcount
+    conn.commit()
+    return bool(updated)
+
+def held_by_other(laporan: dict, dosen_id: int) -> bool:
+    """True jika laporan sedang di-lease dosen lain (lease belum lewat)"""
+    expires = laporan.get("claim_expires_at")
+    if not expires or laporan.get("dosen_id") in (None, dosen_id):
+        return False
+    # Timestamp SQLite datetime('now') dalam UTC, format 'YYYY-MM-DD HH:MM:SS'
+    return str(expires) > datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Antrian kerja dosen: laporan terbuka yang belum ditangani")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    rows = shards.merge_sorted(
+        shards.fan_out(
+            lambda conn: conn.execute(
+                f"""SELECT id, prioritas, created_at, dosen_id, claim_expires_at FROM laporan
+                    WHERE {CANDIDATE_SQL} ORDER BY {ORDER_SQL} LIMIT ?""",
+                (args.limit,)
+            ).fetchall()
+        ),
+        key=lambda row: (-row[1], row[2], row[0]), reverse=False, limit=args.limit
+    )
+    for laporan_id, prioritas, created_at, dosen_id, expires in rows:
+        holder = f"diklaim dosen {dosen_id} s/d {expires}" if dosen_id else "belum diklaim"
+        print(f"  #{laporan_id:<14d} {enums.name('prioritas', prioritas):7s} {created_at}  {holder}")
+    print(f"({len(rows)} laporan di antrian)")
+
+if __name__ == "__main__":
+    main()
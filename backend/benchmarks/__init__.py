@@ -0,0 +1 @@
+# Benchmark & load test CivitasFix (lihat benchmarks/README.md)
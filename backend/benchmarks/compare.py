@@ -0,0 +1,62 @@
+import argparse
+import json
+import sys
+
+# Bandingkan dua hasil benchmarks.load (baseline vs kandidat).
+# Exit code 1 jika ada skenario yang regresi melewati threshold.
+
+METRICS = [
+    # (key, lebih besar lebih buruk?)
+    ("p50_ms", True),
+    ("p95_ms", True),
+    ("p99_ms", True),
+    ("throughput_rps", False),
+]
+
+def compare(baseline: dict, candidate: dict, threshold_pct: float):
+    """Return (baris tabel, daftar regresi)"""
+    rows = []
+    regressions = []
+    base_scenarios = baseline.get("scenarios", {})
+    for name, cand in candidate.get("scenarios", {}).items():
+        base = base_scenarios.get(name)
+        if not base:
+            rows.append((name, "-", "baru", "", ""))
+            continue
+        for key, higher_is_worse in METRICS:
+            old, new = base.get(key, 0), cand.get(key, 0)
+            change = ((new - old) / old * 100) if old else 0.0
+            worse = change > threshold_pct if higher_is_worse else change < -threshold_pct
+            rows.append((name, key, f"{old:g}", f"{new:g}", f"{change:+.1f}%{'  ⚠' if worse else ''}"))
+            if worse:
+                regressions.append((name, key, change))
+        if cand.get("errors", 0) > base.get("errors", 0):
+            regressions.append((name, "errors", cand["errors"] - base.get("errors", 0)))
+    return rows, regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bandingkan dua file hasil benchmark")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Batas regresi dalam persen")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"Baseline {baseline['meta'].get('commit')} vs kandidat {candidate['meta'].get('commit')}")
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    for name, key, old, new, change in rows:
+        print(f"{name:<16} {key:<15} {old:>12} {new:>12} {change}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regresi melewati {args.threshold}%:")
+        for name, key, change in regressions:
+            print(f"   {name} {key} {change:+.1f}")
+        sys.exit(1)
+    print("\n✅ Tidak ada regresi")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from app import enums
+
+# Generator dataset besar untuk benchmark (10k - 5M laporan).
+# Semua insert memakai executemany dalam transaksi per chunk; hash password dihitung
+# sekali lalu dipakai ulang untuk semua user (PBKDF2 30.000 rounds per user terlalu mahal).
+
+BENCH_PASSWORD = "bench123"
+
+FASILITAS = [
+    # (jenis_fasilitas, prioritas dasar)
+    ("Proyektor", "tinggi"), ("AC", "tinggi"), ("Komputer", "tinggi"), ("Listrik", "tinggi"),
+    ("Jaringan Internet", "tinggi"), ("Kursi Kuliah", "sedang"), ("Meja", "sedang"),
+    ("Papan Tulis", "sedang"), ("Pintu", "sedang"), ("Jendela", "sedang"), ("Toilet", "sedang"),
+    ("Lampu", "sedang"), ("Washtafel", "sedang"), ("CCTV", "rendah"), ("Taman", "rendah"),
+    ("Parkiran", "rendah"), ("Lainnya", "rendah"),
+]
+GEDUNG = ["A", "B", "C", "D", "E", "FIK", "FEB", "FT", "FH", "Perpustakaan", "Rektorat"]
+STATUS_WEIGHTS = [("dilaporkan", 30), ("dalam_penanganan", 20), ("selesai", 40), ("ditolak", 10)]
+CATATAN = [None, "Sedang dicek teknisi", "Menunggu sparepart", "Sudah diperbaiki", "Laporan duplikat"]
+
+def _naikkan(prioritas: str) -> str:
+    return {"rendah": "sedang", "sedang": "tinggi"}.get(prioritas, prioritas)
+
+def _lokasi(rng: random.Random) -> str:
+    gedung = rng.choice(GEDUNG)
+    lantai = rng.randint(1, 5)
+    ruang = f"{gedung[0]}{lantai}{rng.randint(1, 20):02d}"
+    return f"Gedung {gedung} Lantai {lantai} Ruang {ruang}"
+
+def _fmt(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%d %H:%M:%S")
+
+def generate_users(conn, mahasiswa: int, dosen: int, password_hash: str, chunk: int = 5000):
+    """Insert user bench (username mhs000001/dsn0001). Return (ids mahasiswa, ids dosen)."""
+    def rows(prefix, role, count, width):
+        for i in range(1, count + 1):
+            username = f"{prefix}{i:0{width}d}"
+            yield (username, f"{username}@bench.upnjatim.ac.id", password_hash, enums.code("role", role),
+                   f"Bench {role.title()} {i}")
+
+    for prefix, role, count, width in (("dsn", "dosen", dosen, 4), ("mhs", "mahasiswa", mahasiswa, 6)):
+        batch = []
+        for row in rows(prefix, role, count, width):
+            batch.append(row)
+            if len(batch) >= chunk:
+                _insert_users(conn, batch)
+                batch = []
+        if batch:
+            _insert_users(conn, batch)
+
+    mahasiswa_ids = [r[0] for r in conn.execute(
+        "SELECT id FROM users WHERE role = ? AND username LIKE 'mhs%'", (enums.code("role", "mahasiswa"),))]
+    dosen_ids = [r[0] for r in conn.execute(
+        "SELECT id FROM users WHERE role = ? AND username LIKE 'dsn%'", (enums.code("role", "dosen"),))]
+    return mahasiswa_ids, dosen_ids
+
+def _insert_users(conn, batch):
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO users (username, email, password_hash, role, nama_lengkap) VALUES (?, ?, ?, ?, ?)",
+            batch
+        )
+
+def generate_laporan(conn, count: int, mahasiswa_ids, dosen_ids, days: int = 730,
+                     seed: int = 42, chunk: int = 5000, progress: bool = True):
+    """Insert `count` laporan + status_history dengan distribusi status/fasilitas/lokasi yang realistis"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    statuses = [s for s, _ in STATUS_WEIGHTS]
+    weights = [w for _, w in STATUS_WEIGHTS]
+    next_id = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM laporan").fetchone()[0]) + 1
+
+    inserted = 0
+    started = time.perf_counter()
+    while inserted < count:
+        size = min(chunk, count - inserted)
+        laporan_rows = []
+        history_rows = []
+        for offset in range(size):
+            laporan_id = next_id + inserted + offset
+            jenis, prioritas = rng.choice(FASILITAS)
+            kategori = "rusak_berat" if rng.random() < 0.35 else "rusak_ringan"
+            if kategori == "rusak_berat":
+                prioritas = _naikkan(prioritas)
+            status = rng.choices(statuses, weights)[0]
+            created = now - timedelta(days=rng.random() * days)
+            user_id = rng.choice(mahasiswa_ids)
+            dosen_id = None
+            updated = created
+
+            if status != "dilaporkan":
+                dosen_id = rng.choice(dosen_ids)
+                steps = ["dalam_penanganan"] if status == "dalam_penanganan" else (
+                    ["dalam_penanganan", status] if rng.random() < 0.7 else [status])
+                ts = created
+                for step in steps:
+                    ts = min(ts + timedelta(hours=rng.uniform(1, 24 * 14)), now)
+                    history_rows.append((laporan_id, enums.code("status", step), rng.choice(CATATAN), _fmt(ts), dosen_id))
+                updated = ts
+
+            lokasi = _lokasi(rng)
+            laporan_rows.append((
+                laporan_id, f"{jenis} rusak di {lokasi.split(' Ruang ')[-1]}",
+                f"Laporan benchmark #{laporan_id}: {jenis.lower()} perlu perbaikan",
+                enums.code("kategori", kategori), jenis, lokasi, enums.code("prioritas", prioritas), None,
+                enums.code("status", status),
+                user_id, dosen_id, _fmt(created), _fmt(updated)
+            ))
+
+        with conn:
+            conn.executemany(
+                """INSERT INTO laporan (id, judul, deskripsi, kategori, jenis_fasilitas, lokasi, prioritas,
+                                        foto_url, status, user_id, dosen_id, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                laporan_rows
+            )
+            conn.executemany(
+                "INSERT INTO status_history (laporan_id, status, catatan, created_at, user_id) VALUES (?, ?, ?, ?, ?)",
+                history_rows
+            )
+        inserted += size
+
+        if progress:
+            rate = inserted / max(time.perf_counter() - started, 1e-9)
+            print(f"  {inserted:>9,d}/{count:,d} laporan ({rate:,.0f} rows/s)", end="\r", flush=True)
+    if progress:
+        print()
+    return inserted
+
+def generate(db_path: str, laporan: int = 10000, mahasiswa: int = None, dosen: int = None,
+             days: int = 730, seed: int = 42, chunk: int = 5000, progress: bool = True):
+    """Buat tabel (jika belum ada) lalu isi dataset benchmark. Return ringkasan dataset."""
+    os.environ["DATABASE_PATH"] = db_path
+    from app.config import settings
+    settings.DATABASE_PATH = db_path
+    from app.auth import hash_password
+    from app.database import create_tables
+
+    create_tables()
+
+    mahasiswa = mahasiswa or max(10, laporan // 20)
+    dosen = dosen or max(2, mahasiswa // 50)
+
+    conn = sqlite3.connect(db_path)
+    # Load massal: journal WAL + synchronous OFF hanya selama generate
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -65536")
+    try:
+        started = time.perf_counter()
+        mahasiswa_ids, dosen_ids = generate_users(conn, mahasiswa, dosen, hash_password(BENCH_PASSWORD), chunk)
+        total = generate_laporan(conn, laporan, mahasiswa_ids, dosen_ids, days, seed, chunk, progress)
+        conn.execute("ANALYZE")
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.close()
+
+    summary = {
+        "laporan": total,
+        "mahasiswa": len(mahasiswa_ids),
+        "dosen": len(dosen_ids),
+        "seed": seed,
+        "seconds": round(elapsed, 2),
+    }
+    if progress:
+        print(f"✅ Dataset benchmark dibuat di {db_path}: {summary}")
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate dataset besar CivitasFix untuk benchmark")
+    parser.add_argument("--db", default="bench.db", help="Path file SQLite tujuan")
+    parser.add_argument("--laporan", type=int, default=10000)
+    parser.add_argument("--mahasiswa", type=int, default=None, help="Default: laporan / 20")
+    parser.add_argument("--dosen", type=int, default=None, help="Default: mahasiswa / 50")
+    parser.add_argument("--days", type=int, default=730, help="Rentang created_at ke belakang (hari)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk", type=int, default=5000, help="Jumlah baris per transaksi")
+    args = parser.parse_args(argv)
+
+    generate(args.db, args.laporan, args.mahasiswa, args.dosen, args.days, args.seed, args.chunk)
+
+if __name__ == "__main__":
+    main()
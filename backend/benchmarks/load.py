@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Skenario load test terhadap aplikasi ASGI in-process (httpx.AsyncClient, tanpa network).
+# Hasil (p50/p95/p99 latency + throughput per skenario) ditulis sebagai JSON supaya bisa
+# dibandingkan antar commit dengan benchmarks/compare.py.
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 1x1 PNG transparan untuk skenario upload foto
+PNG_BYTES = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile dari list yang sudah diurutkan"""
+    if not sorted_values:
+        return 0.0
+    # pct * n dulu baru dibagi 100: 0.07 * 100 = 7.000000000000001 akan dibulatkan ke atas jadi 8
+    rank = max(1, math.ceil(pct * len(sorted_values) / 100))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies, errors: int, wall_seconds: float):
+    values = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]) if values else 0.0,
+        "throughput_rps": round(len(values) / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+    }
+
+# ==================== SKENARIO ====================
+# Setiap skenario: async fn(client, ctx, rng) -> httpx.Response
+
+async def scenario_login(client, ctx, rng):
+    username = rng.choice(ctx["mahasiswa_usernames"])
+    return await client.post("/login", json={"username": username, "password": ctx["password"]})
+
+async def scenario_create_laporan(client, ctx, rng):
+    data = {
+        "judul": "Benchmark laporan",
+        "deskripsi": "Dibuat oleh load test",
+        "kategori": rng.choice(["rusak_berat", "rusak_ringan"]),
+        "jenis_fasilitas": rng.choice(["Proyektor", "Kursi Kuliah", "Lainnya"]),
+        "lokasi": "Gedung A Lantai 1 Ruang A101",
+    }
+    files = {"foto": ("bench.png", PNG_BYTES, "image/png")}
+    return await client.post("/laporan", data=data, files=files, headers=ctx["mahasiswa_headers"])
+
+async def scenario_list_laporan(client, ctx, rng):
+    return await client.get("/laporan", headers=ctx["dosen_headers"])
+
+async def scenario_my_laporan(client, ctx, rng):
+    return await client.get("/laporan/me", headers=ctx["mahasiswa_headers"])
+
+async def scenario_detail(client, ctx, rng):
+    return await client.get(f"/laporan/{rng.choice(ctx['laporan_ids'])}", headers=ctx["dosen_headers"])
+
+async def scenario_history(client, ctx, rng):
+    return await client.get(f"/laporan/{rng.choice(ctx['laporan_ids'])}/history", headers=ctx["dosen_headers"])
+
+async def scenario_statistik(client, ctx, rng):
+    return await client.get("/statistik", headers=ctx["dosen_headers"])
+
+async def scenario_update_status(client, ctx, rng):
+    payload = {"status": rng.choice(["dalam_penanganan", "selesai"]), "catatan": "Benchmark update"}
+    return await client.put(
+        f"/laporan/{rng.choice(ctx['laporan_ids'])}/status", json=payload, headers=ctx["dosen_headers"]
+    )
+
+SCENARIOS = {
+    "login": scenario_login,
+    "create_laporan": scenario_create_laporan,
+    "list_laporan": scenario_list_laporan,
+    "my_laporan": scenario_my_laporan,
+    "detail": scenario_detail,
+    "history": scenario_history,
+    "statistik": scenario_statistik,
+    "update_status": scenario_update_status,
+}
+
+# Login (PBKDF2) dan list semua laporan jauh lebih mahal, jumlah request-nya dikurangi
+DEFAULT_REQUEST_SCALE = {"login": 0.2, "list_laporan": 0.1, "statistik": 0.2}
+
+async def run_scenario(client, ctx, fn, requests: int, concurrency: int, seed: int):
+    latencies = []
+    errors = 0
+    queue = list(range(requests))
+
+    async def worker(worker_id):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        while queue:
+            queue.pop()
+            started = time.perf_counter()
+            try:
+                response = await fn(client, ctx, rng)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            if failed:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+def _load_context(db_path: str, password: str, sample: int = 500):
+    conn = sqlite3.connect(db_path)
+    try:
+        mahasiswa = [r[0] for r in conn.execute(
+            "SELECT username FROM users WHERE username LIKE 'mhs%' ORDER BY id LIMIT 50")]
+        dosen = conn.execute("SELECT username FROM users WHERE username LIKE 'dsn%' ORDER BY id LIMIT 1").fetchone()
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM laporan").fetchone()[0]
+    finally:
+        conn.close()
+    if not mahasiswa or not dosen or not max_id:
+        raise SystemExit("Dataset kosong, jalankan benchmarks.generate terlebih dahulu (atau --laporan N)")
+    rng = random.Random(0)
+    return {
+        "password": password,
+        "mahasiswa_usernames": mahasiswa,
+        "dosen_username": dosen[0],
+        "laporan_ids": [rng.randint(1, max_id) for _ in range(sample)],
+    }
+
+async def run_benchmark(db_path: str, scenarios, requests: int, concurrency: int, seed: int):
+    from benchmarks.generate import BENCH_PASSWORD
+    from app.main import app
+
+    ctx = _load_context(db_path, BENCH_PASSWORD)
+    await app.router.startup()
+    results = {}
+    try:
+        import httpx
+
+        async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+            for role, username in (("mahasiswa", ctx["mahasiswa_usernames"][0]), ("dosen", ctx["dosen_username"])):
+                response = await client.post("/login", json={"username": username, "password": BENCH_PASSWORD})
+                response.raise_for_status()
+                ctx[f"{role}_headers"] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            for name in scenarios:
+                count = max(1, int(requests * DEFAULT_REQUEST_SCALE.get(name, 1.0)))
+                print(f"▶ {name}: {count} request, concurrency {concurrency}")
+                results[name] = await run_scenario(client, ctx, SCENARIOS[name], count, concurrency, seed)
+                r = results[name]
+                print(f"  p50 {r['p50_ms']} ms | p95 {r['p95_ms']} ms | p99 {r['p99_ms']} ms | "
+                      f"{r['throughput_rps']} req/s | errors {r['errors']}")
+    finally:
+        await app.router.shutdown()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test CivitasFix terhadap aplikasi ASGI in-process")
+    parser.add_argument("--db", default=None, help="Dataset SQLite (default: generate baru di workdir)")
+    parser.add_argument("--laporan", type=int, default=10000, help="Ukuran dataset jika --db tidak diberikan")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Daftar skenario dipisah koma: {','.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=500, help="Request per skenario (sebelum scaling)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=None, help="Direktori kerja (uploads/, db); default temp dir")
+    parser.add_argument("--output", default=None, help="Tulis hasil JSON ke file ini")
+    parser.add_argument("--group-commit", action="store_true",
+                        help="Aktifkan GROUP_COMMIT_ENABLED (bandingkan create_laporan dengan path biasa)")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"Skenario tidak dikenal: {', '.join(unknown)}")
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="civitasfix-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+    output = os.path.abspath(args.output) if args.output else None
+    db_path = os.path.abspath(args.db) if args.db else os.path.join(workdir, "bench.db")
+
+    # Aplikasi memakai path relatif (uploads/, db): jalankan di workdir yang terisolasi
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(workdir)
+    os.environ["DATABASE_PATH"] = db_path
+    os.environ["SMTP_USERNAME"] = ""
+    os.environ["SMTP_PASSWORD"] = ""
+    os.environ.setdefault("SLOW_QUERY_MS", "-1")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    os.environ.setdefault("SEED_SAMPLE_DATA", "0")
+    if args.group_commit:
+        os.environ["GROUP_COMMIT_ENABLED"] = "1"
+
+    dataset = None
+    if not args.db:
+        from benchmarks.generate import generate
+        dataset = generate(db_path, laporan=args.laporan, seed=args.seed)
+
+    results = asyncio.run(run_benchmark(db_path, scenarios, args.requests, args.concurrency, args.seed))
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "db": db_path,
+            "dataset": dataset,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "group_commit": os.environ.get("GROUP_COMMIT_ENABLED") == "1",
+        },
+        "scenarios": results,
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Hasil benchmark ditulis ke {output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
+import os
 import uvicorn
 
 if __name__ == "__main__":
+    # Mode development: data contoh di-seed (opt-in), production pakai serve.py
+    os.environ.setdefault("SEED_SAMPLE_DATA", "1")
+
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
@@ -8,4 +12,4 @@ if __name__ == "__main__":
         reload=True,
         log_level="info",
         access_log=True
-    )
\ No newline at end of file
+    )